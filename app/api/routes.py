@@ -1,13 +1,12 @@
-from app.services.redis_queue import add_to_queue
-from fastapi import APIRouter, Request
+from app.services import scheduler
+from app.models.document import WebhookPayload, BatchWebhookPayload
+from app.services.metrics import CONTENT_TYPE, Counter, QUEUE_DEPTH, render_prometheus
+from fastapi import APIRouter, Response
 import os
 import logging
 # import uuid
 # import json
-from app.services.supabase_client import supabase
-import httpx
-import uuid
-# import asyncio
+import asyncio
 # import aiofiles
 
 
@@ -17,37 +16,78 @@ UPLOAD_FOLDER = "app/uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 logging.basicConfig(level=logging.INFO)
-http_client = httpx.AsyncClient(timeout=30.0)
+WEBHOOK_REQUESTS = Counter("kchat_webhook_requests_total", "Webhook calls received by the API.", ("status",))
+
+# Look up file size in storage when the record doesn't carry one, to pick the scheduler lane.
+# Off by default: it is a Supabase round-trip per webhook (and per batch record);
+# records without a size go to the large lane.
+SIZE_LOOKUP = os.getenv("ENQUEUE_SIZE_LOOKUP", "0") == "1"
+
+
+async def _document_size(record):
+    if SIZE_LOOKUP and scheduler.needs_size_lookup(record.model_dump()):
+        return await scheduler.fetch_object_size(record.storage_path)
+    return None
 
 
 @router.get("/")
 def health_check():
     return {"status": "running"}
 
+
+@router.get("/metrics")
+async def metrics():
+    try:
+        QUEUE_DEPTH.set(await scheduler.get_queue_length())
+    except Exception as e:
+        logging.warning(f"Could not read queue length for metrics: {e}")
+    return Response(content=render_prometheus(), media_type=CONTENT_TYPE)
+
+
+@router.get("/queue/stats")
+async def queue_stats():
+    return await scheduler.get_stats()
+
 @router.post("/webhook/new-document")
-async def new_document(request: Request):
+async def new_document(payload: WebhookPayload):
+    # Missing storage_path/file_name is rejected with 422 by validation
 
-    payload = await request.json()
-    record = payload.get("record", {})
+    record = payload.record
 
-    file_path = record.get("storage_path")
-    original_filename = record.get("file_name")
-    file_unique_id = record.get("id")
+    # Supabase retries and double fires carry the same id + updated_at
+    queued = await scheduler.enqueue(
+        record.to_job(), record.idempotency_key(), await _document_size(record)
+    )
 
-    if not file_path or not original_filename:
-        return {"status": "missing required fields"}
+    status = "queued" if queued else "duplicate"
+    WEBHOOK_REQUESTS.inc(status=status)
+
+    return {"status": status}
 
-    # Only push minimal job data
-    job_data = {
-        "uuid":file_unique_id,
-        "storage_path": file_path,
-        "file_name": original_filename,
-        "record": record
-    }
 
-    await add_to_queue(job_data)
+@router.post("/webhook/new-documents")
+async def new_documents(payload: BatchWebhookPayload):
+    """Bulk variant: all records are enqueued in one pipelined Redis round-trip."""
 
-    return {"status": "queued"}
+    sizes = await asyncio.gather(*(_document_size(record) for record in payload.records))
+    results = await scheduler.enqueue_many(
+        [
+            (record.to_job(), record.idempotency_key(), size)
+            for record, size in zip(payload.records, sizes)
+        ]
+    )
+
+    queued = sum(results)
+    duplicates = len(results) - queued
+    WEBHOOK_REQUESTS.inc(queued, status="queued")
+    WEBHOOK_REQUESTS.inc(duplicates, status="duplicate")
+
+    return {
+        "status": "queued",
+        "queued": queued,
+        "duplicates": duplicates,
+        "results": ["queued" if ok else "duplicate" for ok in results],
+    }
 
 
 # @router.post("/webhook/new-document")
@@ -1,6 +1,16 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from app.api.routes import router
+from app.services.providers import warmup_api
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warmup_api()
+    yield
+
 
-app = FastAPI(title="RAG Backend")
+app = FastAPI(title="RAG Backend", lifespan=lifespan)
 
 app.include_router(router)
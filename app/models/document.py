@@ -1 +1,44 @@
 # Pydantic models for document and metadata
+from typing import List, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class DocumentRecord(BaseModel):
+    """A row of the Supabase documents table, as sent in webhook payloads."""
+
+    # the worker copies every column into chunk metadata, so keep unknown fields
+    model_config = ConfigDict(extra="allow")
+
+    id: Union[str, int]
+    storage_path: str = Field(min_length=1)
+    file_name: str = Field(min_length=1)
+    updated_at: Optional[str] = None
+    created_at: Optional[str] = None
+
+    def idempotency_key(self) -> str:
+        """Same row and same version → same key, so retried or double-fired webhooks collapse."""
+        return f"{self.id}:{self.updated_at or self.created_at or ''}"
+
+    def to_job(self) -> dict:
+        # Only push minimal job data
+        return {
+            "uuid": self.id,
+            "storage_path": self.storage_path,
+            "file_name": self.file_name,
+            "record": self.model_dump(),
+        }
+
+
+class WebhookPayload(BaseModel):
+    """Supabase database webhook body (INSERT/UPDATE on the documents table)."""
+
+    model_config = ConfigDict(extra="allow")
+
+    type: Optional[str] = None
+    table: Optional[str] = None
+    record: DocumentRecord
+
+
+class BatchWebhookPayload(BaseModel):
+    records: List[DocumentRecord] = Field(min_length=1, max_length=1000)
@@ -0,0 +1,209 @@
+"""
+Token-budgeted context packing for answer generation.
+
+Takes retrieved chunks in rank order and builds the document section of the
+answer prompt so that text, tables and images together stay within a fixed
+token budget:
+  - near-duplicate chunks (overlapping windows, re-ingested versions) are dropped
+  - each chunk contributes its AI summary or its raw text, whichever is shorter
+  - tables go in only when they share terms with the question
+  - images are capped by their own token budget
+  - original_content is decoded only for chunks that are actually considered
+"""
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Sequence
+
+import tiktoken
+from langchain_core.documents import Document
+
+from app.services.metrics import Histogram
+from app.services.providers import ANSWER_MODEL
+from app.utils.serialization import loads
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+IMAGE_TOKEN_BUDGET = int(os.getenv("IMAGE_TOKEN_BUDGET", "1000"))
+# OpenAI bills a detail="low" image at a flat 85 tokens
+IMAGE_DETAIL = os.getenv("IMAGE_DETAIL", "low")
+IMAGE_TOKENS = int(os.getenv("IMAGE_TOKENS", "85"))
+
+# a chunk is dropped when this share of its shingles already appears in the pack
+DUPLICATE_OVERLAP = 0.8
+SHINGLE_WORDS = 5
+# share of the question's terms a table must contain to be included
+TABLE_RELEVANCE = 0.3
+
+CONTEXT_TOKENS = Histogram(
+    "kchat_context_tokens",
+    "Tokens in packed answer contexts.",
+    buckets=(250, 500, 1000, 2000, 4000, 6000, 8000, 12000, 16000, 32000),
+)
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or the this to was what "
+    "when where which who why will with my me about there their".split()
+)
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = ANSWER_MODEL) -> int:
+    return len(_encoding(model).encode_ordinary(text)) if text else 0
+
+
+def _terms(text: str) -> set:
+    return {w for w in _WORD.findall(text.lower()) if len(w) > 2 and w not in _STOPWORDS}
+
+
+def _shingles(text: str) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def table_is_relevant(table_html: str, query_terms: set) -> bool:
+    if not query_terms:
+        return False
+    table_terms = _terms(_TAG.sub(" ", table_html))
+    return len(query_terms & table_terms) / len(query_terms) >= TABLE_RELEVANCE
+
+
+class LazyOriginal:
+    """original_content of a chunk, decoded on first access."""
+
+    def __init__(self, blob):
+        self._blob = blob
+        self._data = None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = loads(self._blob) if self._blob else {}
+            self._blob = None
+        return self._data
+
+    @property
+    def raw_text(self) -> str:
+        return self.data.get("raw_text") or ""
+
+    @property
+    def tables(self) -> List[str]:
+        return self.data.get("tables_html") or []
+
+    @property
+    def images(self) -> List[str]:
+        return self.data.get("images_base64") or []
+
+
+@dataclass
+class PackedContext:
+    text: str
+    images: List[str] = field(default_factory=list)
+    tokens: int = 0
+    documents: List[Document] = field(default_factory=list)
+    dropped_duplicates: int = 0
+    dropped_over_budget: int = 0
+
+    def message_content(self, prompt_text: str) -> list:
+        """OpenAI multimodal message content: the prompt followed by the packed images."""
+        content = [{"type": "text", "text": prompt_text}]
+        for image_base64 in self.images:
+            content.append({
+                "type": "image_url",
+                "image_url": {"url": f"data:image/jpeg;base64,{image_base64}", "detail": IMAGE_DETAIL},
+            })
+        return content
+
+
+def pack_context(
+    query: str,
+    chunks: Sequence[Document],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    image_budget: int = IMAGE_TOKEN_BUDGET,
+    model: str = ANSWER_MODEL,
+) -> PackedContext:
+    """
+    Fill `budget` tokens with the best chunks, in the order given (best first).
+
+    Chunks that don't fit are skipped rather than truncated, so a smaller chunk
+    further down the ranking can still use the remaining space.
+    """
+    query_terms = _terms(query)
+    seen_shingles = set()
+    seen_images = set()
+    blocks = []
+    images = []
+    used = 0
+    image_tokens = 0
+    packed = PackedContext(text="")
+
+    for chunk in chunks:
+        shingles = _shingles(chunk.page_content)
+        if shingles and len(shingles & seen_shingles) / len(shingles) >= DUPLICATE_OVERLAP:
+            packed.dropped_duplicates += 1
+            continue
+
+        original = LazyOriginal(chunk.metadata.get("original_content"))
+        header = f"--- Document {len(blocks) + 1} ---\n"
+
+        # text-only chunks were stored with the raw text as page_content
+        summary = chunk.page_content
+        summary_tokens = count_tokens(summary, model)
+        raw = original.raw_text
+        if raw and raw != summary:
+            raw_tokens = count_tokens(raw, model)
+            if raw_tokens < summary_tokens:
+                summary, summary_tokens = raw, raw_tokens
+
+        block = f"{header}TEXT:\n{summary}\n\n"
+        block_tokens = count_tokens(header, model) + summary_tokens + 4
+        if used + block_tokens > budget:
+            packed.dropped_over_budget += 1
+            continue
+
+        relevant_tables = [t for t in original.tables if table_is_relevant(t, query_terms)]
+        if relevant_tables:
+            tables_text = "TABLES:\n"
+            for j, table in enumerate(relevant_tables):
+                entry = f"Table {j + 1}:\n{table}\n\n"
+                entry_tokens = count_tokens(entry, model)
+                if used + block_tokens + entry_tokens > budget:
+                    break
+                tables_text += entry
+                block_tokens += entry_tokens
+            if tables_text != "TABLES:\n":
+                block += tables_text
+
+        blocks.append(block)
+        used += block_tokens
+        seen_shingles |= shingles
+        packed.documents.append(chunk)
+
+        for image_base64 in original.images:
+            if image_tokens + IMAGE_TOKENS > image_budget or used + IMAGE_TOKENS > budget:
+                break
+            digest = hashlib.blake2b(image_base64.encode(), digest_size=16).digest()
+            if digest in seen_images:
+                continue
+            seen_images.add(digest)
+            images.append(image_base64)
+            image_tokens += IMAGE_TOKENS
+            used += IMAGE_TOKENS
+
+    packed.text = "".join(blocks)
+    packed.images = images
+    packed.tokens = used
+    CONTEXT_TOKENS.observe(used)
+    return packed
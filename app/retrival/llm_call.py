@@ -1,100 +1,55 @@
-# # Query the vector store
-# from app.services.qdrant_client import VectorStoreService
-# from langchain_openai import ChatOpenAI
-# import json
-# from langchain_core.messages import HumanMessage
-# from dotenv import load_dotenv
+# Query the vector store
+from langchain_core.messages import HumanMessage
+
+from app.retrival.context_packer import pack_context
+from app.retrival.reranker import retrieve
+from app.services.providers import get_answer_llm
+
 # from langchain_community.retrievers import BM25Retriever
 # from langchain_classic.retrievers.ensemble import EnsembleRetriever
 
-# load_dotenv()
 
+# # query = "How many attention heads does the Transformer use, and what is the dimension of each head? "
 
-# qudrant_client=VectorStoreService(collection_name="my-collection",embedding_model="text-embedding-3-large")
 
+NO_ANSWER = "I don't have enough information to answer that question based on the provided documents."
 
 
+def generate_final_answer(query, k=8, school=None):
+    """Generate final answer using multimodal content"""
 
+    # hybrid_retriver=EnsembleRetriever(
+    #     retrievers=[qudrant_client,BM25Retriever]
+    #     )
 
+    try:
+        chunks = retrieve(query, k=k, school=school)
 
-# # query = "How many attention heads does the Transformer use, and what is the dimension of each head? "
+        # Fit text, relevant tables and images into the token budget
+        context = pack_context(query, chunks)
+        if not context.documents:
+            return NO_ANSWER
+
+        prompt_text = f"""Based on the following documents, please answer this question: {query}
+
+CONTENT TO ANALYZE:
+{context.text}
+Please provide a clear, short answer using the text. If the documents don't contain sufficient information to answer the question, say "{NO_ANSWER}"
+
+ANSWER:"""
+
+        # Send to AI and get response
+        message = HumanMessage(content=context.message_content(prompt_text))
+        response = get_answer_llm().invoke([message])
+
+        return response.content
 
+    except Exception as e:
+        print(f"❌ Answer generation failed: {e}")
+        return "Sorry, I encountered an error while generating the answer."
 
 
-# def generate_final_answer(query):
-#     """Generate final answer using multimodal content"""
-
-#     # chunks = qudrant_client.similarity_search(query)
-#     # chunks = retriever.invoke(query)
-
-#     hybrid_retriver=EnsembleRetriever(
-#         retrievers=[qudrant_client,BM25Retriever]
-#         )
-    
-#     try:
-#         # Initialize LLM (needs vision model for images)
-#         llm = ChatOpenAI(model="gpt-5.2", temperature=0)
-        
-#         # Build the text prompt
-#         prompt_text = f"""Based on the following documents, please answer this question: {query}
-
-# CONTENT TO ANALYZE:
-# """
-        
-#         for i, chunk in enumerate(chunks):
-#             prompt_text += f"--- Document {i+1} ---\n"
-            
-#             if "original_content" in chunk.metadata:
-#                 original_data = json.loads(chunk.metadata["original_content"])
-                
-#                 # Add raw text
-#                 raw_text = original_data.get("raw_text", "")
-#                 if raw_text:
-#                     prompt_text += f"TEXT:\n{raw_text}\n\n"
-                
-#                 # Add tables as HTML
-#                 tables_html = original_data.get("tables_html", [])
-#                 if tables_html:
-#                     prompt_text += "TABLES:\n"
-#                     for j, table in enumerate(tables_html):
-#                         prompt_text += f"Table {j+1}:\n{table}\n\n"
-            
-#             prompt_text += "\n"
-        
-#         prompt_text += """
-# Please provide a clear, short answer using the text. If the documents don't contain sufficient information to answer the question, say "I don't have enough information to answer that question based on the provided documents."
-
-# ANSWER:"""
-
-#         # Build message content starting with text
-#         message_content = [{"type": "text", "text": prompt_text}]
-        
-#         # Add all images from all chunks
-#         for chunk in chunks:
-#             if "original_content" in chunk.metadata:
-#                 original_data = json.loads(chunk.metadata["original_content"])
-#                 images_base64 = original_data.get("images_base64", [])
-                
-#                 for image_base64 in images_base64:
-#                     message_content.append({
-#                         "type": "image_url",
-#                         "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}
-#                     })
-        
-#         # Send to AI and get response
-#         message = HumanMessage(content=message_content)
-#         response = llm.invoke([message])
-        
-#         return response.content
-        
-#     except Exception as e:
-#         print(f"❌ Answer generation failed: {e}")
-#         return "Sorry, I encountered an error while generating the answer."
-    
-
-# while True:
-
-    
-
-#     inp=input(">")
-#     print(generate_final_answer(inp))
+if __name__ == "__main__":
+    while True:
+        inp = input(">")
+        print(generate_final_answer(inp))
@@ -0,0 +1,249 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+import onnxruntime as ort
+from cachetools import LRUCache
+from langchain_core.documents import Document
+from tokenizers import Tokenizer
+
+from app.services.metrics import record_cache, stage
+from app.utils.tasks import spawn
+
+logger = logging.getLogger(__name__)
+
+# Small MS MARCO cross-encoder; its Hugging Face repo ships an ONNX export
+DEFAULT_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# quantized models are written here, never next to the source model (which may
+# be a read-only mount or a shared Hugging Face cache)
+RERANKER_CACHE_DIR = os.getenv(
+    "RERANKER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "kchat", "reranker")
+)
+
+
+def _quantize(model_path: str, cache_dir: Optional[str] = None) -> str:
+    """Dynamic int8 quantization of the weights, done once per source model into cache_dir."""
+    cache_dir = cache_dir or RERANKER_CACHE_DIR
+    # keyed by the source path so different models (or revisions) don't collide
+    digest = hashlib.blake2b(os.path.realpath(model_path).encode(), digest_size=8).hexdigest()
+    name = os.path.basename(model_path).replace(".onnx", "")
+    quantized_path = os.path.join(cache_dir, f"{name}-{digest}.int8.onnx")
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        os.makedirs(cache_dir, exist_ok=True)
+        logger.info(f"Quantizing {model_path} to int8 in {cache_dir}...")
+        # workers start together: write aside and rename so none loads a half-written file
+        tmp_path = f"{quantized_path}.{os.getpid()}.tmp"
+        quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, quantized_path)
+    return quantized_path
+
+
+def _resolve_model(model_dir: Optional[str], model: str):
+    """Return (onnx_path, tokenizer_path) from a local dir or the Hugging Face cache."""
+    if model_dir:
+        return os.path.join(model_dir, "model.onnx"), os.path.join(model_dir, "tokenizer.json")
+
+    from huggingface_hub import hf_hub_download
+
+    return hf_hub_download(model, "onnx/model.onnx"), hf_hub_download(model, "tokenizer.json")
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, passage) pairs with a cross-encoder on CPU via ONNX Runtime.
+
+    Pairs are tokenized together, sorted by length and run in batches so padding
+    stays small; scores are cached per (query, passage) in an LRU.
+    """
+
+    def __init__(
+        self,
+        model_dir: Optional[str] = None,
+        model: str = DEFAULT_MODEL,
+        quantize: bool = True,
+        max_length: int = 512,
+        batch_size: int = 32,
+        cache_size: int = 50_000,
+        threads: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+    ):
+        model_path, tokenizer_path = _resolve_model(model_dir or os.getenv("RERANKER_MODEL_DIR"), model)
+        if quantize:
+            model_path = _quantize(model_path, cache_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or int(os.getenv("RERANKER_THREADS", "0"))
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+
+        self.batch_size = batch_size
+        self._cache = LRUCache(maxsize=cache_size)
+        self._lock = threading.Lock()
+
+        logger.info(f"Reranker loaded: {model_path}")
+
+    # -------------------------
+    # Scoring
+    # -------------------------
+
+    @staticmethod
+    def _key(query: str, text: str):
+        return query, hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+    def _run_batch(self, pairs: Sequence[tuple]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(list(pairs))
+        width = max(len(e.ids) for e in encodings)
+
+        ids = np.zeros((len(encodings), width), dtype=np.int64)
+        mask = np.zeros_like(ids)
+        types = np.zeros_like(ids)
+        for row, e in enumerate(encodings):
+            n = len(e.ids)
+            ids[row, :n] = e.ids
+            mask[row, :n] = e.attention_mask
+            types[row, :n] = e.type_ids
+
+        feeds = {"input_ids": ids, "attention_mask": mask, "token_type_ids": types}
+        logits = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        return logits.reshape(len(encodings), -1)[:, 0]
+
+    def score_pairs(self, pairs: Sequence[tuple]) -> List[float]:
+        """Scores for (query, text) pairs, in input order."""
+        scores = [None] * len(pairs)
+        missing = []
+
+        with self._lock:
+            for i, (query, text) in enumerate(pairs):
+                cached = self._cache.get(self._key(query, text))
+                record_cache("rerank", cached is not None)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    scores[i] = cached
+
+        # similar lengths in the same batch → little padding
+        missing.sort(key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            with stage("rerank"):
+                batch_scores = self._run_batch([pairs[i] for i in batch])
+            with self._lock:
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = float(score)
+                    self._cache[self._key(*pairs[i])] = scores[i]
+
+        return scores
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        return self.score_pairs([(query, text) for text in texts])
+
+    def rerank(self, query: str, documents: Sequence[Document], top_n: int = 5) -> List[Document]:
+        """Return the top_n documents by cross-encoder score, best first."""
+        if not documents:
+            return []
+        scores = self.score(query, [d.page_content for d in documents])
+        ranked = sorted(zip(scores, range(len(documents))), reverse=True)[:top_n]
+        results = []
+        for score, i in ranked:
+            doc = documents[i]
+            results.append(Document(page_content=doc.page_content, metadata={**doc.metadata, "rerank_score": score}))
+        return results
+
+
+class RerankBatcher:
+    """
+    Coalesces concurrent async rerank calls into shared model batches.
+
+    Pairs from every caller that arrives within max_wait_ms (or until
+    max_batch pairs are waiting) are scored in one run on a worker thread.
+    """
+
+    def __init__(self, reranker: CrossEncoderReranker, max_wait_ms: float = 5, max_batch: int = 128):
+        self.reranker = reranker
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self._pending = []  # (pairs, future)
+        self._pending_pairs = 0
+        self._flush_handle = None
+        self._tasks = set()  # batches in flight, see spawn()
+
+    async def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(([(query, t) for t in texts], future))
+        self._pending_pairs += len(texts)
+
+        if self._pending_pairs >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending, self._pending_pairs = self._pending, [], 0
+        if pending:
+            spawn(self._run(pending), self._tasks)
+
+    async def _run(self, pending):
+        pairs = [pair for request_pairs, _ in pending for pair in request_pairs]
+        try:
+            scores = await asyncio.to_thread(self.reranker.score_pairs, pairs)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for request_pairs, future in pending:
+            if not future.done():
+                future.set_result(scores[offset:offset + len(request_pairs)])
+            offset += len(request_pairs)
+
+    async def rerank(self, query: str, documents: Sequence[Document], top_n: int = 5) -> List[Document]:
+        scores = await self.score(query, [d.page_content for d in documents])
+        ranked = sorted(zip(scores, range(len(documents))), reverse=True)[:top_n]
+        return [
+            Document(page_content=documents[i].page_content, metadata={**documents[i].metadata, "rerank_score": s})
+            for s, i in ranked
+        ]
+
+
+# -------------------------
+# Retrieval with re-ranking
+# -------------------------
+
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "40"))
+
+
+def retrieve(query: str, k: int = 5, candidates: int = RERANK_CANDIDATES, school: Optional[str] = None) -> List[Document]:
+    """Cheap wide vector search for `candidates` hits, then keep the k best by cross-encoder."""
+    from app.services.providers import get_reranker, get_vector_store
+
+    hits = get_vector_store().similarity_search(query, k=max(k, candidates), school=school)
+    return get_reranker().rerank(query, hits, top_n=k)
+
+
+async def aretrieve(
+    query: str, k: int = 5, candidates: int = RERANK_CANDIDATES, school: Optional[str] = None
+) -> List[Document]:
+    """Async retrieve(); concurrent queries share reranker batches."""
+    from app.services.providers import get_rerank_batcher, get_vector_store
+
+    hits = await get_vector_store().asimilarity_search(query, k=max(k, candidates), school=school)
+    return await get_rerank_batcher().rerank(query, hits, top_n=k)
@@ -0,0 +1,207 @@
+"""
+Rebuild a Qdrant collection from the worker's artifacts (app.utils.artifacts).
+
+    python -m app.services.artifact_loader --collection my-collection-v2
+    python -m app.services.artifact_loader --collection my-collection-v2 --recreate --workers 16
+    python -m app.services.artifact_loader --collection my-collection-v2 --document <id> --document <id>
+    python -m app.services.artifact_loader --collection my-collection-v2 --include-retired
+
+For a new HNSW config, quantization or a lost node: the target collection is
+created the way the worker would create it (current TENANT_PLACEMENT, vector
+size, payload indexes), indexing is paused, every document's vectors are
+memory-mapped and its chunks streamed into batched upserts on a thread pool,
+then indexing is switched back on and Qdrant builds the graph once. Point ids
+and payloads are the ones the worker wrote, and there are no OpenAI calls.
+
+Documents the lifecycle job would retire (expired, or superseded by a newer
+version, see app.services.lifecycle) are skipped unless --include-retired.
+"""
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Set
+
+from langchain_core.documents import Document
+from qdrant_client.models import Batch, OptimizersConfigDiff
+
+from app.services.lifecycle import find_superseded
+from app.services.qdrant_client import (
+    IN_MEMORY,
+    PLACEMENT_COLLECTION,
+    VectorStoreService,
+    document_payload,
+    tenant_key,
+    today_utc,
+)
+from app.utils.artifacts import ARTIFACT_DIR, document_dir, iter_chunks, iter_document_dirs, load_vectors, read_manifest
+
+logger = logging.getLogger("artifact_loader")
+
+# Qdrant's default; used when a collection reports none
+DEFAULT_INDEXING_THRESHOLD = 20000
+
+
+def find_retired(paths: Iterable[str], today: str) -> Set[str]:
+    """Artifact directories of documents that are expired or superseded as of `today`."""
+    # every chunk of a document carries the same record fields; the first one is enough
+    heads = {path: (next(iter_chunks(path), None) or {}).get("metadata") or {} for path in paths}
+    expired = {
+        path for path, meta in heads.items()
+        if meta.get("effective_till") and str(meta["effective_till"])[:10] < today[:10]
+    }
+    live = {path: meta for path, meta in heads.items() if path not in expired}
+    return expired | find_superseded(live, today)
+
+
+class BulkLoader:
+    def __init__(self, store: VectorStoreService, workers: int = 8, batch_size: int = 256):
+        self.store = store
+        self.batch_size = batch_size
+        if store.url == IN_MEMORY:
+            workers = 1  # the in-process client is not thread-safe
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upsert")
+        self.max_in_flight = workers * 2
+        self.in_flight = set()
+        self.paused = {}  # collection -> indexing threshold to restore
+        self.points = 0
+
+    def _pause_indexing(self, collection_name: str):
+        """Upload without building HNSW per segment; the graph is built once at the end."""
+        if collection_name in self.paused:
+            return
+        config = self.store.client.get_collection(collection_name).config.optimizer_config
+        self.paused[collection_name] = config.indexing_threshold or DEFAULT_INDEXING_THRESHOLD
+        self.store.client.update_collection(
+            collection_name, optimizers_config=OptimizersConfigDiff(indexing_threshold=0)
+        )
+
+    def resume_indexing(self):
+        for collection_name, threshold in self.paused.items():
+            self.store.client.update_collection(
+                collection_name, optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold)
+            )
+        self.paused = {}
+
+    def _submit(self, collection_name: str, kwargs: dict, ids: list, vectors, payloads: list):
+        if len(self.in_flight) >= self.max_in_flight:
+            done, self.in_flight = wait(self.in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()  # surface upload errors straight away
+        batch = Batch(ids=ids, vectors=vectors.tolist(), payloads=payloads)
+        self.in_flight.add(
+            self.pool.submit(self.store.client.upsert, collection_name, points=batch, wait=True, **kwargs)
+        )
+        self.points += len(ids)
+
+    def load_document(self, path: str) -> int:
+        manifest = read_manifest(path)
+        if manifest["count"] == 0:
+            return 0
+        if manifest["dim"] != self.store.vector_size:
+            raise ValueError(
+                f"{path}: vectors have {manifest['dim']} dimensions, the collection expects {self.store.vector_size}"
+            )
+        if manifest["embedding_model"] != self.store.embedding_model:
+            raise ValueError(
+                f"{path}: embedded with {manifest['embedding_model']}, the collection uses {self.store.embedding_model}"
+            )
+
+        vectors = load_vectors(path)
+        start = 0
+        ids, payloads = [], []
+        target = None
+        for chunk in iter_chunks(path):
+            if target is None:
+                # all chunks of a document belong to the same school
+                target = self.store.write_target(tenant_key(chunk["metadata"].get("school")))
+                self._pause_indexing(target[0])
+            ids.append(chunk["id"])
+            # the same payload layout add_documents writes
+            payloads.append(document_payload(Document(page_content=chunk["page_content"], metadata=chunk["metadata"])))
+            if len(ids) == self.batch_size:
+                self._submit(*target, ids, vectors[start:start + len(ids)], payloads)
+                start += len(ids)
+                ids, payloads = [], []
+        if ids:
+            self._submit(*target, ids, vectors[start:start + len(ids)], payloads)
+            start += len(ids)
+
+        if start != len(vectors):
+            raise ValueError(f"{path}: {start} chunks but {len(vectors)} vectors")
+        return start
+
+    def finish(self):
+        done, _ = wait(self.in_flight)
+        self.in_flight = set()
+        for future in done:
+            future.result()
+        self.pool.shutdown()
+
+
+def _prepare_collection(args) -> VectorStoreService:
+    from app.services.providers import EMBEDDING_MODEL
+
+    store = VectorStoreService(collection_name=args.collection, embedding_model=EMBEDDING_MODEL)
+    existing = [store.collection_name]
+    if store.placement == PLACEMENT_COLLECTION:
+        existing += store.tenant_collections()
+    points = sum(store.client.count(name, exact=False).count for name in existing)
+    if points and not args.recreate:
+        sys.exit(f"'{args.collection}' already holds ~{points} points; load into a fresh collection or pass --recreate")
+    if points:
+        for name in existing:
+            logger.warning(f"Deleting collection: {name}")
+            store.client.delete_collection(name)
+        # start over with an empty collection in the configured layout
+        store = VectorStoreService(collection_name=args.collection, embedding_model=EMBEDDING_MODEL)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load worker artifacts into a Qdrant collection.")
+    parser.add_argument("--collection", required=True, help="collection to build")
+    parser.add_argument("--dir", default=ARTIFACT_DIR, help="artifact directory (default: ARTIFACT_DIR)")
+    parser.add_argument("--document", action="append", help="only load these document ids (repeatable)")
+    parser.add_argument("--workers", type=int, default=8, help="parallel upsert requests")
+    parser.add_argument("--batch-size", type=int, default=256, help="points per upsert")
+    parser.add_argument("--recreate", action="store_true", help="delete the collection first if it has points")
+    parser.add_argument("--include-retired", action="store_true",
+                        help="also load expired and superseded documents")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    if not args.dir:
+        sys.exit("no artifact directory; set ARTIFACT_DIR or pass --dir")
+    if args.document:
+        paths = [document_dir(args.dir, document_id) for document_id in args.document]
+    else:
+        paths = list(iter_document_dirs(args.dir))
+    if not args.include_retired:
+        retired = find_retired(paths, today_utc())
+        if retired:
+            logger.info(f"Skipping {len(retired)} expired or superseded documents")
+            paths = [path for path in paths if path not in retired]
+
+    store = _prepare_collection(args)
+    loader = BulkLoader(store, workers=args.workers, batch_size=args.batch_size)
+    start = time.perf_counter()
+    documents = 0
+    try:
+        for path in paths:
+            loader.load_document(path)
+            documents += 1
+            if documents % 100 == 0:
+                logger.info(f"{documents}/{len(paths)} documents, {loader.points} points queued")
+        loader.finish()
+    finally:
+        loader.resume_indexing()
+
+    elapsed = time.perf_counter() - start
+    print(f"loaded {loader.points} points from {documents} documents into '{args.collection}' "
+          f"in {elapsed:.1f}s ({loader.points / elapsed if elapsed else 0:.0f} points/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from contextlib import nullcontext
+from typing import AsyncIterator, List, Optional
+
+from langchain_core.documents import Document
+
+from app.utils import file_types
+from app.utils.chunking import SectionChunker
+from app.utils.native_partition import partition_native_sync
+from app.utils.pdf_render import PdfPages
+from app.utils.ai_enhanced_docs import iter_summarised_chunks
+from app.services.metrics import record_chunks, stage
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------
+# Stages
+# -------------------------
+
+async def iter_pdf_pages(data: bytes, limiter=None) -> AsyncIterator[List]:
+    """
+    Partition a PDF page by page, yielding each page's elements as soon as it is done.
+    `limiter` (an async context manager) bounds pages partitioned at once across jobs.
+    """
+    pages = await asyncio.to_thread(PdfPages, data)
+    total = len(pages)
+
+    try:
+        for page_index in range(total):
+            async with limiter or nullcontext():
+                with stage("partition"):
+                    elements = await asyncio.to_thread(pages.partition_page, page_index)
+            logger.debug(f"Partitioned page {page_index + 1}/{total}: {len(elements)} elements")
+            yield elements
+    finally:
+        pages.close()
+
+
+async def iter_native_pages(
+    data: bytes, file_type: str, filename: Optional[str] = None, limiter=None
+) -> AsyncIterator[List]:
+    """Partition a DOCX/PPTX/XLSX/HTML/text document from its own structure, in one pass."""
+    async with limiter or nullcontext():
+        with stage("partition"):
+            elements = await asyncio.to_thread(partition_native_sync, data, file_type, filename)
+    logger.debug(f"Partitioned {file_type} natively: {len(elements)} elements")
+    yield elements
+
+
+def iter_document_pages(
+    data: bytes, file_type: str, filename: Optional[str] = None, limiter=None
+) -> AsyncIterator[List]:
+    if file_type == file_types.PDF:
+        return iter_pdf_pages(data, limiter)
+    if file_type == file_types.UNKNOWN:
+        raise ValueError(f"Unsupported file type for {filename or 'document'}")
+    return iter_native_pages(data, file_type, filename, limiter)
+
+
+async def iter_chunks(pages: AsyncIterator[List], chunker: SectionChunker):
+    """Feed page elements into the chunker and yield chunks as sections close."""
+    async for elements in pages:
+        with stage("chunk"):
+            chunks = chunker.feed(elements)
+        for chunk in chunks:
+            yield chunk
+
+    with stage("chunk"):
+        chunks = chunker.flush()
+    for chunk in chunks:
+        yield chunk
+
+
+async def upsert_in_batches(
+    documents: AsyncIterator[Document],
+    vector_store,
+    batch_size: int = 32,
+    artifacts=None,
+) -> int:
+    """
+    Upload documents in rolling batches as they arrive. Returns the number uploaded.
+    With an ArtifactWriter, each batch's chunks and vectors are kept as well.
+    """
+    batch = []
+    uploaded = 0
+
+    async def flush():
+        nonlocal batch, uploaded
+        with stage("upsert"):
+            ids, vectors = await asyncio.to_thread(vector_store.add_documents, batch)
+        if artifacts is not None:
+            with stage("artifacts"):
+                await asyncio.to_thread(artifacts.add, ids, batch, vectors)
+        record_chunks(len(batch))
+        uploaded += len(batch)
+        batch = []
+
+    async for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+
+    return uploaded
+
+
+# -------------------------
+# Pipeline
+# -------------------------
+
+async def ingest_document(
+    data: bytes,
+    record: dict,
+    vector_store,
+    chunker: SectionChunker,
+    filename: Optional[str] = None,
+    file_type: Optional[str] = None,
+    summary_concurrency: int = 10,
+    batch_size: int = 32,
+    partition_limiter=None,
+    summary_limiter=None,
+    artifacts=None,
+) -> int:
+    """
+    Detect the file type and ingest it: PDFs page by page through hi_res,
+    Office and HTML documents through their native partitioners.
+    The optional limiters (see app.workers.admission) replace the fixed
+    per-job concurrency with limits shared by every job in the worker.
+    `artifacts` (an ArtifactWriter) keeps what was upserted for offline rebuilds.
+    """
+    file_type = file_type or file_types.detect_file_type(data, filename)
+    logger.info(f"Ingesting {filename or record.get('id')} as {file_type}")
+
+    pages = iter_document_pages(data, file_type, filename, partition_limiter)
+    chunks = iter_chunks(pages, chunker)
+    documents = iter_summarised_chunks(chunks, record, concurrency=summary_concurrency, limiter=summary_limiter)
+    return await upsert_in_batches(documents, vector_store, batch_size=batch_size, artifacts=artifacts)
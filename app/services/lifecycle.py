@@ -0,0 +1,249 @@
+"""
+Document lifecycle: retire chunks of expired and superseded documents.
+
+    python -m app.services.lifecycle [--dry-run] [--delete] [--today 2026-01-31]
+    python -m app.services.lifecycle --every 24
+
+A document is expired once its effective_till is before today. It is
+superseded when a newer document of the same series (school, course,
+document_type, title) has come into effect. Both are found with
+payload-indexed filters, facets and grouped queries over
+metadata.document_id, so the job never scrolls the whole collection. Their points are archived (copied with vectors
+into archive__<collection>, then deleted) or, with --delete, just deleted, a
+batch of documents at a time. Afterwards the optimizer is told to vacuum the
+deleted points.
+
+Searches already skip out-of-window chunks (see active_filter), so the job is
+about reclaiming space and keeping HNSW graphs small, not correctness.
+"""
+import argparse
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from qdrant_client.models import (
+    DatetimeRange,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    MatchAny,
+    OptimizersConfigDiff,
+    PointStruct,
+)
+
+from app.services.qdrant_client import (
+    DOCUMENT_ID_FIELD,
+    EFFECTIVE_TILL_FIELD,
+    PLACEMENT_COLLECTION,
+    VectorStoreService,
+    today_utc,
+)
+
+logger = logging.getLogger("lifecycle")
+
+ARCHIVE_PREFIX = "archive__"
+# documents handled per delete/archive round trip
+DOCUMENT_BATCH = 50
+SCROLL_BATCH = 256
+# upper bound on distinct document_ids returned by one facet call
+FACET_LIMIT = 100_000
+# documents whose heads are fetched by one grouped query
+GROUP_BATCH = 1000
+# fields that identify a document series, and what a newer version is compared on
+SERIES_FIELDS = ("school", "course", "document_type", "title")
+# vacuum segments once this share of their points is deleted (Qdrant default is 0.2)
+DELETED_THRESHOLD = 0.1
+VACUUM_MIN_VECTORS = 100
+
+
+def _store() -> VectorStoreService:
+    from app.services.providers import COLLECTION_NAME, EMBEDDING_MODEL
+
+    return VectorStoreService(collection_name=COLLECTION_NAME, embedding_model=EMBEDDING_MODEL)
+
+
+def _documents(document_ids: Iterable[str]) -> Filter:
+    return Filter(must=[FieldCondition(key=DOCUMENT_ID_FIELD, match=MatchAny(any=list(document_ids)))])
+
+
+def _batches(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# -------------------------
+# Finding retired documents
+# -------------------------
+
+def document_ids(store: VectorStoreService, collection_name: str, facet_filter: Optional[Filter] = None) -> Set[str]:
+    """Distinct document_ids matching a filter, from the keyword index (no scroll)."""
+    hits = store.client.facet(
+        collection_name, key=DOCUMENT_ID_FIELD, facet_filter=facet_filter, limit=FACET_LIMIT, exact=True,
+    ).hits
+    return {hit.value for hit in hits}
+
+
+def find_expired(store: VectorStoreService, collection_name: str, today: str) -> Set[str]:
+    expired = Filter(must=[FieldCondition(key=EFFECTIVE_TILL_FIELD, range=DatetimeRange(lt=today))])
+    return document_ids(store, collection_name, expired)
+
+
+def document_heads(store: VectorStoreService, collection_name: str, ids: Iterable[str]) -> Dict[str, dict]:
+    """
+    document_id -> the metadata of one of its chunks (all chunks of a document share it).
+    One grouped query (a chunk per document_id group) per GROUP_BATCH documents.
+    """
+    fields = [DOCUMENT_ID_FIELD, *(f"metadata.{name}" for name in (*SERIES_FIELDS, "effective_from"))]
+    heads = {}
+    for batch in _batches(sorted(ids), GROUP_BATCH):
+        groups = store.client.query_points_groups(
+            collection_name,
+            group_by=DOCUMENT_ID_FIELD,
+            query_filter=_documents(batch),
+            group_size=1,
+            limit=len(batch),
+            with_payload=fields,
+            with_vectors=False,
+        ).groups
+        for group in groups:
+            if group.hits:
+                heads[group.id] = (group.hits[0].payload or {}).get("metadata") or {}
+    return heads
+
+
+def find_superseded(heads: Dict[str, dict], today: str) -> Set[str]:
+    """
+    Documents with a newer version of the same series already in effect.
+    Documents without an effective_from or missing any series field are never
+    treated as superseded or superseding, and versions effective on the same day
+    are all kept.
+    """
+    today = today[:10]
+    series = defaultdict(list)
+    for document_id, meta in heads.items():
+        effective_from = meta.get("effective_from")
+        key = tuple(str(meta.get(field) or "").strip().lower() for field in SERIES_FIELDS)
+        if effective_from and all(key):
+            series[key].append((str(effective_from)[:10], document_id))
+
+    superseded = set()
+    for versions in series.values():
+        in_effect = [v for v in versions if v[0] <= today]
+        if not in_effect:
+            continue
+        latest_from = max(in_effect)[0]
+        superseded.update(document_id for effective_from, document_id in versions if effective_from < latest_from)
+    return superseded
+
+
+# -------------------------
+# Retiring
+# -------------------------
+
+def delete_documents(store: VectorStoreService, collection_name: str, ids: List[str]):
+    for batch in _batches(ids, DOCUMENT_BATCH):
+        store.client.delete(collection_name, points_selector=FilterSelector(filter=_documents(batch)), wait=True)
+
+
+def archive_documents(store: VectorStoreService, collection_name: str, ids: List[str]) -> int:
+    """Copy the documents' points, vectors included, into the archive collection, then delete them."""
+    archive_name = f"{ARCHIVE_PREFIX}{collection_name}"
+    store._ensure_collection(archive_name)
+
+    archived = 0
+    for batch in _batches(ids, DOCUMENT_BATCH):
+        offset = None
+        while True:
+            records, offset = store.client.scroll(
+                collection_name, scroll_filter=_documents(batch), limit=SCROLL_BATCH, offset=offset,
+                with_payload=True, with_vectors=True,
+            )
+            if records:
+                points = [PointStruct(id=r.id, vector=r.vector, payload=r.payload) for r in records]
+                store.client.upsert(archive_name, points=points, wait=True)
+                archived += len(points)
+            if offset is None:
+                break
+        # only delete once every point of the batch is safely in the archive
+        store.client.delete(collection_name, points_selector=FilterSelector(filter=_documents(batch)), wait=True)
+    return archived
+
+
+def trigger_optimizer(store: VectorStoreService, collection_name: str):
+    """Lower the vacuum threshold so segments with the freshly deleted points get rebuilt."""
+    store.client.update_collection(
+        collection_name,
+        optimizers_config=OptimizersConfigDiff(
+            deleted_threshold=DELETED_THRESHOLD,
+            vacuum_min_vector_number=VACUUM_MIN_VECTORS,
+        ),
+    )
+
+
+def run_lifecycle(
+    store: Optional[VectorStoreService] = None,
+    today: Optional[str] = None,
+    archive: bool = True,
+    dry_run: bool = False,
+) -> dict:
+    store = store or _store()
+    today = today or today_utc()
+
+    collections = [store.collection_name]
+    if store.placement == PLACEMENT_COLLECTION:
+        collections += store.tenant_collections()
+
+    report = {"today": today, "collections": {}}
+    for collection_name in collections:
+        # indexes make the range filters and facets below cheap; a no-op when they exist
+        store.ensure_payload_indexes(collection_name)
+
+        expired = find_expired(store, collection_name, today)
+        in_effect_or_future = document_ids(store, collection_name) - expired
+        superseded = find_superseded(document_heads(store, collection_name, in_effect_or_future), today)
+        retired = sorted(expired | superseded)
+
+        points = 0
+        if retired:
+            points = store.client.count(collection_name, count_filter=_documents(retired), exact=True).count
+        report["collections"][collection_name] = {
+            "expired": len(expired), "superseded": len(superseded), "points": points,
+        }
+        logger.info(
+            f"{collection_name}: {len(expired)} expired, {len(superseded)} superseded documents ({points} points)"
+        )
+        if dry_run or not retired:
+            continue
+
+        if archive:
+            archive_documents(store, collection_name, retired)
+        else:
+            delete_documents(store, collection_name, retired)
+        trigger_optimizer(store, collection_name)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive or delete chunks of expired and superseded documents.")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be retired")
+    parser.add_argument("--delete", action="store_true", help="delete points instead of archiving them")
+    parser.add_argument("--today", help="treat this date (YYYY-MM-DD) as today")
+    parser.add_argument("--every", type=float, help="keep running, once every this many hours")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    today = f"{args.today}T00:00:00Z" if args.today else None
+    store = _store()
+    while True:
+        report = run_lifecycle(store, today=today, archive=not args.delete, dry_run=args.dry_run)
+        for collection_name, counts in report["collections"].items():
+            print(f"{collection_name:40} expired {counts['expired']:>5}  superseded {counts['superseded']:>5}  "
+                  f"points {counts['points']:>7}")
+        if not args.every:
+            break
+        time.sleep(args.every * 3600)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+import orjson
+import psutil
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# hi_res partitioning of a dense page and a gpt-4o vision call both live in the
+# multi-second range, so the buckets go well past the usual web defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+# -------------------------
+# Minimal Prometheus registry
+# -------------------------
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, *args, function=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # optional callable evaluated at scrape time (unlabelled gauges only)
+        self._function = function
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        if self._function is not None:
+            self.set(self._function())
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets=LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        self._counts: Dict[tuple, list] = {}
+        self._sums: Dict[tuple, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0) + value
+
+    def _samples(self):
+        lines = []
+        with self._lock:
+            items = [(k, list(c), self._sums[k]) for k, c in self._counts.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: Dict[str, _Metric] = {}
+
+
+def render_prometheus() -> str:
+    return "\n".join(metric.render() for metric in list(REGISTRY.values())) + "\n"
+
+
+# -------------------------
+# Metrics
+# -------------------------
+
+_process = psutil.Process()
+
+STAGE_SECONDS = Histogram(
+    "kchat_stage_duration_seconds",
+    "Time spent per pipeline stage call (download, partition, chunk, summarise, upsert).",
+    ("stage",),
+)
+JOB_SECONDS = Histogram("kchat_job_duration_seconds", "End-to-end time per ingestion job.", ("status",))
+DOCUMENTS = Counter("kchat_documents_total", "Documents processed by the worker.", ("status",))
+CHUNKS = Counter("kchat_chunks_total", "Chunks uploaded to Qdrant.")
+LLM_TOKENS = Counter("kchat_llm_tokens_total", "Tokens used by summary LLM calls.", ("kind",))
+CACHE_REQUESTS = Counter("kchat_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+SAVED_SECONDS = Counter("kchat_saved_seconds_total", "Work skipped thanks to caches, by kind.", ("kind",))
+QUEUE_DEPTH = Gauge("kchat_queue_depth", "Jobs waiting in the Redis queue (last observed).")
+JOBS_IN_FLIGHT = Gauge("kchat_jobs_in_flight", "Ingestion jobs currently being processed.")
+JOB_RSS_GROWTH = Histogram(
+    "kchat_job_rss_growth_bytes",
+    "Peak resident memory growth above the job's starting RSS, for jobs that ran alone.",
+    buckets=tuple(2**n * 2**20 for n in range(4, 15)),  # 16 MiB .. 16 GiB
+)
+PROCESS_PEAK_RSS = Gauge("kchat_process_peak_resident_memory_bytes", "Highest resident memory sampled in this process.")
+PROCESS_RSS = Gauge(
+    "kchat_process_resident_memory_bytes",
+    "Current resident memory of this process.",
+    function=lambda: _process.memory_info().rss,
+)
+
+
+# -------------------------
+# Per-job accounting
+# -------------------------
+
+class JobStats:
+    """Per-job totals collected alongside the process-wide metrics."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        # what the job is recorded as if it finishes without raising
+        self.status = "ok"
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.chunks = 0
+        self.tokens = 0
+        self.cache_hits: Dict[str, int] = {}
+        self.cache_misses: Dict[str, int] = {}
+        self.saved: Dict[str, float] = {}
+        self.start_rss = _process.memory_info().rss
+        self.peak_rss = self.start_rss
+        # RSS is process-wide: with other jobs running, growth isn't this job's alone
+        self.overlapped = False
+
+    def sample_rss(self):
+        self.peak_rss = max(self.peak_rss, _process.memory_info().rss)
+        if _jobs_in_flight > 1:
+            self.overlapped = True
+        _note_process_peak(self.peak_rss)
+
+    @property
+    def rss_growth(self) -> int:
+        return self.peak_rss - self.start_rss
+
+    def summary(self, status: str) -> dict:
+        elapsed = time.perf_counter() - self.started
+        caches = {}
+        for name in set(self.cache_hits) | set(self.cache_misses):
+            hits = self.cache_hits.get(name, 0)
+            total = hits + self.cache_misses.get(name, 0)
+            caches[name] = round(hits / total, 4) if total else None
+        return {
+            "event": "job_finished",
+            "job_id": self.job_id,
+            "status": status,
+            "seconds": round(elapsed, 3),
+            "stages": {k: round(v, 3) for k, v in self.stages.items()},
+            "chunks": self.chunks,
+            "chunks_per_s": round(self.chunks / elapsed, 3) if elapsed else None,
+            "tokens": self.tokens,
+            "tokens_per_s": round(self.tokens / elapsed, 3) if elapsed else None,
+            "cache_hit_ratio": caches,
+            "saved_seconds": {k: round(v, 3) for k, v in self.saved.items()},
+            "rss_growth_bytes": self.rss_growth,
+            "rss_overlapped": self.overlapped,
+        }
+
+
+_jobs_in_flight = 0
+_process_peak_rss = 0
+
+
+def _note_process_peak(rss: int):
+    global _process_peak_rss
+    if rss > _process_peak_rss:
+        _process_peak_rss = rss
+        PROCESS_PEAK_RSS.set(rss)
+
+
+_current_job: ContextVar[Optional[JobStats]] = ContextVar("kchat_current_job", default=None)
+
+
+@contextmanager
+def track_job(job_id):
+    """
+    Account one ingestion job. Stages, tokens and cache lookups recorded inside
+    (including in tasks and threads started from it) are attributed to the job,
+    and a JSON summary line is logged when it finishes. A job that ends without
+    ingesting anything (e.g. handed to another lane) sets `stats.status`.
+    """
+    global _jobs_in_flight
+    stats = JobStats(job_id)
+    token = _current_job.set(stats)
+    _jobs_in_flight += 1
+    JOBS_IN_FLIGHT.inc()
+    if _jobs_in_flight > 1:
+        stats.overlapped = True
+    status = "ok"
+    try:
+        yield stats
+        status = stats.status
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _current_job.reset(token)
+        stats.sample_rss()
+        _jobs_in_flight -= 1
+        JOBS_IN_FLIGHT.dec()
+        summary = stats.summary(status)
+        JOB_SECONDS.observe(summary["seconds"], status=status)
+        if not stats.overlapped:
+            JOB_RSS_GROWTH.observe(stats.rss_growth)
+        DOCUMENTS.inc(status=status)
+        # a plain JSON object per line, for log pipelines (not the versioned envelope)
+        logger.info(orjson.dumps(summary).decode())
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage into kchat_stage_duration_seconds and the current job."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        job = _current_job.get()
+        if job is not None:
+            job.stages[name] = job.stages.get(name, 0) + elapsed
+            job.sample_rss()
+
+
+def record_chunks(count: int):
+    CHUNKS.inc(count)
+    job = _current_job.get()
+    if job is not None:
+        job.chunks += count
+
+
+def record_tokens(prompt: int = 0, completion: int = 0):
+    LLM_TOKENS.inc(prompt, kind="prompt")
+    LLM_TOKENS.inc(completion, kind="completion")
+    job = _current_job.get()
+    if job is not None:
+        job.tokens += prompt + completion
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+    job = _current_job.get()
+    if job is not None:
+        counts = job.cache_hits if hit else job.cache_misses
+        counts[cache] = counts.get(cache, 0) + 1
+
+
+def record_saved(kind: str, seconds: float):
+    """Time a cache hit avoided spending (e.g. layout inference for a page seen before)."""
+    SAVED_SECONDS.inc(seconds, kind=kind)
+    job = _current_job.get()
+    if job is not None:
+        job.saved[kind] = job.saved.get(kind, 0) + seconds
+
+
+# -------------------------
+# Worker HTTP endpoint
+# -------------------------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body = render_prometheus().encode()
+            content_type = CONTENT_TYPE
+        elif self.path == "/healthz":
+            body = b"ok"
+            content_type = "text/plain"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the worker log
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = "0.0.0.0"):
+    """Serve /metrics from a daemon thread (used by the worker, which has no web app)."""
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "9100"))
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Metrics endpoint listening on {host}:{port}/metrics")
+    return server
@@ -0,0 +1,103 @@
+"""
+Lazily constructed, cached clients.
+
+Nothing here is built at import time: the API only ever touches Redis, and
+importing supabase, langchain-openai, qdrant-client or unstructured costs
+seconds before the first request. Each getter builds its client on first use
+and returns the same instance afterwards. warmup() builds them up front for
+processes that want to pay the cost at start (the worker, before forking).
+"""
+import logging
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "my-collection")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o")
+ANSWER_MODEL = os.getenv("ANSWER_MODEL", "gpt-5.2")
+
+
+@lru_cache(maxsize=None)
+def get_supabase():
+    from supabase import create_client
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+    if not url or not key:
+        raise ValueError("Supabase URL or Key not set in environment variables.")
+    return create_client(url, key)
+
+
+@lru_cache(maxsize=None)
+def get_vector_store(collection_name: str = COLLECTION_NAME, embedding_model: str = EMBEDDING_MODEL):
+    from app.services.qdrant_client import VectorStoreService
+
+    return VectorStoreService(collection_name=collection_name, embedding_model=embedding_model)
+
+
+@lru_cache(maxsize=None)
+def get_summary_llm(model: str = SUMMARY_MODEL):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model=model, temperature=0, api_key=os.getenv("OPENAI_API_KEY"))
+
+
+@lru_cache(maxsize=None)
+def get_answer_llm(model: str = ANSWER_MODEL):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model=model, temperature=0, api_key=os.getenv("OPENAI_API_KEY"))
+
+
+@lru_cache(maxsize=None)
+def get_reranker():
+    from app.retrival.reranker import CrossEncoderReranker
+
+    return CrossEncoderReranker()
+
+
+@lru_cache(maxsize=None)
+def get_rerank_batcher():
+    from app.retrival.reranker import RerankBatcher
+
+    return RerankBatcher(get_reranker())
+
+
+def import_partition_stack():
+    """Import unstructured's PDF stack (torch, onnxruntime, cv2, ...) without creating any sessions."""
+    from unstructured.partition.pdf import partition_pdf  # noqa: F401
+    from unstructured_inference.models.base import get_model  # noqa: F401
+
+
+def load_partition_models():
+    """Import unstructured's PDF stack and load the layout detection model into memory."""
+    import_partition_stack()
+    from unstructured_inference.models.base import get_model
+
+    get_model()
+
+
+async def warmup_api():
+    """API start-up: check Redis is reachable, without blocking start if it isn't."""
+    from app.services import redis_queue
+
+    try:
+        await redis_queue.r.ping()
+    except Exception as e:
+        logger.warning(f"Redis not reachable during warmup: {e}")
+
+
+def warmup(partition_models: bool = True):
+    """Worker start-up: build every client (and optionally the layout model) now."""
+    get_supabase()
+    get_vector_store()
+    get_summary_llm()
+    if partition_models:
+        load_partition_models()
+    logger.info("Warmup complete")
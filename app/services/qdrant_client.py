@@ -1,12 +1,29 @@
 import os
+import re
+import asyncio
 import logging
-from typing import List, Optional
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
     Distance,
     VectorParams,
     HnswConfigDiff,
+    DatetimeRange,
+    FieldCondition,
+    Filter,
+    IsEmptyCondition,
+    IsNullCondition,
+    MatchValue,
+    PayloadField,
+    PayloadSchemaType,
+    PointStruct,
+    ShardingMethod,
 )
 from qdrant_client.http.exceptions import UnexpectedResponse
 
@@ -15,30 +32,140 @@ from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from app.services.query_cache import QueryEmbedder, SingleFlight, normalize_query
+
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# QDRANT_URL=":memory:" runs an in-process Qdrant with no credentials
+IN_MEMORY = ":memory:"
+
+# -------------------------
+# Tenant placement
+# -------------------------
+# TENANT_PLACEMENT decides where a school's chunks live:
+#   none        everything in one collection, schools filtered by payload (original layout)
+#   shard_key   one collection with custom sharding, a shard key per school (Qdrant cluster)
+#   collection  one collection per school, named <collection>__<school>
+PLACEMENT_NONE = "none"
+PLACEMENT_SHARD_KEY = "shard_key"
+PLACEMENT_COLLECTION = "collection"
+PLACEMENTS = (PLACEMENT_NONE, PLACEMENT_SHARD_KEY, PLACEMENT_COLLECTION)
+
+TENANT_PLACEMENT = os.getenv("TENANT_PLACEMENT", PLACEMENT_NONE)
+SHARDS_PER_TENANT = int(os.getenv("QDRANT_SHARDS_PER_TENANT", "1"))
+REPLICATION_FACTOR = int(os.getenv("QDRANT_REPLICATION_FACTOR", "1"))
+DEFAULT_TENANT = "unknown"
+TENANT_SEPARATOR = "__"
+# collection placement: searches without a school query every collection in parallel
+SEARCH_FANOUT = int(os.getenv("QDRANT_SEARCH_FANOUT", "8"))
+# and re-list the per-school collections at most this often (seconds)
+TENANT_LIST_TTL = float(os.getenv("QDRANT_TENANT_LIST_TTL", "60"))
+
+
+# -------------------------
+# Effective window
+# -------------------------
+# Chunks carry the record's effective_from/effective_till (dates, either may be
+# null). Searches only see chunks in effect today unless asked otherwise.
+DOCUMENT_ID_FIELD = "metadata.document_id"
+SCHOOL_FIELD = "metadata.school"
+EFFECTIVE_FROM_FIELD = "metadata.effective_from"
+EFFECTIVE_TILL_FIELD = "metadata.effective_till"
+PAYLOAD_INDEXES = {
+    DOCUMENT_ID_FIELD: PayloadSchemaType.KEYWORD,
+    SCHOOL_FIELD: PayloadSchemaType.KEYWORD,
+    EFFECTIVE_FROM_FIELD: PayloadSchemaType.DATETIME,
+    EFFECTIVE_TILL_FIELD: PayloadSchemaType.DATETIME,
+}
+SEARCH_ACTIVE_ONLY = os.getenv("SEARCH_ACTIVE_ONLY", "1") == "1"
+
+
+def today_utc() -> str:
+    """Start of the current UTC day; a document whose effective_till is today is still in effect."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT00:00:00Z")
+
+
+def _unset(field: str) -> list:
+    return [IsNullCondition(is_null=PayloadField(key=field)), IsEmptyCondition(is_empty=PayloadField(key=field))]
+
+
+def active_filter(today: Optional[str] = None) -> Filter:
+    """Chunks whose effective window contains `today`; a missing bound counts as open."""
+    today = today or today_utc()
+    return Filter(must=[
+        Filter(should=[FieldCondition(key=EFFECTIVE_FROM_FIELD, range=DatetimeRange(lte=today)), *_unset(EFFECTIVE_FROM_FIELD)]),
+        Filter(should=[FieldCondition(key=EFFECTIVE_TILL_FIELD, range=DatetimeRange(gte=today)), *_unset(EFFECTIVE_TILL_FIELD)]),
+    ])
+
+
+def _combine(*filters: Optional[Filter]) -> Optional[Filter]:
+    filters = [f for f in filters if f is not None]
+    if not filters:
+        return None
+    return filters[0] if len(filters) == 1 else Filter(must=filters)
+
+
+def document_payload(document: Document) -> dict:
+    """Point payload in the layout QdrantVectorStore reads back."""
+    return {
+        QdrantVectorStore.CONTENT_KEY: document.page_content,
+        QdrantVectorStore.METADATA_KEY: document.metadata,
+    }
+
+
+# namespace for deterministic chunk point ids (uuid5)
+POINT_ID_NAMESPACE = uuid.UUID("6f1c4c1e-2b7a-5d8e-9a41-3c0d7e5b9f20")
+
+
+def chunk_point_id(document_id, version, index: int) -> str:
+    """
+    Point id of a document version's index-th chunk. Re-ingesting the same
+    version (a retried job or upsert) overwrites its points instead of adding copies.
+    """
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{document_id}:{version or ''}:{index}"))
+
+
+def tenant_key(school) -> str:
+    """Shard key / collection suffix for a school: "School of Law" -> "school_of_law"."""
+    key = re.sub(r"[^a-z0-9]+", "_", str(school or "").lower()).strip("_")
+    return key or DEFAULT_TENANT
+
+
 class VectorStoreService:
     def __init__(
         self,
         collection_name: Optional[str] = None,
         embedding_model: Optional[str] = None,
         vector_size: int = 3072,  # text-embedding-3-large
+        placement: Optional[str] = None,
     ):
         # 1. Fail fast on missing credentials
         self.url = os.getenv("QDRANT_URL")
         self.api_key = os.getenv("QDRANT_API_KEY")
-        if not self.url or not self.api_key:
+        if self.url != IN_MEMORY and (not self.url or not self.api_key):
             raise ValueError("QDRANT_URL and QDRANT_API_KEY must be set in the environment.")
 
         self.collection_name = collection_name or os.getenv("QDRANT_COLLECTION", "default_collection")
         self.embedding_model = embedding_model or os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
         self.vector_size = vector_size
+        self.placement = placement or TENANT_PLACEMENT
+        if self.placement not in PLACEMENTS:
+            raise ValueError(f"TENANT_PLACEMENT must be one of {PLACEMENTS}, got {self.placement!r}")
+        self._searches = SingleFlight("similarity_search")
+        self._tenant_lock = threading.Lock()
+        self._shard_keys = set()
+        self._stores: Dict[str, QdrantVectorStore] = {}
+        self._ensured = set()  # tenant collections known to exist
+        self._listed: Optional[Tuple[float, List[str]]] = None
+        self._fanout: Optional[ThreadPoolExecutor] = None
 
         try:
             self.client = self._init_client()
             self._ensure_collection()
             self.vector_store = self._init_langchain_store()
+            if self.placement == PLACEMENT_SHARD_KEY:
+                self._shard_keys = self.list_shard_keys()
             logger.info(f"VectorStoreService initialized for collection: {self.collection_name}")
         except Exception as e:
             logger.error(f"Failed to initialize VectorStoreService: {e}")
@@ -49,18 +176,30 @@ class VectorStoreService:
     # -------------------------
 
     def _init_client(self) -> QdrantClient:
+        if self.url == IN_MEMORY:
+            # Local in-process Qdrant, used by tests and benchmarks
+            return QdrantClient(location=IN_MEMORY)
         return QdrantClient(
             url=self.url,
             api_key=self.api_key,
             timeout=15.0, # Slightly higher timeout for production
         )
 
-    def _ensure_collection(self):
+    def _ensure_collection(self, collection_name: Optional[str] = None):
+        collection_name = collection_name or self.collection_name
+        # custom sharding only applies to the shared collection; tenant collections use the defaults
+        sharding = {}
+        if self.placement == PLACEMENT_SHARD_KEY and collection_name == self.collection_name:
+            sharding = dict(
+                sharding_method=ShardingMethod.CUSTOM,
+                shard_number=SHARDS_PER_TENANT,
+                replication_factor=REPLICATION_FACTOR,
+            )
         try:
-            if not self.client.collection_exists(self.collection_name):
-                logger.info(f"Collection '{self.collection_name}' not found. Creating it...")
+            if not self.client.collection_exists(collection_name):
+                logger.info(f"Collection '{collection_name}' not found. Creating it...")
                 self.client.create_collection(
-                    collection_name=self.collection_name,
+                    collection_name=collection_name,
                     vectors_config=VectorParams(
                         size=self.vector_size,
                         distance=Distance.COSINE,
@@ -69,55 +208,253 @@ class VectorStoreService:
                         m=32,
                         ef_construct=256,
                     ),
+                    **sharding,
                 )
-                logger.info(f"Collection '{self.collection_name}' created successfully.")
+                self.ensure_payload_indexes(collection_name)
+                logger.info(f"Collection '{collection_name}' created successfully.")
+            elif sharding:
+                self._require_custom_sharding(collection_name)
         except UnexpectedResponse as e:
             logger.error(f"Qdrant API error while ensuring collection: {e}")
             raise
 
+    def _require_custom_sharding(self, collection_name: str):
+        """Shard keys can only be added to a collection created with custom sharding."""
+        params = self.client.get_collection(collection_name).config.params
+        if params.sharding_method != ShardingMethod.CUSTOM:
+            raise ValueError(
+                f"Collection '{collection_name}' exists without custom sharding, so TENANT_PLACEMENT=shard_key "
+                f"can't add shard keys to it. Copy it into a new collection with "
+                f"`python -m app.services.tenant_admin migrate` or use another placement."
+            )
+
+    def ensure_payload_indexes(self, collection_name: Optional[str] = None):
+        """Index the fields used by tenant and effective-window filters. Safe to repeat."""
+        for field, schema in PAYLOAD_INDEXES.items():
+            self.client.create_payload_index(collection_name or self.collection_name, field, field_schema=schema)
+
     def _init_langchain_store(self) -> QdrantVectorStore:
         embeddings = OpenAIEmbeddings(
             model=self.embedding_model,
             max_retries=3 # Built-in Langchain retries for OpenAI rate limits
         )
+        # Query embeddings are cached and coalesced; documents go straight to OpenAI
+        self.query_embedder = QueryEmbedder(embeddings)
+        self.embeddings = embeddings
 
         return QdrantVectorStore(
             client=self.client,
             collection_name=self.collection_name,
             embedding=embeddings,
+            # the collection was created above with vector_size; validating it
+            # would cost an embedding call per store
+            validate_collection_config=False,
         )
 
+    # -------------------------
+    # Tenant routing
+    # -------------------------
+
+    def tenant_collection(self, tenant: str) -> str:
+        return f"{self.collection_name}{TENANT_SEPARATOR}{tenant}"
+
+    def tenant_collections(self) -> List[str]:
+        prefix = self.collection_name + TENANT_SEPARATOR
+        return sorted(c.name for c in self.client.get_collections().collections if c.name.startswith(prefix))
+
+    def _searchable_collections(self) -> List[str]:
+        """The shared and per-school collections, re-listed at most every TENANT_LIST_TTL seconds."""
+        now = time.monotonic()
+        with self._tenant_lock:
+            if self._listed is None or now - self._listed[0] > TENANT_LIST_TTL:
+                self._listed = (now, [self.collection_name, *self.tenant_collections()])
+            return self._listed[1]
+
+    def list_shard_keys(self) -> set:
+        """Shard keys of the shared collection, as reported by the cluster."""
+        info = self.client.http.distributed_api.collection_cluster_info(self.collection_name).result
+        return {s.shard_key for s in [*info.local_shards, *info.remote_shards] if s.shard_key is not None}
+
+    def _ensure_shard_key(self, tenant: str):
+        with self._tenant_lock:
+            if tenant in self._shard_keys:
+                return
+            try:
+                self.client.create_shard_key(
+                    self.collection_name,
+                    tenant,
+                    shards_number=SHARDS_PER_TENANT,
+                    replication_factor=REPLICATION_FACTOR,
+                )
+                logger.info(f"Created shard key '{tenant}' in '{self.collection_name}'")
+            except UnexpectedResponse as e:
+                # another worker created it first
+                if "already exists" not in str(e):
+                    raise
+            self._shard_keys.add(tenant)
+
+    def _store(self, collection_name: str) -> QdrantVectorStore:
+        if collection_name == self.collection_name:
+            return self.vector_store
+        with self._tenant_lock:
+            store = self._stores.get(collection_name)
+            if store is None:
+                store = QdrantVectorStore(
+                    client=self.client,
+                    collection_name=collection_name,
+                    embedding=self.embeddings,
+                    validate_collection_config=False,
+                )
+                self._stores[collection_name] = store
+        return store
+
+    def write_target(self, tenant: str) -> Tuple[str, dict]:
+        """(collection, upsert kwargs) for a tenant's points, creating its shard key or collection if needed."""
+        if self.placement == PLACEMENT_SHARD_KEY:
+            self._ensure_shard_key(tenant)
+            return self.collection_name, {"shard_key_selector": tenant}
+        if self.placement == PLACEMENT_COLLECTION:
+            name = self.tenant_collection(tenant)
+            if name not in self._ensured:
+                self._ensure_collection(name)
+                with self._tenant_lock:
+                    self._ensured.add(name)
+                    if self._listed is not None and name not in self._listed[1]:
+                        self._listed[1].append(name)
+            return name, {}
+        return self.collection_name, {}
+
+    def read_target(self, school: str) -> Optional[Tuple[str, dict]]:
+        """(collection, query kwargs) holding one school's points; None if it has none yet."""
+        tenant = tenant_key(school)
+        if self.placement == PLACEMENT_SHARD_KEY:
+            if tenant not in self._shard_keys:
+                self._shard_keys = self.list_shard_keys()
+                if tenant not in self._shard_keys:
+                    return None
+            return self.collection_name, {"shard_key_selector": tenant}
+        if self.placement == PLACEMENT_COLLECTION:
+            name = self.tenant_collection(tenant)
+            if name not in self._ensured and name not in self._stores and not self.client.collection_exists(name):
+                return None
+            return name, {}
+        school_filter = Filter(must=[FieldCondition(key=SCHOOL_FIELD, match=MatchValue(value=school))])
+        return self.collection_name, {"filter": school_filter}
+
     # -------------------------
     # Public API
     # -------------------------
 # 2. Add Retry Logic for network resilience
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def add_documents(self, documents: List[Document]):
+    def add_documents(self, documents: List[Document]) -> Tuple[List[str], List[List[float]]]:
         """
         Adds pre-built Document objects to the vector store.
         Assumes metadata is already included in each Document.
+        Returns the point ids and vectors, in document order, so they can be
+        kept as artifacts (see app.utils.artifacts).
         """
         if not documents:
             logger.warning("add_documents called with empty documents list.")
-            return
+            return [], []
 
         try:
-            logger.info(f"Uploading {len(documents)} documents to collection '{self.collection_name}'...")
-            self.vector_store.add_documents(documents)
+            # embedded here rather than inside langchain so the vectors can be returned
+            vectors = self.embeddings.embed_documents([document.page_content for document in documents])
+            # chunks from the pipeline carry deterministic ids (chunk_point_id)
+            ids = [document.id or str(uuid.uuid4()) for document in documents]
+            points = [
+                PointStruct(id=point_id, vector=vector, payload=document_payload(document))
+                for point_id, vector, document in zip(ids, vectors, documents)
+            ]
+
+            if self.placement == PLACEMENT_NONE:
+                logger.info(f"Uploading {len(documents)} documents to collection '{self.collection_name}'...")
+                self.client.upsert(self.collection_name, points=points, wait=True)
+            else:
+                by_tenant: Dict[str, List[PointStruct]] = {}
+                for document, point in zip(documents, points):
+                    by_tenant.setdefault(tenant_key(document.metadata.get("school")), []).append(point)
+                for tenant, group in by_tenant.items():
+                    collection_name, kwargs = self.write_target(tenant)
+                    logger.info(f"Uploading {len(group)} documents to '{collection_name}' (tenant '{tenant}')...")
+                    self.client.upsert(collection_name, points=group, wait=True, **kwargs)
             logger.info("Documents added successfully.")
+            return ids, vectors
         except Exception as e:
             logger.error(f"Failed to add documents: {e}")
             raise
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=5))
-    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
-        logger.debug(f"Executing similarity search for query: '{query}' (k={k})")
+    def similarity_search(
+        self, query: str, k: int = 5, school: Optional[str] = None, active_only: bool = SEARCH_ACTIVE_ONLY
+    ) -> List[Document]:
+        """
+        Top-k chunks for a query; with `school`, only that school's shard/collection
+        is searched. Chunks outside their effective window are skipped unless active_only=False.
+        """
+        logger.debug(f"Executing similarity search for query: '{query}' (k={k}, school={school})")
         try:
-            return self.vector_store.similarity_search(query, k=k)
+            # identical concurrent queries share one embedding call and one Qdrant search
+            key = (normalize_query(query), k, school, active_only)
+            return list(self._searches.do(key, lambda: self._search(query, k, school, active_only)))
         except Exception as e:
             logger.error(f"Similarity search failed: {e}")
             raise
 
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=5))
+    async def asimilarity_search(
+        self, query: str, k: int = 5, school: Optional[str] = None, active_only: bool = SEARCH_ACTIVE_ONLY
+    ) -> List[Document]:
+        logger.debug(f"Executing async similarity search for query: '{query}' (k={k}, school={school})")
+        try:
+            key = (normalize_query(query), k, school, active_only)
+            return list(await self._searches.ado(key, lambda: self._asearch(query, k, school, active_only)))
+        except Exception as e:
+            logger.error(f"Similarity search failed: {e}")
+            raise
+
+    def _search(self, query: str, k: int, school: Optional[str], active_only: bool) -> List[Document]:
+        return self._search_by_vector(self.query_embedder.embed(query), k, school, active_only)
+
+    async def _asearch(self, query: str, k: int, school: Optional[str], active_only: bool) -> List[Document]:
+        vector = await self.query_embedder.aembed(query)
+        return await asyncio.to_thread(self._search_by_vector, vector, k, school, active_only)
+
+    def _search_by_vector(self, vector: List[float], k: int, school: Optional[str], active_only: bool) -> List[Document]:
+        window = active_filter() if active_only else None
+
+        if school is not None:
+            target = self.read_target(school)
+            if target is None:
+                return []
+            collection_name, kwargs = target
+            kwargs = {**kwargs, "filter": _combine(kwargs.get("filter"), window)}
+            return self._store(collection_name).similarity_search_by_vector(vector, k=k, **kwargs)
+
+        if self.placement != PLACEMENT_COLLECTION:
+            # shard_key without a selector searches every shard
+            return self.vector_store.similarity_search_by_vector(vector, k=k, filter=window)
+
+        # per-school collections: search them in parallel and keep the best k overall
+        def search(collection_name):
+            return self._store(collection_name).similarity_search_with_score_by_vector(vector, k=k, filter=window)
+
+        collections = self._searchable_collections()
+        if self.url == IN_MEMORY:
+            # the in-process client is not thread-safe
+            results = map(search, collections)
+        else:
+            results = self._fanout_pool().map(search, collections)
+        hits = [hit for result in results for hit in result]
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return [document for document, _ in hits[:k]]
+
+    def _fanout_pool(self) -> ThreadPoolExecutor:
+        with self._tenant_lock:
+            if self._fanout is None:
+                self._fanout = ThreadPoolExecutor(max_workers=SEARCH_FANOUT, thread_name_prefix="qdrant-search")
+            return self._fanout
+
     def delete_collection(self):
         logger.warning(f"Deleting collection: {self.collection_name}")
         try:
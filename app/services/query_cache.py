@@ -0,0 +1,191 @@
+"""
+Query-side embedding cache and request coalescing.
+
+Students ask the same questions at the same time, so the query path:
+  - caches query embeddings by normalised text, with a TTL
+  - runs concurrent identical requests once (single-flight) and shares the result
+  - sends queries that arrive within a few milliseconds as one embeddings call
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+import unicodedata
+from typing import List
+
+from cachetools import TTLCache
+
+from app.services.metrics import Counter, record_cache
+from app.utils.tasks import spawn
+
+logger = logging.getLogger(__name__)
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "10000"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+COALESCED = Counter(
+    "kchat_coalesced_requests_total", "Requests that joined an identical in-flight request.", ("kind",)
+)
+EMBED_BATCHES = Counter("kchat_query_embedding_batches_total", "Embeddings API calls made for queries.")
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case, width, whitespace and trailing punctuation don't change what is being asked."""
+    query = unicodedata.normalize("NFKC", query).lower()
+    return _SPACES.sub(" ", query).strip().rstrip("?!.").strip()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    At most one execution per key at a time; concurrent callers with the same
+    key wait for it and get the same result (or exception).
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call (threads)
+        self._futures = {}  # key -> asyncio.Future (event loop)
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            try:
+                call.value = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            COALESCED.inc(kind=self.kind)
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    async def ado(self, key, coro_fn):
+        future = self._futures.get(key)
+        if future is None:
+            future = self._futures[key] = asyncio.ensure_future(coro_fn())
+            future.add_done_callback(lambda _: self._futures.pop(key, None))
+        else:
+            COALESCED.inc(kind=self.kind)
+        # one caller giving up must not cancel the shared call
+        return await asyncio.shield(future)
+
+
+class QueryEmbedder:
+    """Cached, coalesced and micro-batched query embeddings on top of a langchain Embeddings."""
+
+    def __init__(
+        self,
+        embeddings,
+        maxsize: int = QUERY_CACHE_SIZE,
+        ttl: float = QUERY_CACHE_TTL,
+        max_wait_ms: float = EMBED_BATCH_WAIT_MS,
+        max_batch: int = EMBED_BATCH_SIZE,
+    ):
+        self.embeddings = embeddings
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight("query_embedding")
+        self._pending = {}  # normalised query -> future, waiting for the next batch
+        self._flush_handle = None
+        self._tasks = set()  # batches in flight, see spawn()
+
+    def _cached(self, key: str):
+        with self._lock:
+            vector = self._cache.get(key)
+        record_cache("query_embedding", vector is not None)
+        return vector
+
+    def _store(self, key: str, vector: List[float]):
+        with self._lock:
+            self._cache[key] = vector
+
+    # -------------------------
+    # Sync
+    # -------------------------
+
+    def embed(self, query: str) -> List[float]:
+        key = normalize_query(query)
+        vector = self._cached(key)
+        if vector is not None:
+            return vector
+
+        def compute():
+            EMBED_BATCHES.inc()
+            vector = self.embeddings.embed_query(key)
+            self._store(key, vector)
+            return vector
+
+        return self._flight.do(key, compute)
+
+    # -------------------------
+    # Async, batched
+    # -------------------------
+
+    async def aembed(self, query: str) -> List[float]:
+        key = normalize_query(query)
+        vector = self._cached(key)
+        if vector is not None:
+            return vector
+        return await self._flight.ado(key, lambda: self._enqueue(key))
+
+    def _enqueue(self, key: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = future
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        if pending:
+            spawn(self._run(pending), self._tasks)
+
+    async def _run(self, pending: dict):
+        keys = list(pending)
+        try:
+            EMBED_BATCHES.inc()
+            vectors = await self.embeddings.aembed_documents(keys)
+        except Exception as e:
+            logger.error(f"Query embedding batch of {len(keys)} failed: {e}")
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, vector in zip(keys, vectors):
+            self._store(key, vector)
+            if not pending[key].done():
+                pending[key].set_result(vector)
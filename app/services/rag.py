@@ -1,85 +1,160 @@
 # RAG logic and orchestration will be implemented here
 from app.workers.document_worker import process_job
-from app.services.redis_queue import pop_from_queue
-from app.utils.chunking import partition_pdf_sync,create_chunks_by_title_sync
-from app.utils.ai_enhanced_docs import summarise_chunks_async
+from app.services.scheduler import pop_job,pop_any_job,pop_heavy_job,spill_heavy,get_queue_length,release_idempotency_key
+from app.utils.chunking import create_chunks_by_title_sync,SectionChunker
+from app.services.ingest_pipeline import ingest_document
+from app.services.metrics import QUEUE_DEPTH,stage,start_metrics_server,track_job
 # from langchain_core.documents import Document
 # from datetime import datetime
 import os
-from io import BytesIO
+import logging
 from dotenv import load_dotenv
 import asyncio
-from app.services.qdrant_client import VectorStoreService
-from langchain_openai import OpenAIEmbeddings
+from app.services.providers import EMBEDDING_MODEL,get_vector_store,warmup
+from app.utils.artifacts import async_artifact_writer
+from app.utils.file_types import detect_file_type
+from app.workers.admission import estimate_cost,get_admission_controller
+from dataclasses import asdict
 
 load_dotenv()
 
-embeddings = OpenAIEmbeddings(
-    model="text-embedding-3-large",
-)
+# "title" keeps unstructured's character-sized chunk_by_title, "section" uses the
+# token-sized section chunker
+CHUNKING_STRATEGY = os.getenv("CHUNKING_STRATEGY", "title")
 
-qudrant_client=VectorStoreService(collection_name="my-collection",embedding_model="text-embedding-3-large")
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "10"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "32"))
 
 
-async def rag():
-    print("RAG Worker Started...")
-
-    while True:
-        try:
-            job = await pop_from_queue()
-        except Exception as e:
-            print("❌ Redis connection failed:", str(e))
-            break
+def make_chunker():
+    if CHUNKING_STRATEGY == "section":
+        return SectionChunker(
+            max_tokens=int(os.getenv("CHUNK_MAX_TOKENS", "750")),
+            new_after_n_tokens=int(os.getenv("CHUNK_NEW_AFTER_TOKENS", "600")),
+            combine_under_n_tokens=int(os.getenv("CHUNK_COMBINE_UNDER_TOKENS", "125")),
+        )
+    return SectionChunker(chunk_fn=create_chunks_by_title_sync)
 
-        if job:
 
-            print("📦 Job received:", job)
+async def handle_job(job, admission=None, spill=False):
+    """
+    Download one queued document and run it through the ingestion pipeline.
+    With `spill`, a job estimated as heavy is moved to the heavy lane instead.
+    """
+    print("📦 Job received:", job)
+    admission = admission or get_admission_controller()
 
-            try:
-                # 1️⃣ Process & Save file
+    try:
+        with track_job(job.get("uuid")) as job_stats:
+            # 1️⃣ Process & Save file
+            with stage("download"):
                 response,saved_filename = await process_job(job)
-                print("✅ File processed:", saved_filename)
-
-
-                partition =  partition_pdf_sync(file=BytesIO(response))
-                print("partition completed")
-                print(f"No. of Partitions :{len(partition)}")
-
-
-                chunks = create_chunks_by_title_sync(partition)
-                print(f"total chunks created : {len(chunks)}")
-
-                processed_chunks = await summarise_chunks_async(chunks, job["record"])
-                print(f"total chunks created : {len(processed_chunks)}")
+            print("✅ File processed:", saved_filename)
+
+            # 2️⃣ size up the job before it takes memory
+            file_type = detect_file_type(response, job.get("file_name"))
+            cost = await asyncio.to_thread(estimate_cost, response, file_type)
+            if spill and cost.heavy and job.get("lane") != "heavy":
+                print(f"🐘 Heavy job ({cost.pages} pages, ~{cost.memory_mb:.0f} MB), moving it to the heavy lane")
+                await spill_heavy(job, asdict(cost))
+                # counted once more, as ok or error, by the heavy worker that runs it
+                job_stats.status = "spilled"
+                return True
+
+            # 3️⃣ partition → chunk → summarise → upsert, streamed page by page
+            # (PDFs through hi_res, Office/HTML through their native partitioners)
+            # 4️⃣ chunks + vectors are kept too, so the index can be rebuilt without the pipeline
+            async with admission.admit(cost):
+                async with async_artifact_writer(job["record"]["id"], EMBEDDING_MODEL) as artifacts:
+                    uploaded = await ingest_document(
+                        response,
+                        job["record"],
+                        get_vector_store(),
+                        make_chunker(),
+                        filename=job.get("file_name"),
+                        file_type=file_type,
+                        summary_concurrency=SUMMARY_CONCURRENCY,
+                        batch_size=UPSERT_BATCH_SIZE,
+                        partition_limiter=admission.partition,
+                        summary_limiter=admission.llm,
+                        artifacts=artifacts,
+                    )
+            print(f"uploaded {uploaded} chunks to qdrant")
+            return True
+    except Exception as e:
+        print("error")
+        print(e)
+        # let a retried webhook queue the document again
+        try:
+            await release_idempotency_key(job)
+        except Exception as release_error:
+            print("❌ Could not release idempotency key:", str(release_error))
+        return False
+
+
+async def rag(concurrency: int = 1, stop_event: asyncio.Event = None, heavy: bool = False, spill: bool = False):
+    """
+    Take jobs from the queue until stop_event is set, running up to `concurrency`
+    jobs at once; the admission controller holds back new jobs while memory is
+    short. Once stop_event is set no new jobs are taken, but jobs already in
+    flight run to completion. Returns False if Redis became unreachable.
+
+    A `heavy` worker only takes jobs from the heavy lane. With `spill`, jobs
+    estimated as heavy are moved there for a heavy worker to pick up; without
+    it, the worker also drains the heavy lane itself.
+    """
+    print("RAG Worker Started...")
 
-                qudrant_client.add_documents(processed_chunks)
-                print("uploaded to qdrant")
+    stop_event = stop_event or asyncio.Event()
+    redis_ok = True
+    admission = get_admission_controller(heavy)
+    admission.start()
+    if heavy:
+        take = pop_heavy_job
+    elif spill:
+        take = pop_job
+    else:
+        # nobody else serves the heavy lane: run what is left there in place
+        take = pop_any_job
+
+    async def consume():
+        nonlocal redis_ok
+
+        while not stop_event.is_set():
+            await admission.ready()
+            try:
+                # read before popping: a Redis error here must not cost a taken job
+                QUEUE_DEPTH.set(await get_queue_length())
+                job = await take()
             except Exception as e:
-                print("error")
-                print(e)
-                
-            
-
-
-        # try :
-        #     print(f"processed chunks : {len(processed_chunks)}")
-        # except Exception :
-        #     print("Error in summerisation complete")
-
-        # try:
-        #     qudrant_client.add_documents(processed_chunks)
+                print("❌ Redis connection failed:", str(e))
+                redis_ok = False
+                stop_event.set()
+                break
 
-        # except Exception:
-        #     print("error while storing embedding ")
-        
-                
+            if job:
 
+                await handle_job(job, admission, spill and not heavy)
 
+            else:
+                # avoid busy loop, but wake up immediately on shutdown
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=1)
+                except asyncio.TimeoutError:
+                    pass
 
+    try:
+        await asyncio.gather(*(consume() for _ in range(concurrency)))
+    finally:
+        await admission.stop()
 
-        else:
-            await asyncio.sleep(1)  # avoid busy loop
+    print("RAG Worker Stopped.")
+    return redis_ok
 
 
 if __name__ == "__main__":  
+    logging.basicConfig(level=logging.INFO)
+    start_metrics_server()
+    # build clients and load the layout model before taking the first job
+    warmup(partition_models=os.getenv("WARMUP_PARTITION_MODELS", "1") == "1")
     asyncio.run(rag())
\ No newline at end of file
@@ -1,27 +1,33 @@
 import os
-import json
 import redis.asyncio as redis
 
+from app.utils.serialization import dumps, loads
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 QUEUE_NAME = "file_queue"
 
+# Idempotency keys (see scheduler.enqueue) live long enough to absorb webhook retries and double fires
+DEDUPE_PREFIX = f"{QUEUE_NAME}:seen:"
+DEDUPE_TTL_SECONDS = int(os.getenv("DEDUPE_TTL_SECONDS", str(7 * 24 * 3600)))
+
 r = redis.from_url(REDIS_URL, decode_responses=True)
 
 
 async def add_to_queue(metadata: dict):
-    await r.rpush(QUEUE_NAME, json.dumps(metadata))
+    await r.rpush(QUEUE_NAME, dumps(metadata))
+
 
 # async def blpeek():
 #     _, item = await r.blpop(QUEUE_NAME)  # blocks efficiently
 #     await r.lpush(QUEUE_NAME, item)      # push it back immediately
-#     return json.loads(item)
+#     return loads(item)
 
 
 async def pop_from_queue():
     item = await r.blpop(QUEUE_NAME)
     if item:
         _, value = item
-        return json.loads(value)
+        return loads(value)
     return None
 
 
@@ -32,7 +38,7 @@ async def get_queue_length():
 async def peek_queue():
     item = await r.lindex(QUEUE_NAME, 0)
     if item:
-        return json.loads(item)
+        return loads(item)
     return None
 
 
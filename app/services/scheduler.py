@@ -0,0 +1,378 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from redis.exceptions import ResponseError
+
+from app.services import redis_queue
+from app.services.metrics import Counter, Histogram
+from app.services.providers import get_supabase
+from app.utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Layout
+# -------------------------
+#
+#   file_queue:express              urgent document types, served first
+#   file_queue:tenant:<school>:small   per-school lane for small documents
+#   file_queue:tenant:<school>:large   per-school lane for large documents
+#   file_queue:tenants              ring (list) of schools with queued work
+#   file_queue                      legacy FIFO, drained last
+#   file_queue:heavy                jobs a worker found too big to run next to
+#                                   others (see app.workers.admission); heavy
+#                                   workers pop it, and regular workers drain it
+#                                   when no heavy workers are configured
+#
+# Schools are served weighted round-robin: a school keeps the head of the ring
+# for `weight` pops, then rotates to the back. Within a school, every
+# LARGE_EVERY-th pop prefers the large lane so big documents still progress.
+#
+# The dequeue script derives a school's lane keys from the ring instead of
+# receiving them in KEYS, which Redis Cluster can't route. The scheduler needs a
+# single Redis node (or a primary with replicas) and refuses to run on a cluster.
+
+PREFIX = redis_queue.QUEUE_NAME
+EXPRESS_KEY = f"{PREFIX}:express"
+TENANT_PREFIX = f"{PREFIX}:tenant:"
+RING_KEY = f"{PREFIX}:tenants"
+ACTIVE_KEY = f"{PREFIX}:tenants:active"
+CREDITS_KEY = f"{PREFIX}:credits"
+TURNS_KEY = f"{PREFIX}:turns"
+SERVED_KEY = f"{PREFIX}:stats:served"
+WAIT_KEY = f"{PREFIX}:stats:wait_ms"
+HEAVY_KEY = f"{PREFIX}:heavy"
+
+DEFAULT_TENANT = "unknown"
+
+# {"School of Engineering": 3, ...}; schools not listed get weight 1
+TENANT_WEIGHTS = json.loads(os.getenv("TENANT_WEIGHTS", "{}"))
+URGENT_DOCUMENT_TYPES = {
+    t.strip().lower() for t in os.getenv("URGENT_DOCUMENT_TYPES", "urgent,notice").split(",") if t.strip()
+}
+SMALL_DOCUMENT_BYTES = int(os.getenv("SMALL_DOCUMENT_BYTES", str(2 * 1024 * 1024)))
+SMALL_DOCUMENT_PAGES = int(os.getenv("SMALL_DOCUMENT_PAGES", "10"))
+LARGE_EVERY = int(os.getenv("LARGE_EVERY", "4"))
+
+QUEUE_WAIT = Histogram("kchat_queue_wait_seconds", "Time jobs waited in the queue before a worker took them.", ("lane",))
+SCHEDULED = Counter("kchat_scheduled_jobs_total", "Jobs handed to workers, by school and lane.", ("tenant", "lane"))
+SPILLED = Counter("kchat_spilled_jobs_total", "Jobs moved to the heavy lane after their cost was estimated.")
+
+
+# Scripts are registered once and always called with an explicit client, so
+# tests and benchmarks can swap redis_queue.r for another connection
+_ENQUEUE = redis_queue.r.register_script("""
+if ARGV[4] == '1' then
+    if not redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[2]) then
+        return 0
+    end
+end
+redis.call('RPUSH', KEYS[2], ARGV[1])
+if ARGV[3] ~= '' and redis.call('SADD', KEYS[4], ARGV[3]) == 1 then
+    redis.call('RPUSH', KEYS[3], ARGV[3])
+end
+return 1
+""")
+
+_DEQUEUE = redis_queue.r.register_script("""
+local item = redis.call('LPOP', KEYS[1])
+if item then
+    return {'express', '', item}
+end
+
+local weights = cjson.decode(ARGV[2])
+local large_every = tonumber(ARGV[3])
+
+for _ = 1, redis.call('LLEN', KEYS[2]) do
+    local tenant = redis.call('LINDEX', KEYS[2], 0)
+    if not tenant then
+        break
+    end
+
+    local small = ARGV[1] .. tenant .. ':small'
+    local large = ARGV[1] .. tenant .. ':large'
+    local first, second, first_lane, second_lane = small, large, 'small', 'large'
+    if redis.call('HINCRBY', KEYS[5], tenant, 1) % large_every == 0 then
+        first, second, first_lane, second_lane = large, small, 'large', 'small'
+    end
+
+    local lane = first_lane
+    item = redis.call('LPOP', first)
+    if not item then
+        item = redis.call('LPOP', second)
+        lane = second_lane
+    end
+
+    if item then
+        local weight = tonumber(weights[tenant] or 1)
+        if redis.call('HINCRBY', KEYS[4], tenant, 1) >= weight then
+            redis.call('HDEL', KEYS[4], tenant)
+            redis.call('LMOVE', KEYS[2], KEYS[2], 'LEFT', 'RIGHT')
+        end
+    end
+
+    if redis.call('LLEN', small) + redis.call('LLEN', large) == 0 then
+        redis.call('LREM', KEYS[2], 1, tenant)
+        redis.call('SREM', KEYS[3], tenant)
+        redis.call('HDEL', KEYS[4], tenant)
+        redis.call('HDEL', KEYS[5], tenant)
+    end
+
+    if item then
+        return {lane, tenant, item}
+    end
+end
+
+item = redis.call('LPOP', KEYS[6])
+if item then
+    return {'legacy', '', item}
+end
+return false
+""")
+
+
+_single_node_checked = False
+
+
+async def _require_single_node():
+    """Refuse to run the scheduler scripts against Redis Cluster (checked once per process)."""
+    global _single_node_checked
+    if _single_node_checked:
+        return
+    try:
+        info = await redis_queue.r.info("cluster")
+    except ResponseError as e:
+        # servers without INFO (proxies, fakes) can't be cluster nodes we'd route through
+        logger.warning(f"Could not check Redis cluster mode: {e}")
+        info = {}
+    if str(info.get("cluster_enabled", 0)) == "1":
+        raise RuntimeError(
+            "The scheduler needs a single Redis node: its dequeue script reads per-school "
+            "lane keys that Redis Cluster can't route. Point REDIS_URL at a standalone Redis."
+        )
+    _single_node_checked = True
+
+
+def _lane_key(tenant: str, lane: str) -> str:
+    return f"{TENANT_PREFIX}{tenant}:{lane}"
+
+
+def _int_field(record: dict, *names) -> Optional[int]:
+    for name in names:
+        value = record.get(name)
+        if value is None and isinstance(record.get("metadata"), dict):
+            value = record["metadata"].get(name)
+        if value is not None:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+def classify(record: dict, size_bytes: Optional[int] = None):
+    """Return (tenant, lane) for a record. Lane is express, small or large."""
+    tenant = str(record.get("school") or DEFAULT_TENANT)
+
+    if str(record.get("document_type") or "").lower() in URGENT_DOCUMENT_TYPES:
+        return tenant, "express"
+
+    pages = _int_field(record, "page_count", "pages")
+    if pages is not None:
+        return tenant, "small" if pages <= SMALL_DOCUMENT_PAGES else "large"
+
+    if size_bytes is None:
+        size_bytes = _int_field(record, "file_size", "size")
+    if size_bytes is None:
+        # unknown size: keep it out of the way of known-small documents
+        return tenant, "large"
+    return tenant, "small" if size_bytes <= SMALL_DOCUMENT_BYTES else "large"
+
+
+def needs_size_lookup(record: dict) -> bool:
+    """True when the lane depends on a size the record doesn't carry."""
+    if str(record.get("document_type") or "").lower() in URGENT_DOCUMENT_TYPES:
+        return False
+    return _int_field(record, "page_count", "pages", "file_size", "size") is None
+
+
+async def fetch_object_size(storage_path: str, bucket: str = "documents") -> Optional[int]:
+    """Look up an object's size in Supabase storage; None if it cannot be determined."""
+    folder, _, name = storage_path.rpartition("/")
+    try:
+        objects = await asyncio.to_thread(
+            lambda: get_supabase().storage.from_(bucket).list(folder, {"search": name})
+        )
+    except Exception as e:
+        logger.warning(f"Could not look up size of {storage_path}: {e}")
+        return None
+
+    for obj in objects or []:
+        if obj.get("name") == name:
+            return _int_field(obj, "size")
+    return None
+
+
+# -------------------------
+# Enqueue / dequeue
+# -------------------------
+
+def _enqueue_args(job: dict, idempotency_key: Optional[str], size_bytes: Optional[int]):
+    tenant, lane = classify(job.get("record") or {}, size_bytes)
+    job = {**job, "enqueued_at": time.time(), "lane": lane}
+    if idempotency_key:
+        # carried along so a failed job can give its key back (release_idempotency_key)
+        job["idempotency_key"] = idempotency_key
+    target = EXPRESS_KEY if lane == "express" else _lane_key(tenant, lane)
+    keys = [redis_queue.DEDUPE_PREFIX + (idempotency_key or ""), target, RING_KEY, ACTIVE_KEY]
+    args = [
+        dumps(job),
+        redis_queue.DEDUPE_TTL_SECONDS,
+        "" if lane == "express" else tenant,
+        "1" if idempotency_key else "0",
+    ]
+    return keys, args
+
+
+async def enqueue(job: dict, idempotency_key: Optional[str] = None, size_bytes: Optional[int] = None) -> bool:
+    """
+    Queue a job on its school's lane (or the express lane). With an idempotency
+    key the job is dropped if that key was already seen. Returns True if queued.
+    """
+    await _require_single_node()
+    keys, args = _enqueue_args(job, idempotency_key, size_bytes)
+    return bool(await _ENQUEUE(keys=keys, args=args, client=redis_queue.r))
+
+
+async def enqueue_many(jobs) -> list:
+    """Batch enqueue of (job, idempotency_key, size_bytes) tuples in one pipelined round-trip."""
+    await _require_single_node()
+    async with redis_queue.r.pipeline(transaction=False) as pipe:
+        for job, idempotency_key, size_bytes in jobs:
+            keys, args = _enqueue_args(job, idempotency_key, size_bytes)
+            await _ENQUEUE(keys=keys, args=args, client=pipe)
+        results = await pipe.execute()
+    return [bool(queued) for queued in results]
+
+
+async def release_idempotency_key(job: dict):
+    """
+    Forget a job's idempotency key so the same webhook can enqueue it again.
+    Called when the job fails; successful jobs keep theirs for DEDUPE_TTL_SECONDS.
+    """
+    idempotency_key = job.get("idempotency_key")
+    if idempotency_key:
+        await redis_queue.r.delete(redis_queue.DEDUPE_PREFIX + idempotency_key)
+
+
+async def pop_job() -> Optional[dict]:
+    """Take the next job according to express → weighted round-robin → legacy FIFO. None if idle."""
+    await _require_single_node()
+    keys = [EXPRESS_KEY, RING_KEY, ACTIVE_KEY, CREDITS_KEY, TURNS_KEY, redis_queue.QUEUE_NAME]
+    result = await _DEQUEUE(
+        keys=keys,
+        args=[TENANT_PREFIX, json.dumps(TENANT_WEIGHTS), LARGE_EVERY],
+        client=redis_queue.r,
+    )
+    if not result:
+        return None
+
+    lane, tenant, item = result
+    return await _served(loads(item), lane, tenant)
+
+
+async def _served(job: dict, lane: str, tenant: str = "") -> dict:
+    waited = max(0.0, time.time() - job.get("enqueued_at", time.time()))
+    tenant = tenant or str((job.get("record") or {}).get("school") or DEFAULT_TENANT)
+    QUEUE_WAIT.observe(waited, lane=lane)
+    SCHEDULED.inc(tenant=tenant, lane=lane)
+
+    async with redis_queue.r.pipeline(transaction=False) as pipe:
+        pipe.hincrby(SERVED_KEY, tenant, 1)
+        pipe.hincrby(WAIT_KEY, tenant, int(waited * 1000))
+        await pipe.execute()
+
+    return job
+
+
+async def spill_heavy(job: dict, cost: Optional[dict] = None):
+    """Move a job to the heavy lane; it keeps its place in line among heavy jobs only."""
+    job = {**job, "enqueued_at": time.time(), "lane": "heavy"}
+    if cost is not None:
+        job["cost"] = cost
+    await redis_queue.r.rpush(HEAVY_KEY, dumps(job))
+    SPILLED.inc()
+
+
+async def pop_heavy_job() -> Optional[dict]:
+    item = await redis_queue.r.lpop(HEAVY_KEY)
+    if item is None:
+        return None
+    return await _served(loads(item), "heavy")
+
+
+async def pop_any_job() -> Optional[dict]:
+    """
+    pop_job, then the heavy lane. For workers that run heavy jobs in place: with
+    no heavy workers running, jobs spilled earlier would otherwise never be taken.
+    """
+    return await pop_job() or await pop_heavy_job()
+
+
+# -------------------------
+# Stats
+# -------------------------
+
+async def get_queue_length() -> int:
+    """Jobs waiting across the express lane, every school lane, the heavy lane and the legacy queue."""
+    tenants = await redis_queue.r.lrange(RING_KEY, 0, -1)
+    async with redis_queue.r.pipeline(transaction=False) as pipe:
+        pipe.llen(EXPRESS_KEY)
+        pipe.llen(redis_queue.QUEUE_NAME)
+        pipe.llen(HEAVY_KEY)
+        for tenant in tenants:
+            pipe.llen(_lane_key(tenant, "small"))
+            pipe.llen(_lane_key(tenant, "large"))
+        return sum(await pipe.execute())
+
+
+async def get_stats() -> dict:
+    """Per-school depth, jobs served and mean wait, plus a fairness index over served counts."""
+    tenants = await redis_queue.r.lrange(RING_KEY, 0, -1)
+    async with redis_queue.r.pipeline(transaction=False) as pipe:
+        pipe.llen(EXPRESS_KEY)
+        pipe.llen(redis_queue.QUEUE_NAME)
+        pipe.llen(HEAVY_KEY)
+        pipe.hgetall(SERVED_KEY)
+        pipe.hgetall(WAIT_KEY)
+        for tenant in tenants:
+            pipe.llen(_lane_key(tenant, "small"))
+            pipe.llen(_lane_key(tenant, "large"))
+        express, legacy, heavy, served, wait_ms, *depths = await pipe.execute()
+
+    schools = {}
+    for i, tenant in enumerate(tenants):
+        schools[tenant] = {"small": depths[2 * i], "large": depths[2 * i + 1]}
+    for tenant, count in served.items():
+        count = int(count)
+        entry = schools.setdefault(tenant, {"small": 0, "large": 0})
+        entry["served"] = count
+        entry["mean_wait_s"] = round(int(wait_ms.get(tenant, 0)) / count / 1000, 3) if count else None
+        entry["weight"] = TENANT_WEIGHTS.get(tenant, 1)
+
+    # Jain's fairness index of weight-normalised service: 1.0 is perfectly fair
+    shares = [e["served"] / e["weight"] for e in schools.values() if e.get("served")]
+    fairness = (sum(shares) ** 2 / (len(shares) * sum(s * s for s in shares))) if shares else None
+
+    return {
+        "express": express,
+        "legacy": legacy,
+        "heavy": heavy,
+        "ring": tenants,
+        "schools": schools,
+        "fairness_index": round(fairness, 4) if fairness is not None else None,
+    }
@@ -1,18 +1,18 @@
 import os
-from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from app.services.providers import get_supabase
+
 # Load environment variables from .env
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".env"), override=False)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-	raise ValueError("Supabase URL or Key not set in environment variables.")
-
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# The client is created on first use (see app.services.providers);
+# `from app.services.supabase_client import supabase` keeps working.
+def __getattr__(name):
+	if name == "supabase":
+		return get_supabase()
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Document class to represent a document row
@@ -27,7 +27,7 @@ class Document:
 
 # Function to fetch all documents with metadata from documents table
 def fetch_all_documents():
-	response = supabase.table("documents") \
+	response = get_supabase().table("documents") \
 		.select("*") \
 		.order("created_at", desc=True) \
 		.execute()
@@ -0,0 +1,287 @@
+"""
+Tenant placement admin.
+
+    python -m app.services.tenant_admin peers
+    python -m app.services.tenant_admin list
+    python -m app.services.tenant_admin move <school> --to-peer ID [--from-peer ID]
+    python -m app.services.tenant_admin replicate <school> --to-peer ID
+    python -m app.services.tenant_admin balance [--apply]
+    python -m app.services.tenant_admin migrate --source my-collection
+
+move/replicate/balance work on shard keys (TENANT_PLACEMENT=shard_key) in a
+Qdrant cluster; Qdrant streams the shard to its new peer while it keeps
+serving. migrate copies points with their vectors from a collection in the
+original single-collection layout into the configured tenant layout, so
+nothing is re-embedded.
+"""
+import argparse
+import logging
+import sys
+from collections import defaultdict
+
+from qdrant_client.models import (
+    MoveShard,
+    MoveShardOperation,
+    PointStruct,
+    ReplicateShard,
+    ReplicateShardOperation,
+    ShardTransferMethod,
+)
+
+from app.services.qdrant_client import (
+    PLACEMENT_COLLECTION,
+    PLACEMENT_NONE,
+    PLACEMENT_SHARD_KEY,
+    TENANT_SEPARATOR,
+    VectorStoreService,
+    tenant_key,
+)
+
+logger = logging.getLogger("tenant_admin")
+
+
+def _store(placement=None) -> VectorStoreService:
+    from app.services.providers import COLLECTION_NAME, EMBEDDING_MODEL
+
+    return VectorStoreService(collection_name=COLLECTION_NAME, embedding_model=EMBEDDING_MODEL, placement=placement)
+
+
+def _require_shard_keys(store: VectorStoreService):
+    if store.placement != PLACEMENT_SHARD_KEY:
+        sys.exit("this command needs TENANT_PLACEMENT=shard_key")
+
+
+# -------------------------
+# Cluster state
+# -------------------------
+
+def shard_layout(store: VectorStoreService) -> list:
+    """One row per shard replica: shard key, shard id, peer, state and (approximate) points."""
+    info = store.client.http.distributed_api.collection_cluster_info(store.collection_name).result
+    rows = [
+        {"tenant": s.shard_key, "shard_id": s.shard_id, "peer_id": info.peer_id, "state": str(s.state)}
+        for s in info.local_shards
+    ]
+    rows += [
+        {"tenant": s.shard_key, "shard_id": s.shard_id, "peer_id": s.peer_id, "state": str(s.state)}
+        for s in info.remote_shards
+    ]
+
+    # counts are per shard key; spread them evenly over the key's shards
+    shard_ids = defaultdict(set)
+    for row in rows:
+        shard_ids[row["tenant"]].add(row["shard_id"])
+    points = {}
+    for row in rows:
+        tenant = row["tenant"]
+        if tenant is not None and tenant not in points:
+            count = store.client.count(store.collection_name, shard_key_selector=tenant, exact=True).count
+            points[tenant] = count // len(shard_ids[tenant])
+        row["points"] = points.get(tenant, 0)
+    return sorted(rows, key=lambda r: (str(r["tenant"]), r["shard_id"], r["peer_id"]))
+
+
+def peer_ids(store: VectorStoreService) -> list:
+    status = store.client.http.cluster_api.cluster_status().result
+    return sorted(int(peer_id) for peer_id in status.peers) if getattr(status, "peers", None) else []
+
+
+def plan_balance(rows: list, peers: list) -> list:
+    """
+    Greedy moves of whole tenant shards onto the emptiest peer, taken from the
+    fullest peer that has a shard small enough to narrow the gap, until no such
+    move is left. Returns [(tenant, shard_id, from, to)].
+    """
+    load = {peer: 0 for peer in peers}
+    shards = defaultdict(list)  # peer -> [(points, tenant, shard_id)]
+    for row in rows:
+        load[row["peer_id"]] = load.get(row["peer_id"], 0) + row["points"]
+        shards[row["peer_id"]].append((row["points"], row["tenant"], row["shard_id"]))
+
+    moves = []
+    while len(load) > 1:
+        emptiest = min(load, key=load.get)
+        move = None
+        for donor in sorted(load, key=load.get, reverse=True):
+            gap = load[donor] - load[emptiest]
+            # largest shard that still leaves the pair closer than before
+            candidates = sorted((s for s in shards[donor] if 0 < s[0] < gap), reverse=True)
+            if candidates:
+                move = donor, candidates[0]
+                break
+        if move is None:
+            break
+
+        donor, shard = move
+        points, tenant, shard_id = shard
+        shards[donor].remove(shard)
+        shards[emptiest].append(shard)
+        load[donor] -= points
+        load[emptiest] += points
+        moves.append((tenant, shard_id, donor, emptiest))
+    return moves
+
+
+def _shard_ids(rows: list, tenant: str, peer_id=None) -> list:
+    return sorted({
+        (r["shard_id"], r["peer_id"]) for r in rows
+        if r["tenant"] == tenant and (peer_id is None or r["peer_id"] == peer_id)
+    })
+
+
+def move_shard(store: VectorStoreService, shard_id: int, from_peer: int, to_peer: int):
+    operation = MoveShardOperation(move_shard=MoveShard(
+        shard_id=shard_id, from_peer_id=from_peer, to_peer_id=to_peer, method=ShardTransferMethod.STREAM_RECORDS,
+    ))
+    store.client.http.distributed_api.update_collection_cluster(store.collection_name, cluster_operations=operation)
+    logger.info(f"moving shard {shard_id}: peer {from_peer} -> {to_peer}")
+
+
+# -------------------------
+# Commands
+# -------------------------
+
+def cmd_peers(args):
+    store = _store()
+    for peer_id in peer_ids(store):
+        print(peer_id)
+
+
+def cmd_list(args):
+    store = _store()
+    if store.placement == PLACEMENT_SHARD_KEY:
+        print(f"{'tenant':30} {'shard':>6} {'peer':>20} {'points':>10}  state")
+        for row in shard_layout(store):
+            print(f"{str(row['tenant']):30} {row['shard_id']:>6} {row['peer_id']:>20} {row['points']:>10}  {row['state']}")
+    elif store.placement == PLACEMENT_COLLECTION:
+        for name in store.tenant_collections():
+            print(f"{name:50} {store.client.count(name, exact=True).count:>10}")
+    else:
+        print(f"{store.collection_name}: single collection, {store.client.count(store.collection_name).count} points")
+
+
+def cmd_move(args):
+    store = _store()
+    _require_shard_keys(store)
+    tenant = tenant_key(args.school)
+    shards = _shard_ids(shard_layout(store), tenant, args.from_peer)
+    if not shards:
+        sys.exit(f"no shards for tenant '{tenant}'" + (f" on peer {args.from_peer}" if args.from_peer else ""))
+    for shard_id, peer_id in shards:
+        if peer_id != args.to_peer:
+            move_shard(store, shard_id, peer_id, args.to_peer)
+
+
+def cmd_replicate(args):
+    store = _store()
+    _require_shard_keys(store)
+    tenant = tenant_key(args.school)
+    shards = _shard_ids(shard_layout(store), tenant)
+    if not shards:
+        sys.exit(f"no shards for tenant '{tenant}'")
+    replicated = set()
+    for shard_id, peer_id in shards:
+        if shard_id in replicated or peer_id == args.to_peer:
+            continue
+        operation = ReplicateShardOperation(replicate_shard=ReplicateShard(
+            shard_id=shard_id, from_peer_id=peer_id, to_peer_id=args.to_peer,
+            method=ShardTransferMethod.STREAM_RECORDS,
+        ))
+        store.client.http.distributed_api.update_collection_cluster(store.collection_name, cluster_operations=operation)
+        replicated.add(shard_id)
+        logger.info(f"replicating shard {shard_id}: peer {peer_id} -> {args.to_peer}")
+
+
+def cmd_balance(args):
+    store = _store()
+    _require_shard_keys(store)
+    moves = plan_balance(shard_layout(store), peer_ids(store))
+    if not moves:
+        print("cluster is balanced")
+        return
+    for tenant, shard_id, from_peer, to_peer in moves:
+        print(f"{tenant}: shard {shard_id} peer {from_peer} -> {to_peer}")
+        if args.apply:
+            move_shard(store, shard_id, from_peer, to_peer)
+    if not args.apply:
+        print("dry run; pass --apply to start the transfers")
+
+
+def is_migration_target(store: VectorStoreService, collection_name: str) -> bool:
+    """True if migrated points can be written into this collection under the store's placement."""
+    if store.placement == PLACEMENT_SHARD_KEY:
+        return collection_name == store.collection_name
+    # collection placement writes only to <collection>__<school>; the shared collection is a valid source
+    return collection_name.startswith(store.collection_name + TENANT_SEPARATOR)
+
+
+def migrate(store: VectorStoreService, source: str, batch_size: int = 256) -> int:
+    """Copy every point of `source` into the store's tenant layout. Returns the number copied."""
+    copied = 0
+    offset = None
+    while True:
+        records, offset = store.client.scroll(
+            source, limit=batch_size, offset=offset, with_payload=True, with_vectors=True,
+        )
+        by_tenant = defaultdict(list)
+        for record in records:
+            school = ((record.payload or {}).get("metadata") or {}).get("school")
+            by_tenant[tenant_key(school)].append(PointStruct(id=record.id, vector=record.vector, payload=record.payload))
+
+        for tenant, points in by_tenant.items():
+            collection_name, kwargs = store.write_target(tenant)
+            store.client.upsert(collection_name, points=points, wait=True, **kwargs)
+            copied += len(points)
+        logger.info(f"copied {copied} points")
+
+        if offset is None:
+            return copied
+
+
+def cmd_migrate(args):
+    store = _store()
+    if store.placement == PLACEMENT_NONE:
+        sys.exit("set TENANT_PLACEMENT to shard_key or collection before migrating")
+    if is_migration_target(store, args.source):
+        sys.exit(f"'{args.source}' is one of the collections being migrated into")
+
+    copied = migrate(store, args.source, args.batch_size)
+    print(f"copied {copied} points from '{args.source}' into the {store.placement} layout of '{store.collection_name}'")
+    if args.source == store.collection_name:
+        print(f"'{args.source}' still holds the original points and is searched too; empty it once the copy is verified")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and move per-school placement in Qdrant.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("peers", help="list cluster peer ids").set_defaults(func=cmd_peers)
+    commands.add_parser("list", help="show tenants, their shards/collections and sizes").set_defaults(func=cmd_list)
+
+    move = commands.add_parser("move", help="move a school's shards to another peer")
+    move.add_argument("school")
+    move.add_argument("--to-peer", type=int, required=True)
+    move.add_argument("--from-peer", type=int, help="only move the replica on this peer")
+    move.set_defaults(func=cmd_move)
+
+    replicate = commands.add_parser("replicate", help="add a replica of a school's shards on another peer")
+    replicate.add_argument("school")
+    replicate.add_argument("--to-peer", type=int, required=True)
+    replicate.set_defaults(func=cmd_replicate)
+
+    balance = commands.add_parser("balance", help="even out points per peer by moving whole tenant shards")
+    balance.add_argument("--apply", action="store_true", help="start the transfers instead of printing the plan")
+    balance.set_defaults(func=cmd_balance)
+
+    migrate = commands.add_parser("migrate", help="copy a single-collection index into the tenant layout")
+    migrate.add_argument("--source", required=True, help="collection in the original layout")
+    migrate.add_argument("--batch-size", type=int, default=256)
+    migrate.set_defaults(func=cmd_migrate)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
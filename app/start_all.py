@@ -1,17 +1,47 @@
-import subprocess
+import argparse
 import os
+import signal
+import subprocess
+import sys
 
 # Get absolute path to project root
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))  # K-Chat_Backend
 
-# Start FastAPI in project root
-subprocess.Popen(
-    ["uvicorn", "app.main:app", "--reload"],
-    cwd=root_dir  # K-Chat_Backend
-)
-
-# Start Worker in app/workers
-subprocess.Popen(
-    ["python", "document_worker.py"],
-    cwd=os.path.join(root_dir, "app", "workers")  # K-Chat_Backend\app\workers
-)
\ No newline at end of file
+
+def main():
+    """
+    Run the API and the supervised RAG workers in one container.
+    Worker options (--workers, --concurrency, ...) are passed through to
+    app.workers.supervisor.
+    """
+    parser = argparse.ArgumentParser(description="Start the API and RAG workers.")
+    parser.add_argument("--port", default=os.getenv("PORT", "8000"))
+    parser.add_argument("--reload", action="store_true", help="development only: auto-reload the API")
+    args, worker_args = parser.parse_known_args()
+
+    api_cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "0.0.0.0", "--port", str(args.port)]
+    if args.reload:
+        api_cmd.append("--reload")
+
+    # Start FastAPI in project root
+    api = subprocess.Popen(api_cmd, cwd=root_dir)
+    # Start the worker supervisor (forks the RAG workers)
+    workers = subprocess.Popen([sys.executable, "-m", "app.workers.supervisor", *worker_args], cwd=root_dir)
+
+    def forward(signum, frame):
+        for proc in (api, workers):
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+
+    # the supervisor drains jobs on shutdown, so wait for it rather than the API
+    code = workers.wait()
+    forward(signal.SIGTERM, None)
+    api.wait()
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
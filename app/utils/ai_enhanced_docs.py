@@ -166,15 +166,20 @@
 
 # --------------------------------------------------------------------------------------------
 
-import json
 import asyncio
-from typing import List
+from typing import TYPE_CHECKING, List
 from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
+from app.utils.serialization import dumps
+from app.services.providers import get_summary_llm
+from app.services.metrics import record_tokens, stage
+from app.services.qdrant_client import chunk_point_id
 import os
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
@@ -212,7 +217,7 @@ def separate_content_types(chunk):
 
 # 2️⃣ Async OpenAI call
 async def create_ai_enhanced_summary_async(
-    llm: ChatOpenAI,
+    llm: "ChatOpenAI",
     text: str,
     tables: List[str],
     images: List[str],
@@ -262,7 +267,11 @@ SEARCHABLE DESCRIPTION:
         message = HumanMessage(content=message_content)
 
         # ✅ Async call
-        response = await llm.ainvoke([message])
+        with stage("summarise"):
+            response = await llm.ainvoke([message])
+
+        usage = getattr(response, "usage_metadata", None) or {}
+        record_tokens(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
 
         return response.content
 
@@ -283,10 +292,11 @@ async def process_single_chunk(
     llm,
     semaphore,
     index,
-    total,
+    total=None,
 ):
     async with semaphore:
-        print(f"Processing chunk {index}/{total}")
+        # the streaming pipeline doesn't know the total until the last page
+        print(f"Processing chunk {index}/{total}" if total else f"Processing chunk {index}")
 
         content_data = separate_content_types(chunk)
 
@@ -301,9 +311,11 @@ async def process_single_chunk(
             enhanced_content = content_data["text"]
 
         return Document(
+            # same document version and chunk → same point, so a retried job overwrites
+            id=chunk_point_id(record["id"], record.get("updated_at") or record.get("created_at"), index),
             page_content=enhanced_content,
             metadata={
-                "original_content": json.dumps(
+                "original_content": dumps(
                     {
                         "raw_text": content_data["text"],
                         "tables_html": content_data["tables"],
@@ -328,11 +340,8 @@ async def summarise_chunks_async(chunks, record):
 
     print("🧠 Processing chunks asynchronously...")
 
-    llm = ChatOpenAI(
-        model="gpt-4o",
-        temperature=0,
-        api_key=OPENAI_API_KEY,
-    )
+    # shared client (and HTTP connection pool) across jobs
+    llm = get_summary_llm()
 
     semaphore = asyncio.Semaphore(10)  # 🔒 limit concurrency (important)
 
@@ -354,8 +363,44 @@ async def summarise_chunks_async(chunks, record):
     return langchain_documents
 
 
+# 5️⃣ Streaming chunk processor
+async def iter_summarised_chunks(chunks, record, concurrency: int = 10, limiter=None):
+    """
+    Async generator version of summarise_chunks_async.
+    Consumes chunks as they are produced and yields Documents as their
+    summaries complete (completion order, not input order). At most
+    2 * concurrency chunks are held in flight, which bounds memory.
+    With a shared adaptive `limiter` its current limit is used instead.
+    """
 
+    # shared client (and HTTP connection pool) across jobs
+    llm = get_summary_llm()
 
+    semaphore = limiter or asyncio.Semaphore(concurrency)
+    pending = set()
+    index = 0
 
+    try:
+        async for chunk in chunks:
+            index += 1
+            pending.add(
+                asyncio.create_task(
+                    process_single_chunk(chunk, record, llm, semaphore, index)
+                )
+            )
 
-
+            if len(pending) >= (limiter.limit if limiter else concurrency) * 2:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # consumer gave up early (e.g. upload failed): don't leave summaries running
+        for task in pending:
+            task.cancel()
+
+    print(f"✅ Processed {index} chunks")
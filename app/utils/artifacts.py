@@ -0,0 +1,166 @@
+"""
+Per-document artifacts of the ingestion pipeline, for rebuilding Qdrant offline.
+
+After a job, everything that went into its points is kept under
+ARTIFACT_DIR/<document_id>/:
+
+    chunks.jsonl.zst  one versioned JSON line per chunk: point id, page_content
+                      (the summary) and metadata (original content, record fields)
+    vectors.npy       float32 array, one row per line of chunks.jsonl.zst
+    manifest.json     plain JSON: chunk count, vector size, embedding model,
+                      written at
+
+A job's files are written into a temporary directory and renamed into place
+when the job succeeds, so readers never see half a document and a re-ingested
+document replaces its previous artifacts. The bulk loader
+(app.services.artifact_loader) memory-maps the vectors and streams the chunks,
+so a collection can be rebuilt without partitioning, summarising or embedding.
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Iterator, List, Optional
+
+import numpy as np
+import zstandard
+
+from app.utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# empty string disables writing artifacts
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", os.path.join(os.path.expanduser("~"), ".local", "share", "kchat", "artifacts"))
+ZSTD_LEVEL = 6
+
+CHUNKS_FILE = "chunks.jsonl.zst"
+VECTORS_FILE = "vectors.npy"
+MANIFEST_FILE = "manifest.json"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def document_dir(directory: str, document_id) -> str:
+    return os.path.join(directory, _UNSAFE.sub("_", str(document_id)))
+
+
+class ArtifactWriter:
+    """Collects one document's chunks and vectors as batches are upserted."""
+
+    def __init__(self, directory: str, document_id, embedding_model: str):
+        os.makedirs(directory, exist_ok=True)
+        self.document_id = document_id
+        self.embedding_model = embedding_model
+        self.path = document_dir(directory, document_id)
+        self._tmp = tempfile.mkdtemp(dir=directory, prefix=".tmp-")
+        self._chunks = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(
+            open(os.path.join(self._tmp, CHUNKS_FILE), "wb")
+        )
+        self._vectors: List[np.ndarray] = []
+        self.count = 0
+
+    def add(self, ids: list, documents: list, vectors: list):
+        for point_id, document in zip(ids, documents):
+            line = dumps({"id": point_id, "page_content": document.page_content, "metadata": document.metadata})
+            self._chunks.write(line.encode() + b"\n")
+        self._vectors.append(np.asarray(vectors, dtype=np.float32))
+        self.count += len(ids)
+
+    def commit(self):
+        self._chunks.close()
+        vectors = np.concatenate(self._vectors) if self._vectors else np.zeros((0, 0), dtype=np.float32)
+        np.save(os.path.join(self._tmp, VECTORS_FILE), vectors)
+        manifest = {
+            "document_id": self.document_id,
+            "count": self.count,
+            "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "embedding_model": self.embedding_model,
+            "written_at": time.time(),
+        }
+        with open(os.path.join(self._tmp, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f)
+
+        # swap the finished directory in; the previous version (if any) goes after
+        old = None
+        if os.path.exists(self.path):
+            old = f"{self._tmp}-old"
+            os.replace(self.path, old)
+        os.replace(self._tmp, self.path)
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+        logger.info(f"Wrote artifacts for {self.document_id}: {self.count} chunks")
+
+    def abort(self):
+        self._chunks.close()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+@contextmanager
+def artifact_writer(document_id, embedding_model: str, directory: Optional[str] = None):
+    """Writer for one job; committed if the block succeeds, discarded if it raises. None when disabled."""
+    directory = ARTIFACT_DIR if directory is None else directory
+    if not directory:
+        yield None
+        return
+
+    writer = ArtifactWriter(directory, document_id, embedding_model)
+    try:
+        yield writer
+    except BaseException:
+        writer.abort()
+        raise
+    writer.commit()
+
+
+@asynccontextmanager
+async def async_artifact_writer(document_id, embedding_model: str, directory: Optional[str] = None):
+    """artifact_writer for async jobs: the file work (np.save, zstd flush, renames) runs on a thread."""
+    directory = ARTIFACT_DIR if directory is None else directory
+    if not directory:
+        yield None
+        return
+
+    writer = await asyncio.to_thread(ArtifactWriter, directory, document_id, embedding_model)
+    try:
+        yield writer
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+    await asyncio.to_thread(writer.commit)
+
+
+# -------------------------
+# Reading
+# -------------------------
+
+def iter_document_dirs(directory: str) -> Iterator[str]:
+    """Committed document directories, in a stable order."""
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.startswith(".") and os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+            yield path
+
+
+def read_manifest(path: str) -> dict:
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def iter_chunks(path: str) -> Iterator[dict]:
+    """Chunk lines ({"id", "page_content", "metadata"}) streamed from the compressed file."""
+    with open(os.path.join(path, CHUNKS_FILE), "rb") as f:
+        reader = zstandard.ZstdDecompressor().stream_reader(f)
+        for line in io.BufferedReader(reader):
+            if line.strip():
+                yield loads(line)
+
+
+def load_vectors(path: str) -> np.ndarray:
+    """The document's vectors, memory-mapped rather than read."""
+    return np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
@@ -39,9 +39,19 @@
 
 
 
-from unstructured.partition.pdf import partition_pdf
-from unstructured.chunking.title import chunk_by_title
+from functools import lru_cache
+from io import BytesIO
+import os
 
+import tiktoken
+from pypdf import PdfReader, PdfWriter
+
+# unstructured (and torch behind partition_pdf) is imported inside the functions
+# that need it, so importing this module stays cheap
+
+
+# text-embedding-3-large and gpt-4o budgets are both counted in cl100k_base
+TOKEN_ENCODING = "cl100k_base"
 
 
 def partition_pdf_sync(file: str):
@@ -50,6 +60,7 @@ def partition_pdf_sync(file: str):
     Safe to run in a dedicated background worker process.
     """
     # print(f"📄 Partitioning PDF: {file_path}")
+    from unstructured.partition.pdf import partition_pdf
     
     elements = partition_pdf(
         file=file,  # Use 'filename' for file paths in unstructured
@@ -61,9 +72,36 @@ def partition_pdf_sync(file: str):
     
     return elements
 
+def partition_pdf_page_sync(reader: PdfReader, page_index: int):
+    """
+    Partition a single page of an already-opened PDF with the same hi_res settings
+    as partition_pdf_sync. Page numbers in the element metadata stay document-relative.
+    """
+    from unstructured.partition.pdf import partition_pdf
+
+    writer = PdfWriter()
+    writer.add_page(reader.pages[page_index])
+    page = BytesIO()
+    writer.write(page)
+    page.seek(0)
+
+    return partition_pdf(
+        file=page,
+        strategy="hi_res",
+        infer_table_structure=True,
+        extract_image_block_types=["Image"],
+        extract_image_block_to_payload=True,
+        starting_page_number=page_index + 1,
+    )
+
+
+def open_pdf(data: bytes) -> PdfReader:
+    return PdfReader(BytesIO(data))
+
 def create_chunks_by_title_sync(elements):
     """Synchronously creates intelligent chunks."""
     print("🔨 Creating smart chunks...")
+    from unstructured.chunking.title import chunk_by_title
     
     chunks = chunk_by_title(
         elements,                               
@@ -72,4 +110,257 @@ def create_chunks_by_title_sync(elements):
         combine_text_under_n_chars=500         
     )
     
-    return chunks
\ No newline at end of file
+    return chunks
+
+
+# -------------------------
+# Section-wise, token-sized chunker
+# -------------------------
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    return tiktoken.get_encoding(TOKEN_ENCODING)
+
+
+def count_tokens(texts):
+    """Token counts for many strings in one batched (multi-threaded) tiktoken call."""
+    encoded = _get_encoding().encode_ordinary_batch(
+        [text or "" for text in texts],
+        num_threads=os.cpu_count() or 1,
+    )
+    return [len(tokens) for tokens in encoded]
+
+
+def _split_sections(elements):
+    """Split elements into sections; every Title opens a new one."""
+    sections = []
+    current = []
+    for element in elements:
+        if element.category == "Title" and current:
+            sections.append(current)
+            current = []
+        current.append(element)
+    if current:
+        sections.append(current)
+    return sections
+
+
+def _make_chunk(elements, text=None):
+    from unstructured.documents.elements import CompositeElement, ElementMetadata
+
+    first = elements[0].metadata
+    # orig_elements holds references to the partitioned elements, so image
+    # payloads are shared with the partition output instead of copied per chunk
+    return CompositeElement(
+        text=text if text is not None else "\n\n".join(e.text for e in elements if e.text),
+        metadata=ElementMetadata(
+            filename=first.filename,
+            page_number=first.page_number,
+            orig_elements=list(elements),
+        ),
+    )
+
+
+def _split_oversized(element, max_tokens):
+    """Hard-split a single text element that exceeds max_tokens on token boundaries."""
+    encoding = _get_encoding()
+    tokens = encoding.encode_ordinary(element.text)
+    return [
+        _make_chunk([element], text=encoding.decode(tokens[i:i + max_tokens]))
+        for i in range(0, len(tokens), max_tokens)
+    ]
+
+
+def _chunk_section(section, token_counts, max_tokens, new_after_n_tokens):
+    """
+    Greedily pack one section into chunks.
+    Tables always get a chunk of their own, like unstructured's chunk_by_title.
+    Returns (chunk, tokens, is_table) tuples so the caller can combine small chunks.
+    """
+    chunks = []
+    pending = []
+    pending_tokens = 0
+
+    def close():
+        nonlocal pending, pending_tokens
+        if pending:
+            chunks.append((_make_chunk(pending), pending_tokens, False))
+        pending = []
+        pending_tokens = 0
+
+    for element, tokens in zip(section, token_counts):
+        if element.category == "Table":
+            close()
+            chunks.append((_make_chunk([element]), tokens, True))
+            continue
+
+        if tokens > max_tokens:
+            close()
+            for piece in _split_oversized(element, max_tokens):
+                chunks.append((piece, max_tokens, False))
+            continue
+
+        if pending and (
+            pending_tokens + tokens > max_tokens or pending_tokens >= new_after_n_tokens
+        ):
+            close()
+
+        pending.append(element)
+        pending_tokens += tokens
+
+    close()
+    return chunks
+
+
+def _combine_small(chunks, max_tokens, combine_under_n_tokens):
+    """Merge neighbouring text chunks that are under the combine threshold."""
+    combined = []
+    for chunk, tokens, is_table in chunks:
+        if combined:
+            prev_chunk, prev_tokens, prev_is_table = combined[-1]
+            if (
+                not is_table
+                and not prev_is_table
+                and prev_tokens < combine_under_n_tokens
+                and prev_tokens + tokens <= max_tokens
+            ):
+                merged = prev_chunk.metadata.orig_elements + chunk.metadata.orig_elements
+                combined[-1] = (
+                    _make_chunk(merged, text=f"{prev_chunk.text}\n\n{chunk.text}"),
+                    prev_tokens + tokens,
+                    False,
+                )
+                continue
+        combined.append((chunk, tokens, is_table))
+    return combined
+
+
+def create_chunks_by_section(
+    elements,
+    max_tokens: int = 750,
+    new_after_n_tokens: int = 600,
+    combine_under_n_tokens: int = 125,
+):
+    """
+    Token-sized alternative to create_chunks_by_title_sync.
+
+    Token counts for all elements are computed in one batched tiktoken call
+    (the expensive part, and multi-threaded inside tiktoken), then each
+    title-delimited section is packed greedily. Packing is plain Python and
+    cheap, so it runs serially; threads would only contend on the GIL.
+    Chunks keep references to their original elements rather than copies.
+    """
+    print("🔨 Creating section chunks...")
+
+    elements = list(elements)
+    if not elements:
+        return []
+
+    counts = count_tokens([e.text for e in elements])
+
+    sections = []
+    offset = 0
+    for section in _split_sections(elements):
+        sections.append((section, counts[offset:offset + len(section)]))
+        offset += len(section)
+
+    chunks = [
+        chunk
+        for section, section_counts in sections
+        for chunk in _chunk_section(section, section_counts, max_tokens, new_after_n_tokens)
+    ]
+
+    return [chunk for chunk, _, _ in _combine_small(chunks, max_tokens, combine_under_n_tokens)]
+
+
+
+class SectionChunker:
+    """
+    Incremental version of create_chunks_by_section for streamed elements.
+
+    Elements are fed page by page; chunks are emitted as soon as their section is
+    closed by the next Title. The last chunk is held back until the following
+    section arrives so small chunks can still be combined across sections.
+    If chunk_fn is given (e.g. create_chunks_by_title_sync) it is applied to the
+    closed sections instead of the token packer; the elements of its last chunk
+    are carried into the next call, so chunk_by_title still merges a short
+    section into the following one as it does on the whole document.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 750,
+        new_after_n_tokens: int = 600,
+        combine_under_n_tokens: int = 125,
+        chunk_fn=None,
+    ):
+        self.max_tokens = max_tokens
+        self.new_after_n_tokens = new_after_n_tokens
+        self.combine_under_n_tokens = combine_under_n_tokens
+        self.chunk_fn = chunk_fn
+        self._section = []
+        self._tail = []
+        self._carry = []
+
+    def feed(self, elements):
+        """Add elements; returns the chunks of every section they closed."""
+        closed = []
+        for element in elements:
+            if element.category == "Title" and self._section:
+                closed.append(self._section)
+                self._section = []
+            self._section.append(element)
+        return self._emit(closed, final=False)
+
+    def flush(self):
+        """Close the open section and return all remaining chunks."""
+        closed = [self._section] if self._section else []
+        self._section = []
+        return self._emit(closed, final=True)
+
+    def _emit_with_chunk_fn(self, sections, final):
+        if not sections and not final:
+            return []
+        elements = self._carry + [element for section in sections for element in section]
+        self._carry = []
+        if not elements:
+            return []
+
+        chunks = self.chunk_fn(elements)
+        if final or not chunks:
+            return chunks
+
+        carried = chunks[-1].metadata.orig_elements or []
+        earlier = {id(e) for chunk in chunks[:-1] for e in (chunk.metadata.orig_elements or [])}
+        if not carried or any(id(e) in earlier for e in carried):
+            # the last chunk holds the rest of an element split across chunks; it can't be redone
+            return chunks
+        self._carry = list(carried)
+        return chunks[:-1]
+
+    def _emit(self, sections, final):
+        if self.chunk_fn is not None:
+            return self._emit_with_chunk_fn(sections, final)
+
+        chunks = list(self._tail)
+        if sections:
+            counts = count_tokens([e.text for section in sections for e in section])
+            offset = 0
+            for section in sections:
+                chunks.extend(
+                    _chunk_section(
+                        section,
+                        counts[offset:offset + len(section)],
+                        self.max_tokens,
+                        self.new_after_n_tokens,
+                    )
+                )
+                offset += len(section)
+
+        chunks = _combine_small(chunks, self.max_tokens, self.combine_under_n_tokens)
+        if final:
+            self._tail = []
+        else:
+            self._tail = chunks[-1:]
+            chunks = chunks[:-1]
+        return [chunk for chunk, _, _ in chunks]
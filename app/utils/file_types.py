@@ -0,0 +1,90 @@
+import os
+import zipfile
+from io import BytesIO
+from typing import Optional
+
+try:
+    import magic
+except ImportError:  # libmagic missing: fall back to sniffing and the file extension
+    magic = None
+
+PDF = "pdf"
+DOCX = "docx"
+PPTX = "pptx"
+XLSX = "xlsx"
+HTML = "html"
+TEXT = "text"
+UNKNOWN = "unknown"
+
+_MIME_TYPES = {
+    "application/pdf": PDF,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": DOCX,
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": PPTX,
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": XLSX,
+    "text/html": HTML,
+    "application/xhtml+xml": HTML,
+    "text/plain": TEXT,
+    "text/markdown": TEXT,
+}
+
+_EXTENSIONS = {
+    ".pdf": PDF,
+    ".docx": DOCX,
+    ".pptx": PPTX,
+    ".xlsx": XLSX,
+    ".xlsm": XLSX,
+    ".html": HTML,
+    ".htm": HTML,
+    ".txt": TEXT,
+    ".md": TEXT,
+}
+
+# first part name inside an OOXML zip tells the formats apart
+_OOXML_PARTS = (("word/", DOCX), ("ppt/", PPTX), ("xl/", XLSX))
+
+
+def _ooxml_type(data: bytes) -> Optional[str]:
+    try:
+        with zipfile.ZipFile(BytesIO(data)) as archive:
+            names = archive.namelist()
+    except zipfile.BadZipFile:
+        return None
+    for prefix, file_type in _OOXML_PARTS:
+        if any(name.startswith(prefix) for name in names):
+            return file_type
+    return None
+
+
+def _sniff(data: bytes) -> Optional[str]:
+    head = data[:1024].lstrip()
+    if head.startswith(b"%PDF"):
+        return PDF
+    if head.startswith(b"PK\x03\x04"):
+        return _ooxml_type(data)
+    lowered = head[:256].lower()
+    if lowered.startswith((b"<!doctype html", b"<html")) or b"<html" in lowered:
+        return HTML
+    return None
+
+
+def detect_file_type(data: bytes, filename: Optional[str] = None) -> str:
+    """
+    One of pdf, docx, pptx, xlsx, html, text or unknown.
+    Content wins over the file name; the extension is only used when the bytes are ambiguous.
+    """
+    magic_type = None
+    if magic is not None:
+        mime = magic.from_buffer(data[:8192], mime=True)
+        magic_type = _MIME_TYPES.get(mime)
+        if magic_type is None and mime in ("application/zip", "application/octet-stream"):
+            magic_type = _ooxml_type(data)
+        # libmagic calls plenty of markup text/plain; let the sniffer look again
+        if magic_type not in (None, TEXT):
+            return magic_type
+
+    file_type = _sniff(data)
+    if file_type is not None:
+        return file_type
+
+    extension = os.path.splitext(filename or "")[1].lower()
+    return _EXTENSIONS.get(extension) or magic_type or UNKNOWN
@@ -0,0 +1,148 @@
+"""
+Partitioners for documents that carry their own structure.
+
+DOCX, PPTX, XLSX and HTML are read directly (python-docx, python-pptx,
+openpyxl, lxml via unstructured) instead of being rendered and run through the
+hi_res layout model, so they take milliseconds per document. Headings, list
+items, tables (with text_as_html) and slide/sheet page numbers come out as the
+same unstructured elements partition_pdf produces, so chunk_by_title and
+separate_content_types work unchanged. Embedded pictures are lifted from the
+OOXML package as Image elements with image_base64, like hi_res image blocks.
+"""
+import base64
+import posixpath
+import re
+import zipfile
+from io import BytesIO
+from typing import Dict, List, Optional
+
+from app.utils import file_types
+
+# pictures the vision model can read; EMF/WMF clip art and the like are skipped
+IMAGE_MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+# icons, bullets and spacer images are not worth a vision call
+MIN_IMAGE_BYTES = 4 * 1024
+
+_SLIDE = re.compile(r"^ppt/slides/slide(\d+)\.xml$")
+_TARGET = re.compile(rb'Target="([^"]+)"')
+
+
+def _image_element(data: bytes, name: str, filename: Optional[str], page_number: Optional[int]):
+    from unstructured.documents.elements import ElementMetadata, Image
+
+    mime_type = IMAGE_MIME_TYPES[posixpath.splitext(name)[1].lower()]
+    metadata = ElementMetadata(
+        filename=filename,
+        page_number=page_number,
+        image_base64=base64.b64encode(data).decode("ascii"),
+        image_mime_type=mime_type,
+    )
+    return Image(text=posixpath.basename(name), metadata=metadata)
+
+
+def _is_usable_image(name: str, size: int) -> bool:
+    return posixpath.splitext(name)[1].lower() in IMAGE_MIME_TYPES and size >= MIN_IMAGE_BYTES
+
+
+def _media_by_slide(archive: zipfile.ZipFile) -> Dict[int, List[str]]:
+    """Slide number -> media parts that slide references, from the slide relationship files."""
+    media = {}
+    for name in archive.namelist():
+        match = _SLIDE.match(name)
+        if not match:
+            continue
+        rels = f"ppt/slides/_rels/slide{match.group(1)}.xml.rels"
+        if rels not in archive.NameToInfo:
+            continue
+        targets = _TARGET.findall(archive.read(rels))
+        media[int(match.group(1))] = [
+            posixpath.normpath(posixpath.join("ppt/slides", t.decode())) for t in targets if b"media/" in t
+        ]
+    return media
+
+
+def extract_ooxml_images(data: bytes, file_type: str, filename: Optional[str] = None) -> dict:
+    """
+    Image elements for the pictures embedded in a DOCX/PPTX/XLSX, keyed by the
+    page (slide) they belong to; None when the position isn't known.
+    """
+    images = {}
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        if file_type == file_types.PPTX:
+            seen = set()
+            for slide, parts in sorted(_media_by_slide(archive).items()):
+                for part in parts:
+                    if part in seen or part not in archive.NameToInfo:
+                        continue
+                    seen.add(part)
+                    if _is_usable_image(part, archive.getinfo(part).file_size):
+                        images.setdefault(slide, []).append(_image_element(archive.read(part), part, filename, slide))
+        else:
+            prefix = "word/media/" if file_type == file_types.DOCX else "xl/media/"
+            for info in archive.infolist():
+                if info.filename.startswith(prefix) and _is_usable_image(info.filename, info.file_size):
+                    images.setdefault(None, []).append(
+                        _image_element(archive.read(info.filename), info.filename, filename, None)
+                    )
+    return images
+
+
+def _place_images(elements: list, images: dict) -> list:
+    """Put each slide's images after that slide's last element; unplaced images go at the end."""
+    if not images:
+        return elements
+
+    last_index = {}
+    for i, element in enumerate(elements):
+        last_index[element.metadata.page_number] = i
+
+    placed = []
+    for i, element in enumerate(elements):
+        placed.append(element)
+        page = element.metadata.page_number
+        if page in images and last_index.get(page) == i:
+            placed.extend(images.pop(page))
+
+    for remaining in images.values():
+        placed.extend(remaining)
+    return placed
+
+
+def partition_native_sync(data: bytes, file_type: str, filename: Optional[str] = None) -> list:
+    """Partition a non-PDF document from its own structure. No layout model, no OCR."""
+    file = BytesIO(data)
+    # the documents are English; skipping per-document language detection saves a pass
+    common = dict(metadata_filename=filename, languages=["eng"])
+
+    if file_type == file_types.DOCX:
+        from unstructured.partition.docx import partition_docx
+
+        elements = partition_docx(file=file, infer_table_structure=True, include_page_breaks=False, **common)
+    elif file_type == file_types.PPTX:
+        from unstructured.partition.pptx import partition_pptx
+
+        elements = partition_pptx(file=file, infer_table_structure=True, include_page_breaks=False, **common)
+    elif file_type == file_types.XLSX:
+        from unstructured.partition.xlsx import partition_xlsx
+
+        elements = partition_xlsx(file=file, infer_table_structure=True, **common)
+    elif file_type == file_types.HTML:
+        from unstructured.partition.html import partition_html
+
+        elements = partition_html(file=file, **common)
+    elif file_type == file_types.TEXT:
+        from unstructured.partition.text import partition_text
+
+        elements = partition_text(file=file, **common)
+    else:
+        raise ValueError(f"No native partitioner for file type '{file_type}'")
+
+    if file_type in (file_types.DOCX, file_types.PPTX, file_types.XLSX):
+        elements = _place_images(elements, extract_ooxml_images(data, file_type, filename))
+    return elements
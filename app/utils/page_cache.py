@@ -0,0 +1,134 @@
+"""
+Persistent cache of partitioned pages, keyed by the rendered page image.
+
+Cover pages, letterheads, form templates and re-uploaded documents render to
+byte-identical images, so the layout detection / OCR / table inference done
+for them once can be reused. Entries are the page's elements (as unstructured
+element dicts) plus the inference time they cost, stored as zstd-compressed
+versioned JSON under PAGE_CACHE_DIR/<2 hex>/<key>.json.zst. Writes go through
+a temp file and rename, so worker processes can share the directory.
+
+The directory is capped at PAGE_CACHE_MAX_MB. Hits touch their entry's mtime,
+and once a process sees the cache over the cap it deletes entries oldest
+mtime first (least recently used) down to PRUNE_TARGET of it.
+"""
+import logging
+import os
+import tempfile
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import zstandard
+
+from app.utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# empty string disables the cache
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "kchat", "pages"))
+ZSTD_LEVEL = 3
+# 0 disables the cap
+PAGE_CACHE_MAX_MB = int(os.getenv("PAGE_CACHE_MAX_MB", "4096"))
+PRUNE_TARGET = 0.9
+# other processes write too: re-measure the directory after this many puts
+RESCAN_EVERY = 500
+
+ENTRY_SUFFIX = ".json.zst"
+
+
+class PageCache:
+    def __init__(self, directory: str, max_bytes: int = PAGE_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._size: Optional[int] = None  # bytes on disk as last measured, plus our writes since
+        self._puts = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}{ENTRY_SUFFIX}")
+
+    def get(self, key: str) -> Optional[Tuple[list, float]]:
+        """(element dicts, inference seconds) for a page, or None."""
+        try:
+            with open(self._path(key), "rb") as f:
+                entry = loads(self._decompressor.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # corrupt or from a newer format: treat as a miss, it will be rewritten
+            logger.warning(f"Ignoring unreadable page cache entry {key}: {e}")
+            return None
+        try:
+            # recently used entries survive pruning
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return entry["elements"], entry["seconds"]
+
+    def put(self, key: str, element_dicts: list, seconds: float):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = self._compressor.compress(dumps({"elements": element_dicts, "seconds": seconds}).encode())
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        if self.max_bytes:
+            self._puts += 1
+            if self._size is None or self._puts >= RESCAN_EVERY:
+                self._size = self._measure()
+                self._puts = 0
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self.prune()
+
+    def _entries(self):
+        """(mtime, size, path) of every entry; entries removed meanwhile are skipped."""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(ENTRY_SUFFIX):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield st.st_mtime, st.st_size, path
+
+    def _measure(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def prune(self) -> int:
+        """Delete least recently used entries until the cache is under PRUNE_TARGET of its cap. Returns bytes left."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * PRUNE_TARGET
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass  # another worker pruned it
+            total -= size
+        if removed:
+            logger.info(f"Pruned {removed} page cache entries, {total / 2**20:.0f} MB left")
+        self._size = total
+        return total
+
+
+@lru_cache(maxsize=None)
+def get_page_cache() -> Optional[PageCache]:
+    if not PAGE_CACHE_DIR:
+        return None
+    return PageCache(PAGE_CACHE_DIR)
@@ -0,0 +1,146 @@
+"""
+Per-page PDF rasterisation with pypdfium2, and cached hi_res partitioning.
+
+Every page is rendered in-process by PDFium at PDF_RENDER_DPI (no
+pdf2image/poppler subprocess per page) and its pixels are hashed. A page
+whose image was partitioned before, in any document, comes straight from the
+page cache; otherwise it is partitioned and the result is stored.
+
+PDF_RENDER_BACKEND picks what a cache miss runs:
+  poppler  partition_pdf on the single page (default): layout detection on a
+           pdf2image render, with the text taken from the PDF's text layer
+  pdfium   hi_res on the PDFium-rendered image (partition_image); saves the
+           second render, but every page is OCRed and the text layer is not
+           used, so only opt in for scanned documents
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Optional
+
+import pypdfium2 as pdfium
+
+from app.services.metrics import record_cache, record_saved, stage
+from app.utils.page_cache import PageCache, get_page_cache
+
+logger = logging.getLogger(__name__)
+
+RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", "200"))
+RENDER_BACKEND = os.getenv("PDF_RENDER_BACKEND", "poppler")
+# bump when partition settings change so old cache entries stop matching
+PARTITION_VERSION = "hi_res-1"
+
+# PDFium is not thread-safe, not even across documents
+_PDFIUM_LOCK = threading.Lock()
+
+
+def render_page(pdf: "pdfium.PdfDocument", page_index: int, dpi: int = RENDER_DPI):
+    """Rasterise one page to an RGB PIL image."""
+    with _PDFIUM_LOCK:
+        page = pdf[page_index]
+        try:
+            bitmap = page.render(scale=dpi / 72)
+            # copy out of PDFium's buffer before the bitmap is released
+            return bitmap.to_pil().convert("RGB")
+        finally:
+            page.close()
+
+
+def page_key(image, dpi: int, backend: str) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{PARTITION_VERSION}:{backend}:{dpi}:{image.width}x{image.height}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def _partition_image(image, page_index: int):
+    from unstructured.partition.image import partition_image
+
+    buffer = BytesIO()
+    # lossless, and level 1 keeps encoding well under the inference time
+    image.save(buffer, format="PNG", compress_level=1)
+    buffer.seek(0)
+    return partition_image(
+        file=buffer,
+        strategy="hi_res",
+        infer_table_structure=True,
+        extract_image_block_types=["Image"],
+        extract_image_block_to_payload=True,
+        starting_page_number=page_index + 1,
+    )
+
+
+class PdfPages:
+    """An uploaded PDF opened for page-by-page rendering and cached partitioning."""
+
+    def __init__(
+        self,
+        data: bytes,
+        dpi: int = RENDER_DPI,
+        backend: str = RENDER_BACKEND,
+        cache: Optional[PageCache] = None,
+    ):
+        if backend not in ("pdfium", "poppler"):
+            raise ValueError(f"PDF_RENDER_BACKEND must be pdfium or poppler, got {backend!r}")
+        self.data = data
+        self.dpi = dpi
+        self.backend = backend
+        self.cache = cache if cache is not None else get_page_cache()
+        with _PDFIUM_LOCK:
+            self.pdf = pdfium.PdfDocument(data)
+            self.page_count = len(self.pdf)
+        self._reader = None
+
+    def __len__(self):
+        return self.page_count
+
+    def _partition_miss(self, image, page_index: int):
+        if self.backend == "pdfium":
+            return _partition_image(image, page_index)
+
+        from app.utils.chunking import open_pdf, partition_pdf_page_sync
+
+        if self._reader is None:
+            self._reader = open_pdf(self.data)
+        return partition_pdf_page_sync(self._reader, page_index)
+
+    def partition_page(self, page_index: int) -> list:
+        with stage("render"):
+            image = render_page(self.pdf, page_index, self.dpi)
+
+        key = page_key(image, self.dpi, self.backend)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            record_cache("page", cached is not None)
+            if cached is not None:
+                from unstructured.documents.elements import assign_and_map_hash_ids
+                from unstructured.staging.base import elements_from_dicts
+
+                element_dicts, seconds = cached
+                record_saved("inference", seconds)
+                elements = elements_from_dicts(element_dicts)
+                for element in elements:
+                    element.metadata.page_number = page_index + 1
+                # ids hash the page number: recompute them (and parent_ids) for this page
+                return assign_and_map_hash_ids(elements)
+
+        start = time.perf_counter()
+        with stage("inference"):
+            elements = self._partition_miss(image, page_index)
+        seconds = time.perf_counter() - start
+
+        if self.cache is not None:
+            from unstructured.staging.base import elements_to_dicts
+
+            try:
+                self.cache.put(key, elements_to_dicts(elements), seconds)
+            except OSError as e:
+                logger.warning(f"Could not write page cache entry: {e}")
+        return elements
+
+    def close(self):
+        with _PDFIUM_LOCK:
+            self.pdf.close()
@@ -0,0 +1,74 @@
+"""
+Serialization for queue payloads, chunk metadata and retrieval.
+
+Everything written here carries a format version so the layout can change
+later without breaking data already sitting in Redis or Qdrant:
+
+    dumps/loads  JSON text via orjson: the three-element array
+                 [ENVELOPE_TAG, version, value]. The tag starts with a NUL
+                 character, so no legacy payload can look like an envelope,
+                 and the value is stored untouched, whatever keys it has.
+                 Decoding never copies a multi-MB string to strip a prefix.
+    packb/unpackb  b"m2:" + msgpack bytes of the value when msgpack is
+                 installed, otherwise JSON bytes as above.
+
+Payloads without an envelope (written with the stdlib json module before this
+layer existed) are treated as version 0 and decode unchanged.
+"""
+import orjson
+
+try:
+    import msgpack
+except ImportError:  # optional, only used by packb/unpackb
+    msgpack = None
+
+
+FORMAT_VERSION = 2
+
+ENVELOPE_TAG = "\u0000kchat"
+MSGPACK_TAG = f"m{FORMAT_VERSION}:".encode()
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _wrap(obj):
+    return [ENVELOPE_TAG, FORMAT_VERSION, obj]
+
+
+def _unwrap(obj):
+    if isinstance(obj, list) and len(obj) == 3 and obj[0] == ENVELOPE_TAG:
+        version = obj[1]
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported serialization format version: {version}")
+        return obj[2]
+    return obj  # legacy, unversioned
+
+
+def dumps(obj) -> str:
+    """Encode to versioned JSON text (for Redis with decode_responses and Qdrant payloads)."""
+    return orjson.dumps(_wrap(obj), option=_ORJSON_OPTIONS).decode()
+
+
+def loads(data):
+    """Decode a value produced by dumps/packb, or legacy unversioned JSON."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        view = memoryview(data)
+        if view[:len(MSGPACK_TAG)] == MSGPACK_TAG:
+            if msgpack is None:
+                raise ValueError("msgpack payload received but msgpack is not installed")
+            return msgpack.unpackb(view[len(MSGPACK_TAG):], raw=False)
+        return _unwrap(orjson.loads(view))
+
+    return _unwrap(orjson.loads(data))
+
+
+def packb(obj) -> bytes:
+    """Encode to versioned bytes: msgpack when available, JSON otherwise."""
+    if msgpack is not None:
+        # the tag carries the version, so the value is packed as is
+        return MSGPACK_TAG + msgpack.packb(obj, use_bin_type=True)
+    return orjson.dumps(_wrap(obj), option=_ORJSON_OPTIONS)
+
+
+# unpackb is just loads; kept for symmetry with packb at call sites
+unpackb = loads
@@ -0,0 +1,15 @@
+import asyncio
+from typing import Coroutine, Set
+
+
+def spawn(coro: Coroutine, tasks: Set[asyncio.Task]) -> asyncio.Task:
+    """
+    Run coro in the background, holding it in `tasks` until it finishes.
+
+    The event loop only keeps weak references to tasks, so a fire-and-forget
+    task with no other owner can be garbage collected mid-run.
+    """
+    task = asyncio.ensure_future(coro)
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+    return task
@@ -0,0 +1,336 @@
+"""
+Admission control and adaptive concurrency for a worker process.
+
+Before a job is partitioned its cost is estimated from the file itself (size,
+page count and embedded images, read from the PDF/OOXML structure without
+rendering anything). A job is admitted only while the memory it is expected to
+need fits under the worker's ceiling next to the jobs already running; the
+first job is always admitted so a big document can't stall the worker.
+
+While jobs run, a control loop samples the process RSS and host CPU and adjusts
+two limits additively-increase / multiplicatively-decrease (AIMD, as in TCP):
+
+  partition  pages being partitioned at once (hi_res, the RAM- and CPU-heavy part)
+  llm        summary calls in flight (each holds its chunk's images)
+
+Above the memory high-water mark both limits are halved; above the CPU ceiling
+the partition limit is halved; with headroom, a limit that is fully used grows
+by one. Jobs estimated as heavy can be spilled to the scheduler's heavy lane
+and processed by a dedicated worker (see supervisor --heavy-workers).
+"""
+import asyncio
+import logging
+import os
+import time
+import zipfile
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from io import BytesIO
+from typing import Optional
+
+import psutil
+
+from app.services.metrics import Gauge, Histogram
+from app.utils import file_types
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# ceilings for one worker process
+MEMORY_CEILING_MB = int(os.getenv("ADMISSION_MEMORY_MB", os.getenv("WORKER_MEMORY_MB", "3072")))
+CPU_CEILING_PERCENT = float(os.getenv("ADMISSION_CPU_PERCENT", "85"))
+# shrink above HIGH_WATER of the memory ceiling, only grow below LOW_WATER
+HIGH_WATER = 0.9
+LOW_WATER = 0.75
+# workers on the heavy lane run one big job at a time and get a higher ceiling
+HEAVY_MEMORY_CEILING_MB = int(os.getenv("HEAVY_WORKER_MEMORY_MB", str(2 * MEMORY_CEILING_MB)))
+CONTROL_INTERVAL = float(os.getenv("ADMISSION_INTERVAL", "1.0"))
+
+PARTITION_CONCURRENCY_MAX = int(os.getenv("PARTITION_CONCURRENCY_MAX", "4"))
+LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", "32"))
+
+# cost model; rough peaks measured on hi_res at 200 dpi with image payloads.
+# A job partitions its pages one after another (ingest_pipeline.iter_pdf_pages),
+# so it is charged for a single page in flight: with the partition limit at N,
+# up to N pages run at once only because N jobs, each charged its own page,
+# have been admitted.
+JOB_BASE_MB = 150
+PDF_PAGE_MB = 600  # render + layout/table models for the page being partitioned
+MB_PER_IMAGE = 2  # extracted image payloads held until their chunk is summarised
+PDF_SIZE_FACTOR = 3  # pypdf/pdfium copies of the file
+NATIVE_SIZE_FACTOR = 10  # DOCX/PPTX/XLSX unpacked into XML trees
+
+# jobs past any of these go to the heavy lane (when one is configured)
+HEAVY_JOB_MB = int(os.getenv("HEAVY_JOB_MB", "1536"))
+HEAVY_PAGES = int(os.getenv("HEAVY_PAGES", "200"))
+HEAVY_IMAGES = int(os.getenv("HEAVY_IMAGES", "300"))
+
+CONCURRENCY_LIMIT = Gauge("kchat_concurrency_limit", "Current adaptive concurrency limit.", ("kind",))
+ADMISSION_WAIT = Histogram("kchat_admission_wait_seconds", "Time a downloaded job waited to be admitted.")
+JOB_ESTIMATED_MB = Histogram(
+    "kchat_job_estimated_memory_bytes",
+    "Estimated peak memory of admitted jobs.",
+    buckets=tuple(2**n * MB for n in range(6, 15)),  # 64 MiB .. 16 GiB
+)
+
+
+# -------------------------
+# Cost estimate
+# -------------------------
+
+@dataclass
+class JobCost:
+    file_type: str
+    size_bytes: int
+    pages: int
+    images: int
+    memory_mb: float
+
+    @property
+    def heavy(self) -> bool:
+        return self.memory_mb > HEAVY_JOB_MB or self.pages > HEAVY_PAGES or self.images > HEAVY_IMAGES
+
+
+def _pdf_pages_and_images(data: bytes):
+    from pypdf import PdfReader
+
+    reader = PdfReader(BytesIO(data))
+    images = 0
+    for page in reader.pages:
+        try:
+            xobjects = page["/Resources"].get_object().get("/XObject")
+            if xobjects is None:
+                continue
+            for obj in xobjects.get_object().values():
+                if obj.get_object().get("/Subtype") == "/Image":
+                    images += 1
+        except (KeyError, AttributeError):
+            continue
+    return len(reader.pages), images
+
+
+def _ooxml_pages_and_images(data: bytes, file_type: str):
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        names = archive.namelist()
+    media = sum(1 for name in names if "/media/" in name)
+    if file_type == file_types.PPTX:
+        pages = sum(1 for name in names if name.startswith("ppt/slides/slide") and name.endswith(".xml"))
+    elif file_type == file_types.XLSX:
+        pages = sum(1 for name in names if name.startswith("xl/worksheets/sheet"))
+    else:
+        pages = 1
+    return pages, media
+
+
+def estimate_cost(data: bytes, file_type: str) -> JobCost:
+    """Expected peak memory of ingesting a document, from its size and structure. Never renders."""
+    size_mb = len(data) / MB
+    pages, images = 1, 0
+    try:
+        if file_type == file_types.PDF:
+            pages, images = _pdf_pages_and_images(data)
+        elif file_type in (file_types.DOCX, file_types.PPTX, file_types.XLSX):
+            pages, images = _ooxml_pages_and_images(data, file_type)
+    except Exception as e:
+        # a malformed file fails properly in the partitioner; size alone is enough here
+        logger.warning(f"Could not inspect {file_type} for cost estimate: {e}")
+
+    if file_type == file_types.PDF:
+        memory_mb = JOB_BASE_MB + PDF_PAGE_MB + size_mb * PDF_SIZE_FACTOR + images * MB_PER_IMAGE
+    else:
+        memory_mb = JOB_BASE_MB + size_mb * NATIVE_SIZE_FACTOR + images * MB_PER_IMAGE
+    return JobCost(file_type, len(data), pages, images, round(memory_mb, 1))
+
+
+# -------------------------
+# Adaptive limits
+# -------------------------
+
+class AdaptiveLimiter:
+    """
+    Async semaphore whose limit can change while it is held. Lowering the limit
+    never interrupts holders; new acquirers wait until `active` drops below it.
+    """
+
+    def __init__(self, kind: str, limit: int, minimum: int = 1, maximum: Optional[int] = None):
+        self.kind = kind
+        self.minimum = minimum
+        self.maximum = maximum or limit
+        self.limit = max(minimum, min(limit, self.maximum))
+        self.active = 0
+        self._waiters = deque()
+        CONCURRENCY_LIMIT.set(self.limit, kind=kind)
+
+    @property
+    def saturated(self) -> bool:
+        return self.active >= self.limit and bool(self._waiters)
+
+    def set_limit(self, limit: int):
+        limit = max(self.minimum, min(limit, self.maximum))
+        if limit != self.limit:
+            logger.info(f"{self.kind} concurrency {self.limit} -> {limit}")
+            self.limit = limit
+            CONCURRENCY_LIMIT.set(limit, kind=self.kind)
+        self._wake()
+
+    def increase(self):
+        self.set_limit(self.limit + 1)
+
+    def decrease(self):
+        self.set_limit(self.limit // 2)
+
+    def _wake(self):
+        free = self.limit - self.active
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def acquire(self):
+        while self.active >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                # we may have been woken just before the cancel; pass the slot on
+                self._wake()
+                raise
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._wake()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+# -------------------------
+# Controller
+# -------------------------
+
+class AdmissionController:
+    def __init__(
+        self,
+        memory_ceiling_mb: int = MEMORY_CEILING_MB,
+        cpu_ceiling: float = CPU_CEILING_PERCENT,
+        partition_limit: int = 1,
+        llm_limit: int = 10,
+        interval: float = CONTROL_INTERVAL,
+    ):
+        self.memory_ceiling = memory_ceiling_mb * MB
+        self.cpu_ceiling = cpu_ceiling
+        self.interval = interval
+        self.partition = AdaptiveLimiter("partition", partition_limit, maximum=PARTITION_CONCURRENCY_MAX)
+        self.llm = AdaptiveLimiter("llm", llm_limit, maximum=max(llm_limit, LLM_CONCURRENCY_MAX))
+
+        self._process = psutil.Process()
+        psutil.cpu_percent(interval=None)  # first call only primes the counter
+        # models and clients are loaded before the first job; jobs are charged on top
+        self.baseline = self._process.memory_info().rss
+        self.rss = self.baseline
+        self.cpu = 0.0
+        self.reserved = 0  # estimated bytes of the jobs admitted and still running
+        self.admitted = 0
+        self._changed: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _condition(self) -> asyncio.Condition:
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    def sample(self):
+        self.rss = self._process.memory_info().rss
+        self.cpu = psutil.cpu_percent(interval=None)
+
+    def headroom(self) -> int:
+        """Bytes left under the ceiling, counting both what is used and what admitted jobs may still grow to."""
+        return self.memory_ceiling - max(self.rss, self.baseline + self.reserved)
+
+    def adjust(self):
+        """One AIMD step from the latest sample."""
+        if self.rss > self.memory_ceiling * HIGH_WATER:
+            self.partition.decrease()
+            self.llm.decrease()
+            return
+        if self.cpu > self.cpu_ceiling:
+            self.partition.decrease()
+            return
+
+        if self.rss < self.memory_ceiling * LOW_WATER:
+            if self.partition.saturated and self.cpu < self.cpu_ceiling * HIGH_WATER:
+                self.partition.increase()
+            if self.llm.saturated:
+                self.llm.increase()
+
+    async def _control_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sample()
+            self.adjust()
+            async with self._condition():
+                self._condition().notify_all()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._control_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def ready(self):
+        """Wait until there is room to take another job off the queue."""
+        async with self._condition():
+            await self._condition().wait_for(
+                lambda: self.admitted == 0 or (self.headroom() > 0 and self.rss < self.memory_ceiling * HIGH_WATER)
+            )
+
+    @asynccontextmanager
+    async def admit(self, cost: JobCost):
+        """Hold a job until its estimated memory fits next to the running ones, and account it while it runs."""
+        needed = int(cost.memory_mb * MB)
+        start = time.perf_counter()
+        async with self._condition():
+            await self._condition().wait_for(lambda: self.admitted == 0 or needed <= self.headroom())
+            self.admitted += 1
+            self.reserved += needed
+        ADMISSION_WAIT.observe(time.perf_counter() - start)
+        JOB_ESTIMATED_MB.observe(needed)
+        logger.info(
+            f"admitted {cost.file_type} job: {cost.pages} pages, {cost.images} images, "
+            f"~{cost.memory_mb:.0f} MB ({self.admitted} running)"
+        )
+        try:
+            yield
+        finally:
+            async with self._condition():
+                self.admitted -= 1
+                self.reserved -= needed
+                self.sample()
+                self._condition().notify_all()
+
+
+@lru_cache(maxsize=None)
+def get_admission_controller(heavy: bool = False) -> AdmissionController:
+    return AdmissionController(
+        memory_ceiling_mb=HEAVY_MEMORY_CEILING_MB if heavy else MEMORY_CEILING_MB,
+        llm_limit=int(os.getenv("SUMMARY_CONCURRENCY", "10")),
+    )
@@ -3,7 +3,7 @@ import os
 import sys
 import httpx
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from app.services.supabase_client import supabase
+from app.services.providers import get_supabase
 
 
 UPLOAD_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'uploads'))
@@ -19,7 +19,7 @@ async def process_job(job):
 
     # Generate signed URL (blocking → thread)
     signed_url_resp = await asyncio.to_thread(
-        lambda: supabase.storage.from_(bucket).create_signed_url(file_path, 60)
+        lambda: get_supabase().storage.from_(bucket).create_signed_url(file_path, 60)
     )
 
     signed_url = signed_url_resp.get("signedURL")
@@ -0,0 +1,260 @@
+"""
+Process supervisor for RAG workers.
+
+    python -m app.workers.supervisor [--workers N] [--concurrency M] [--heavy-workers H]
+
+Imports the partition stack (unstructured, torch, onnxruntime, cv2) once, then
+forks N worker processes that share those pages copy-on-write. Inference
+sessions and network clients are created after the fork, in each worker,
+because their thread pools and sockets do not survive fork(). Each worker runs
+app.services.rag.rag() with up to M jobs in flight, as far as its admission
+controller lets it (see app.workers.admission). With H heavy workers, jobs a
+worker estimates as too big are moved to the heavy lane and run one at a time
+by those H extra processes, with a larger memory ceiling.
+
+Crashed workers are restarted with exponential backoff. On SIGTERM/SIGINT every
+worker stops taking jobs, finishes the ones it has, and exits; workers still
+busy after --drain-timeout are killed.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+
+import psutil
+
+logger = logging.getLogger("supervisor")
+
+# hi_res partitioning with image payloads routinely peaks at a few GB per job
+DEFAULT_WORKER_MEMORY_MB = int(os.getenv("WORKER_MEMORY_MB", "3072"))
+
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 60.0
+# a worker that stayed up this long is considered healthy again
+STABLE_AFTER_SECONDS = 60.0
+# how often the supervisor reaps exited workers and restarts due ones
+POLL_INTERVAL = 0.5
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        return os.cpu_count() or 1
+
+
+def _memory_limit_bytes() -> int:
+    """Container memory limit (cgroup v2/v1) if set, otherwise physical memory."""
+    total = psutil.virtual_memory().total
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit():
+            return min(total, int(value))
+    return total
+
+
+def default_worker_count(worker_memory_mb: int = DEFAULT_WORKER_MEMORY_MB) -> int:
+    by_memory = _memory_limit_bytes() // (worker_memory_mb * 1024 * 1024)
+    return max(1, min(_available_cpus(), by_memory))
+
+
+# -------------------------
+# Worker process
+# -------------------------
+
+def _run_worker(
+    slot: int, concurrency: int, threads: int, metrics_port: int, preload_models: bool, heavy: bool, spill: bool
+) -> int:
+    """Body of a forked worker. Returns the process exit code."""
+    # fresh signal handlers: the parent's would otherwise run in the child
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    if "torch" in sys.modules:
+        # N workers × all cores of intra-op threads would oversubscribe the host
+        sys.modules["torch"].set_num_threads(threads)
+
+    from app.services.metrics import start_metrics_server
+    from app.services.providers import warmup
+    from app.services.rag import rag
+
+    if metrics_port:
+        start_metrics_server(metrics_port + slot)
+
+    async def main():
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, stop_event.set)
+
+        # sessions and network clients are built after the fork, never shared with the parent
+        await asyncio.to_thread(warmup, preload_models)
+        return await rag(concurrency=concurrency, stop_event=stop_event, heavy=heavy, spill=spill)
+
+    try:
+        return 0 if asyncio.run(main()) else 1
+    except Exception:
+        logger.exception(f"worker {slot} crashed")
+        return 1
+
+
+# -------------------------
+# Supervisor
+# -------------------------
+
+class Supervisor:
+    def __init__(
+        self,
+        workers: int,
+        concurrency: int,
+        drain_timeout: float,
+        metrics_port: int,
+        preload: bool = True,
+        heavy_workers: int = 0,
+    ):
+        self.workers = workers
+        self.heavy_workers = heavy_workers
+        self.preload = preload
+        self.concurrency = concurrency
+        self.drain_timeout = drain_timeout
+        self.metrics_port = metrics_port
+        # heavy workers run torch too
+        self.threads = max(1, _available_cpus() // (workers + heavy_workers))
+
+        self.children = {}  # pid -> slot
+        self.started_at = {}  # slot -> monotonic start time
+        # heavy workers take the slots after the regular ones
+        self.failures = {slot: 0 for slot in range(workers + heavy_workers)}
+        self.restart_at = {}  # slot -> monotonic time when it may be restarted
+        self.stopping = False
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                heavy = slot >= self.workers
+                code = _run_worker(
+                    slot,
+                    1 if heavy else self.concurrency,
+                    self.threads,
+                    self.metrics_port,
+                    self.preload,
+                    heavy=heavy,
+                    spill=self.heavy_workers > 0,
+                )
+            finally:
+                logging.shutdown()
+                os._exit(code)
+
+        self.children[pid] = slot
+        self.started_at[slot] = time.monotonic()
+        kind = "heavy worker" if slot >= self.workers else "worker"
+        logger.info(f"{kind} {slot} started (pid {pid})")
+
+    def _on_exit(self, pid: int, status: int):
+        slot = self.children.pop(pid)
+        code = os.waitstatus_to_exitcode(status)
+        if self.stopping:
+            logger.info(f"worker {slot} (pid {pid}) exited with {code}")
+            return
+
+        if time.monotonic() - self.started_at[slot] >= STABLE_AFTER_SECONDS:
+            self.failures[slot] = 0
+        delay = min(BACKOFF_MAX, BACKOFF_INITIAL * 2 ** self.failures[slot])
+        self.failures[slot] += 1
+        self.restart_at[slot] = time.monotonic() + delay
+        logger.warning(f"worker {slot} (pid {pid}) exited with {code}; restarting in {delay:.0f}s")
+
+    def _request_stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"received {signal.Signals(signum).name}; draining {len(self.children)} worker(s)")
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self._on_exit(pid, status)
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        for slot in range(self.workers + self.heavy_workers):
+            self._spawn(slot)
+
+        while not self.stopping:
+            self._reap()
+            now = time.monotonic()
+            for slot, when in list(self.restart_at.items()):
+                if when <= now and not self.stopping:
+                    del self.restart_at[slot]
+                    self._spawn(slot)
+            time.sleep(POLL_INTERVAL)
+
+        deadline = time.monotonic() + self.drain_timeout
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(POLL_INTERVAL)
+
+        for pid, slot in list(self.children.items()):
+            logger.warning(f"worker {slot} (pid {pid}) still busy after {self.drain_timeout:.0f}s; killing")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            del self.children[pid]
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run and supervise RAG worker processes.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "0")),
+                        help="worker processes (default: sized to CPUs and WORKER_MEMORY_MB)")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("WORKER_CONCURRENCY", "1")),
+                        help="most jobs each worker processes at once; admission control may run fewer")
+    parser.add_argument("--heavy-workers", type=int, default=int(os.getenv("HEAVY_WORKERS", "0")),
+                        help="extra workers for the heavy lane; 0 runs heavy jobs in place")
+    parser.add_argument("--drain-timeout", type=float, default=float(os.getenv("DRAIN_TIMEOUT", "600")),
+                        help="seconds to let in-flight jobs finish on shutdown")
+    parser.add_argument("--metrics-port", type=int, default=int(os.getenv("METRICS_PORT", "9100")),
+                        help="first worker's metrics port; worker i listens on port + i (0 disables)")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="don't import the partition stack before forking or load models at worker start")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s[%(process)d] %(message)s")
+
+    workers = args.workers or default_worker_count()
+
+    if not args.no_preload:
+        from app.services.providers import import_partition_stack
+
+        start = time.perf_counter()
+        import_partition_stack()
+        logger.info(f"partition stack imported in {time.perf_counter() - start:.1f}s")
+
+    logger.info(f"starting {workers} worker(s) × {args.concurrency} job(s) + {args.heavy_workers} heavy worker(s)")
+    supervisor = Supervisor(
+        workers, args.concurrency, args.drain_timeout, args.metrics_port, not args.no_preload, args.heavy_workers
+    )
+    sys.exit(supervisor.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Compare create_chunks_by_title_sync with create_chunks_by_section.
+
+Each PDF in the folder is partitioned once (hi_res, same as the worker), then
+both chunkers run over the same elements. Wall time and tracemalloc peak are
+reported per file and in total.
+
+    python -m benchmarks.bench_chunking path/to/pdfs [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.utils.chunking import (  # noqa: E402
+    partition_pdf_sync,
+    create_chunks_by_title_sync,
+    create_chunks_by_section,
+)
+
+
+CHUNKERS = {
+    "title": create_chunks_by_title_sync,
+    "section": create_chunks_by_section,
+}
+
+
+def measure(chunker, elements, repeat):
+    best_time = float("inf")
+    peak = 0
+    n_chunks = 0
+    for _ in range(repeat):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        chunks = chunker(elements)
+        elapsed = time.perf_counter() - start
+        _, run_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        best_time = min(best_time, elapsed)
+        peak = max(peak, run_peak)
+        n_chunks = len(chunks)
+        del chunks
+    return best_time, peak, n_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("folder", help="folder of sample PDFs")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pdfs = sorted(
+        os.path.join(args.folder, name)
+        for name in os.listdir(args.folder)
+        if name.lower().endswith(".pdf")
+    )
+    if not pdfs:
+        sys.exit(f"No PDFs found in {args.folder}")
+
+    totals = {name: [0.0, 0] for name in CHUNKERS}
+
+    print(f"{'file':40} {'chunker':8} {'chunks':>7} {'time (ms)':>10} {'peak (MiB)':>11}")
+    for path in pdfs:
+        with open(path, "rb") as f:
+            elements = partition_pdf_sync(file=f)
+
+        for name, chunker in CHUNKERS.items():
+            elapsed, peak, n_chunks = measure(chunker, elements, args.repeat)
+            totals[name][0] += elapsed
+            totals[name][1] = max(totals[name][1], peak)
+            print(
+                f"{os.path.basename(path)[:40]:40} {name:8} {n_chunks:>7} "
+                f"{elapsed * 1000:>10.1f} {peak / 2**20:>11.2f}"
+            )
+
+    print()
+    for name, (elapsed, peak) in totals.items():
+        print(f"TOTAL {name:8} time={elapsed * 1000:.1f} ms  max peak={peak / 2**20:.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+End-to-end ingestion benchmark.
+
+Runs every PDF in a folder through the real worker path (queue → download →
+partition → chunk → summarise → upsert) with local stand-ins for external
+services:
+  - OpenAI chat/embeddings: benchmarks.fake_services (latency and 429s configurable)
+  - Supabase storage:       benchmarks.fake_services, serving the PDF folder
+  - Qdrant:                 in-process QdrantClient(":memory:")
+  - Redis:                  fakeredis, or a real server with --redis-url
+
+Reports docs/min, p50/p99 per stage, time saved by the page cache and peak
+RSS, and writes a JSON result to benchmarks/results/ named after the current
+commit so runs can be compared. The page cache starts empty unless
+--page-cache points at a warm one.
+
+    python -m benchmarks.bench_ingest path/to/pdfs --concurrency 2 --compare
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+from benchmarks.fake_services import FAKE_SUPABASE_KEY, create_app, serve_in_thread  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def make_record(filename):
+    return {
+        "id": str(uuid.uuid4()),
+        "storage_path": filename,
+        "file_name": filename,
+        "title": os.path.splitext(filename)[0],
+        "course": "BTech",
+        "school": "Benchmark School",
+        "semester": "1",
+        "document_type": "regulation",
+        "effective_from": "2025-01-01",
+        "effective_till": None,
+        "issuing_authority": "Benchmark",
+    }
+
+
+def configure_environment(base_url, redis_url, page_cache, artifact_dir):
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+    os.environ["SUPABASE_URL"] = base_url
+    os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+    os.environ["QDRANT_URL"] = ":memory:"
+    os.environ.pop("QDRANT_API_KEY", None)
+    os.environ["PAGE_CACHE_DIR"] = page_cache
+    # keep benchmark documents out of the real artifact store
+    os.environ["ARTIFACT_DIR"] = artifact_dir
+    if redis_url:
+        os.environ["REDIS_URL"] = redis_url
+
+
+async def run(args, pdfs):
+    # app modules read their configuration at import time, so import only now
+    from app.services import metrics, redis_queue, scheduler
+
+    if not args.redis_url:
+        import fakeredis
+
+        redis_queue.r = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    samples = {}
+    observe = metrics.STAGE_SECONDS.observe
+
+    def record_sample(value, **labels):
+        samples.setdefault(labels.get("stage"), []).append(value)
+        observe(value, **labels)
+
+    metrics.STAGE_SECONDS.observe = record_sample
+
+    from app.services import providers, rag
+
+    for path in pdfs:
+        record = make_record(os.path.basename(path))
+        await scheduler.enqueue(
+            {"uuid": record["id"], "storage_path": record["storage_path"], "file_name": record["file_name"], "record": record},
+            size_bytes=os.path.getsize(path),
+        )
+
+    queue_stats = await scheduler.get_stats()
+    job_seconds = []
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        while True:
+            job = await scheduler.pop_job()
+            if job is None:
+                return
+            start = time.perf_counter()
+            ok = await rag.handle_job(job)
+            job_seconds.append(time.perf_counter() - start)
+            failures += 0 if ok else 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - start
+
+    store = providers.get_vector_store()
+    points = store.client.count(store.collection_name).count
+
+    return {
+        "wall_seconds": round(wall, 3),
+        "documents": len(pdfs),
+        "failed": failures,
+        "chunks_indexed": points,
+        "saved_seconds": {labels[0]: round(v, 3) for labels, v in metrics.SAVED_SECONDS._values.items()},
+        "page_cache": {labels[1]: int(v) for labels, v in metrics.CACHE_REQUESTS._values.items() if labels[0] == "page"},
+        "queue_at_start": queue_stats,
+        "docs_per_min": round(len(pdfs) / wall * 60, 3) if wall else None,
+        "job_seconds": {"p50": percentile(job_seconds, 50), "p99": percentile(job_seconds, 99)},
+        "stages": {
+            stage: {
+                "calls": len(values),
+                "total": round(sum(values), 3),
+                "p50": percentile(values, 50),
+                "p99": percentile(values, 99),
+            }
+            for stage, values in sorted(samples.items())
+        },
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def print_report(result, previous=None):
+    print(f"\ncommit {result['commit']}  {result['documents']} docs  concurrency {result['config']['concurrency']}")
+    print(f"docs/min {result['docs_per_min']}   wall {result['wall_seconds']}s   "
+          f"peak RSS {result['peak_rss_mib']} MiB   failed {result['failed']}")
+    print(f"page cache {result['page_cache']}   saved {result['saved_seconds']}")
+    print(f"\n{'stage':12} {'calls':>6} {'p50 s':>9} {'p99 s':>9}" + (f" {'prev p50':>9} {'prev p99':>9}" if previous else ""))
+    for stage, values in result["stages"].items():
+        line = f"{stage:12} {values['calls']:>6} {values['p50']:>9.3f} {values['p99']:>9.3f}"
+        if previous and stage in previous.get("stages", {}):
+            prev = previous["stages"][stage]
+            line += f" {prev['p50']:>9.3f} {prev['p99']:>9.3f}"
+        print(line)
+    if previous:
+        print(f"\nprevious ({previous['commit']}): docs/min {previous['docs_per_min']}, "
+              f"peak RSS {previous['peak_rss_mib']} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("folder", help="folder of sample PDFs")
+    parser.add_argument("--concurrency", type=int, default=1, help="jobs processed at once")
+    parser.add_argument("--chat-latency", type=float, default=1.5, help="seconds per fake chat completion")
+    parser.add_argument("--embedding-latency", type=float, default=0.2, help="seconds per fake embeddings call")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of OpenAI calls answered with 429")
+    parser.add_argument("--redis-url", help="use this Redis instead of fakeredis")
+    parser.add_argument("--page-cache", help="page cache directory (default: a fresh empty one)")
+    parser.add_argument("--compare", action="store_true", help="compare with the most recent stored result")
+    args = parser.parse_args()
+
+    pdfs = sorted(glob.glob(os.path.join(args.folder, "*.pdf")))
+    if not pdfs:
+        sys.exit(f"No PDFs found in {args.folder}")
+
+    app = create_app(
+        args.folder,
+        chat_latency=args.chat_latency,
+        embedding_latency=args.embedding_latency,
+        rate_limit_ratio=args.rate_limit,
+    )
+    base_url, server = serve_in_thread(app)
+    configure_environment(
+        base_url,
+        args.redis_url,
+        args.page_cache or tempfile.mkdtemp(prefix="kchat-pages-"),
+        tempfile.mkdtemp(prefix="kchat-artifacts-"),
+    )
+
+    result = asyncio.run(run(args, pdfs))
+    server.should_exit = True
+
+    result.update(
+        commit=git_revision(),
+        timestamp=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        config=vars(args),
+        fake_requests=dict(app.state.requests),
+    )
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    previous = None
+    if args.compare:
+        existing = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")), key=os.path.getmtime)
+        if existing:
+            with open(existing[-1], encoding="utf-8") as f:
+                previous = json.load(f)
+
+    out_path = os.path.join(RESULTS_DIR, f"{result['timestamp'][:19].replace(':', '')}_{result['commit']}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print_report(result, previous)
+    print(f"\nresult written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare page rasterisation: pypdfium2 in-process vs pdf2image/poppler.
+
+Renders every page of every PDF in the folder at the same DPI with both
+backends and reports total and per-page time, plus the render time pypdfium2
+saves. pdf2image needs the poppler binaries; without them only pypdfium2 is
+measured.
+
+    python -m benchmarks.bench_render path/to/pdfs [--dpi 200]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pypdfium2 as pdfium  # noqa: E402
+
+from app.utils.pdf_render import RENDER_DPI, render_page  # noqa: E402
+
+
+def render_pdfium(data, dpi):
+    pdf = pdfium.PdfDocument(data)
+    try:
+        for page_index in range(len(pdf)):
+            render_page(pdf, page_index, dpi)
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def render_poppler(data, dpi):
+    from pdf2image import convert_from_bytes
+
+    return len(convert_from_bytes(data, dpi=dpi))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("folder", help="folder of sample PDFs")
+    parser.add_argument("--dpi", type=int, default=RENDER_DPI)
+    args = parser.parse_args()
+
+    pdfs = sorted(glob.glob(os.path.join(args.folder, "*.pdf")))
+    if not pdfs:
+        sys.exit(f"No PDFs found in {args.folder}")
+
+    backends = {"pdfium": render_pdfium, "poppler": render_poppler}
+    totals = {name: 0.0 for name in backends}
+    pages = 0
+
+    print(f"{'file':40} {'pages':>6} {'pdfium s':>10} {'poppler s':>10}")
+    for path in pdfs:
+        with open(path, "rb") as f:
+            data = f.read()
+        times = {}
+        for name, render in list(backends.items()):
+            start = time.perf_counter()
+            try:
+                n = render(data, args.dpi)
+            except Exception as e:
+                print(f"{name} unavailable, skipping it: {e}")
+                del backends[name]
+                continue
+            times[name] = time.perf_counter() - start
+            totals[name] += times[name]
+        pages += n
+        print(f"{os.path.basename(path)[:40]:40} {n:>6} "
+              + " ".join(f"{times[name]:>10.3f}" if name in times else f"{'-':>10}" for name in ("pdfium", "poppler")))
+
+    print(f"\n{pages} pages at {args.dpi} dpi")
+    for name in backends:
+        print(f"{name:8} total {totals[name]:8.3f}s   per page {totals[name] / pages * 1000:8.1f} ms")
+    if "poppler" in backends:
+        print(f"render time saved by pdfium: {totals['poppler'] - totals['pdfium']:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
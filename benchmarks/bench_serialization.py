@@ -0,0 +1,81 @@
+"""
+Encode/decode microbenchmark for chunk payloads: stdlib json vs orjson vs msgpack.
+
+The payload mirrors what process_single_chunk stores in "original_content":
+a few KB of text, some table HTML and base64 images. Pass --from-jsonl to use
+real payloads instead (one original_content JSON object per line).
+
+    python -m benchmarks.bench_serialization [--image-kb 800] [--images 3]
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.utils import serialization  # noqa: E402
+
+
+def synthetic_payload(image_kb, images):
+    return {
+        "raw_text": "Clause 4.2 — attendance below 75% makes a student ineligible. " * 50,
+        "tables_html": ["<table>" + "<tr><td>CS101</td><td>4</td><td>Core</td></tr>" * 40 + "</table>"],
+        "images_base64": [
+            base64.b64encode(os.urandom(image_kb * 1024)).decode() for _ in range(images)
+        ],
+    }
+
+
+def load_payloads(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def bench(name, encode, decode, payloads, number):
+    encoded = [encode(p) for p in payloads]
+    enc = timeit.timeit(lambda: [encode(p) for p in payloads], number=number) / number
+    dec = timeit.timeit(lambda: [decode(e) for e in encoded], number=number) / number
+    size = sum(len(e) for e in encoded)
+    return name, enc, dec, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--from-jsonl", help="file with one original_content object per line")
+    parser.add_argument("--image-kb", type=int, default=800)
+    parser.add_argument("--images", type=int, default=3)
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.from_jsonl:
+        payloads = load_payloads(args.from_jsonl)
+    else:
+        payloads = [synthetic_payload(args.image_kb, args.images) for _ in range(args.chunks)]
+
+    results = [
+        bench("json", json.dumps, json.loads, payloads, args.number),
+        bench("orjson (dumps/loads)", serialization.dumps, serialization.loads, payloads, args.number),
+    ]
+    if serialization.msgpack is not None:
+        results.append(
+            bench("msgpack (packb/unpackb)", serialization.packb, serialization.unpackb, payloads, args.number)
+        )
+    else:
+        print("msgpack not installed; skipping")
+
+    base_enc, base_dec = results[0][1], results[0][2]
+    print(f"{len(payloads)} payloads, {results[0][3] / 2**20:.1f} MiB encoded with json\n")
+    print(f"{'codec':26} {'encode ms':>10} {'decode ms':>10} {'enc x':>6} {'dec x':>6} {'MiB':>7}")
+    for name, enc, dec, size in results:
+        print(
+            f"{name:26} {enc * 1000:>10.2f} {dec * 1000:>10.2f} "
+            f"{base_enc / enc:>6.1f} {base_dec / dec:>6.1f} {size / 2**20:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Measure cold import time of the API and worker entry modules with `python -X importtime`.
+
+Each module is imported in a fresh interpreter several times and the best
+cumulative time is reported, followed by the slowest top-level imports.
+
+    python -m benchmarks.import_time [--module app.main] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def import_profile(module):
+    """Return {module: cumulative_us} for one cold import of `module`."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    profile = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        depth = (len(name) - len(name.lstrip())) // 2
+        profile[name.strip()] = (int(cumulative), depth)
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", action="append", help="module to import (repeatable)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for module in args.module or ["app.main", "app.services.rag"]:
+        runs = [import_profile(module) for _ in range(args.runs)]
+        best = min(runs, key=lambda p: p[module][0])
+        print(f"{module}: {best[module][0] / 1000:.1f} ms (best of {args.runs})")
+
+        heavy = sorted(
+            ((us, name) for name, (us, depth) in best.items() if depth <= 2 and name != module),
+            reverse=True,
+        )[: args.top]
+        for us, name in heavy:
+            print(f"    {us / 1000:8.1f} ms  {name}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import hashlib
+import re
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services import qdrant_client
+
+VECTOR_SIZE = 8
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic stand-in for OpenAIEmbeddings: a small vector derived from the text."""
+
+    def _embed(self, text):
+        digest = hashlib.blake2b(text.encode(), digest_size=VECTOR_SIZE).digest()
+        return [1.0 + byte / 255 for byte in digest]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class WordEncoding:
+    """Stand-in for a tiktoken encoding (one token per word or symbol), so tests don't fetch BPE files."""
+
+    def encode_ordinary(self, text):
+        return re.findall(r"\w+|[^\w\s]", text)
+
+    def encode_ordinary_batch(self, texts, num_threads=1):
+        return [self.encode_ordinary(t) for t in texts]
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture
+def word_encoding():
+    return WordEncoding()
+
+
+@pytest.fixture
+def memory_store(monkeypatch):
+    """Factory for VectorStoreServices on an in-process Qdrant with fake embeddings."""
+    monkeypatch.setenv("QDRANT_URL", qdrant_client.IN_MEMORY)
+    monkeypatch.setattr(qdrant_client, "OpenAIEmbeddings", lambda **kwargs: HashEmbeddings())
+
+    def make(collection_name="kb", placement=qdrant_client.PLACEMENT_NONE):
+        return qdrant_client.VectorStoreService(collection_name, "test-model", VECTOR_SIZE, placement=placement)
+
+    return make
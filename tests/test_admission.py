@@ -0,0 +1,75 @@
+import asyncio
+from io import BytesIO
+
+import pypdfium2 as pdfium
+
+from app.utils import file_types
+from app.workers.admission import MB, AdaptiveLimiter, AdmissionController, JobCost, estimate_cost
+
+
+def make_pdf(pages):
+    pdf = pdfium.PdfDocument.new()
+    for _ in range(pages):
+        pdf.new_page(612, 792)
+    buffer = BytesIO()
+    pdf.save(buffer)
+    return buffer.getvalue()
+
+
+def test_estimate_counts_pdf_pages():
+    cost = estimate_cost(make_pdf(3), file_types.PDF)
+    assert (cost.pages, cost.images) == (3, 0)
+    assert not cost.heavy
+
+
+def test_limiter_shrinks_and_grows():
+    async def main():
+        limiter = AdaptiveLimiter("test", 4, maximum=8)
+        running = []
+
+        async def work():
+            async with limiter:
+                running.append(limiter.active)
+                await asyncio.sleep(0.01)
+
+        limiter.decrease()
+        assert limiter.limit == 2
+        await asyncio.gather(*(work() for _ in range(6)))
+        assert max(running) == 2
+
+        for _ in range(10):
+            limiter.increase()
+        assert limiter.limit == 8
+        limiter.set_limit(0)
+        assert limiter.limit == 1
+
+    asyncio.run(main())
+
+
+def test_jobs_wait_for_memory_headroom():
+    async def main():
+        controller = AdmissionController(memory_ceiling_mb=10_000)
+        controller.baseline = controller.rss = 0
+        controller.sample = lambda: None
+        big = JobCost(file_types.PDF, 0, 1, 0, memory_mb=6_000)
+        order = []
+
+        async def job(name):
+            async with controller.admit(big):
+                order.append(f"{name} start")
+                await asyncio.sleep(0.02)
+                order.append(f"{name} end")
+
+        await asyncio.gather(job("a"), job("b"))
+        # the second job doesn't fit next to the first, so they run one after the other
+        assert order == ["a start", "a end", "b start", "b end"]
+        assert controller.reserved == 0 and controller.admitted == 0
+
+    asyncio.run(main())
+
+
+def test_memory_pressure_halves_limits():
+    controller = AdmissionController(memory_ceiling_mb=1_000, partition_limit=4, llm_limit=16)
+    controller.rss, controller.cpu = 950 * MB, 10.0
+    controller.adjust()
+    assert (controller.partition.limit, controller.llm.limit) == (2, 8)
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.utils.artifacts import artifact_writer, document_dir, iter_chunks, iter_document_dirs, load_vectors, read_manifest
+
+
+def write(directory, document_id, texts):
+    with artifact_writer(document_id, "test-model", str(directory)) as writer:
+        documents = [Document(page_content=t, metadata={"document_id": document_id}) for t in texts]
+        writer.add([f"id-{t}" for t in texts], documents, [[float(len(t)), 1.0] for t in texts])
+
+
+def test_roundtrip(tmp_path):
+    write(tmp_path, "doc/1", ["a", "bb", "ccc"])
+    path = document_dir(str(tmp_path), "doc/1")
+
+    assert list(iter_document_dirs(str(tmp_path))) == [path]
+    assert read_manifest(path)["count"] == 3
+    with open(os.path.join(path, "manifest.json")) as f:
+        assert json.load(f)["document_id"] == "doc/1"
+    assert [c["id"] for c in iter_chunks(path)] == ["id-a", "id-bb", "id-ccc"]
+    vectors = load_vectors(path)
+    assert vectors.dtype == np.float32 and isinstance(vectors, np.memmap)
+    assert vectors[:, 0].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_failed_job_keeps_previous_artifacts(tmp_path):
+    write(tmp_path, "doc", ["old"])
+    with pytest.raises(RuntimeError):
+        with artifact_writer("doc", "test-model", str(tmp_path)) as writer:
+            writer.add(["id-new"], [Document(page_content="new")], [[1.0, 1.0]])
+            raise RuntimeError("summary failed")
+
+    assert os.listdir(tmp_path) == ["doc"]
+    assert [c["page_content"] for c in iter_chunks(document_dir(str(tmp_path), "doc"))] == ["old"]
+
+
+def test_expired_and_superseded_documents_are_not_reloaded(tmp_path):
+    from app.services.artifact_loader import find_retired
+
+    series = {"school": "Law", "course": "LLB", "document_type": "policy", "title": "Fees"}
+    records = {
+        "expired": {"effective_till": "2026-01-31"},
+        "old": dict(series, effective_from="2024-08-01"),
+        "new": dict(series, effective_from="2025-08-01"),
+        "open": {"effective_till": None},
+    }
+    for document_id, metadata in records.items():
+        with artifact_writer(document_id, "test-model", str(tmp_path)) as writer:
+            writer.add([f"id-{document_id}"], [Document(page_content=document_id, metadata=metadata)], [[1.0, 1.0]])
+
+    paths = list(iter_document_dirs(str(tmp_path)))
+    retired = find_retired(paths, "2026-10-19T00:00:00Z")
+    assert retired == {document_dir(str(tmp_path), "expired"), document_dir(str(tmp_path), "old")}
+
+
+def test_bulk_loader_rebuilds_the_collection(tmp_path, memory_store):
+    from app.services.artifact_loader import BulkLoader
+    from app.services.qdrant_client import document_payload
+    from app.utils.artifacts import async_artifact_writer
+
+    source = memory_store("kb")
+    documents = [
+        Document(page_content=f"rule {i}", metadata={"document_id": "doc", "school": "Law", "chunk": i})
+        for i in range(5)
+    ]
+
+    async def ingest():
+        async with async_artifact_writer("doc", "test-model", str(tmp_path)) as writer:
+            for batch in (documents[:3], documents[3:]):
+                ids, vectors = source.add_documents(batch)
+                writer.add(ids, batch, vectors)
+
+    asyncio.run(ingest())
+
+    target = memory_store("kb-rebuilt")
+    loader = BulkLoader(target, batch_size=2)
+    assert loader.load_document(document_dir(str(tmp_path), "doc")) == 5
+    loader.finish()
+    loader.resume_indexing()
+
+    ids = [chunk["id"] for chunk in iter_chunks(document_dir(str(tmp_path), "doc"))]
+    original = {p.id: p for p in source.client.retrieve("kb", ids, with_payload=True, with_vectors=True)}
+    rebuilt = {p.id: p for p in target.client.retrieve("kb-rebuilt", ids, with_payload=True, with_vectors=True)}
+    assert sorted(rebuilt) == sorted(original) == sorted(ids)
+    for point_id, point in rebuilt.items():
+        assert point.payload == original[point_id].payload
+        assert point.vector == pytest.approx(original[point_id].vector, abs=1e-6)
+    assert rebuilt[ids[0]].payload == document_payload(documents[0])
+
+    hits = target.similarity_search("rule 3", k=5, active_only=False)
+    assert sorted(d.page_content for d in hits) == sorted(d.page_content for d in documents)
+    assert target.similarity_search("rule 3", k=1, active_only=False)[0].page_content == "rule 3"
+
+
+def test_tenant_collection_is_ensured_once(memory_store, monkeypatch):
+    from app.services.qdrant_client import PLACEMENT_COLLECTION
+
+    store = memory_store("kb", placement=PLACEMENT_COLLECTION)
+    ensured = []
+    ensure = store._ensure_collection
+    monkeypatch.setattr(store, "_ensure_collection", lambda name=None: ensured.append(name) or ensure(name))
+    for i in range(3):
+        store.add_documents([Document(page_content=f"batch {i}", metadata={"school": "Law"})])
+    assert ensured == ["kb__law"]
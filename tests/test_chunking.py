@@ -0,0 +1,122 @@
+import pytest
+from unstructured.documents.elements import ElementMetadata, NarrativeText, Table, Title
+
+from app.utils import chunking
+from app.utils.chunking import SectionChunker, create_chunks_by_section
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch, word_encoding):
+    monkeypatch.setattr(chunking, "_get_encoding", lambda: word_encoding)
+
+
+def make_document(sections=6, paragraphs=5, words=40):
+    pages = []
+    for s in range(sections):
+        page = [Title(f"Section {s}", metadata=ElementMetadata(page_number=s + 1))]
+        for p in range(paragraphs):
+            page.append(NarrativeText(" ".join(f"s{s}p{p}w{w}" for w in range(words)),
+                                      metadata=ElementMetadata(page_number=s + 1)))
+        if s % 2:
+            page.append(Table("a b c", metadata=ElementMetadata(page_number=s + 1)))
+        pages.append(page)
+    return pages
+
+
+def test_chunks_respect_token_limit():
+    elements = [e for page in make_document() for e in page]
+    chunks = create_chunks_by_section(elements, max_tokens=100, new_after_n_tokens=80, combine_under_n_tokens=20)
+    assert all(len(c.text.split()) <= 100 for c in chunks)
+    # every element ends up in exactly one chunk, in order
+    assert [e.text for c in chunks for e in c.metadata.orig_elements] == [e.text for e in elements]
+
+
+def test_streamed_chunks_match_whole_document():
+    pages = make_document()
+    elements = [e for page in pages for e in page]
+    whole = create_chunks_by_section(elements, max_tokens=100, new_after_n_tokens=80, combine_under_n_tokens=60)
+
+    chunker = SectionChunker(max_tokens=100, new_after_n_tokens=80, combine_under_n_tokens=60)
+    streamed = [c for page in pages for c in chunker.feed(page)] + chunker.flush()
+
+    assert [c.text for c in streamed] == [c.text for c in whole]
+
+
+def test_title_chunker_streamed_merges_short_sections_like_whole_document():
+    from unstructured.chunking.title import chunk_by_title
+
+    def chunk_fn(elements):
+        return chunk_by_title(elements, max_characters=3000, new_after_n_chars=2400, combine_text_under_n_chars=500)
+
+    # short sections (a title and one line) must still merge across headings
+    pages = make_document(sections=8, paragraphs=1, words=5) + make_document(sections=3, paragraphs=12, words=60)
+    elements = [e for page in pages for e in page]
+
+    chunker = SectionChunker(chunk_fn=chunk_fn)
+    streamed = [c for page in pages for c in chunker.feed(page)] + chunker.flush()
+
+    assert [c.text for c in streamed] == [c.text for c in chunk_fn(elements)]
+
+
+def test_pipeline_streams_chunks_into_batches():
+    import asyncio
+
+    from app.services.ingest_pipeline import iter_chunks, upsert_in_batches
+
+    class Store:
+        def __init__(self):
+            self.batches = []
+
+        def add_documents(self, documents):
+            self.batches.append(len(documents))
+            return [str(i) for i in range(len(documents))], [[0.0] for _ in documents]
+
+    async def pages():
+        for page in make_document():
+            yield page
+
+    async def run():
+        store = Store()
+        chunks = iter_chunks(pages(), SectionChunker(max_tokens=100, new_after_n_tokens=80, combine_under_n_tokens=20))
+        uploaded = await upsert_in_batches(chunks, store, batch_size=4)
+        return store, uploaded
+
+    store, uploaded = asyncio.run(run())
+    expected = create_chunks_by_section(
+        [e for page in make_document() for e in page], max_tokens=100, new_after_n_tokens=80, combine_under_n_tokens=20
+    )
+    assert uploaded == len(expected) == sum(store.batches)
+    assert all(size == 4 for size in store.batches[:-1])
+
+
+def test_retried_job_overwrites_its_points(memory_store, monkeypatch):
+    import asyncio
+
+    from unstructured.documents.elements import CompositeElement, ElementMetadata, Text
+
+    from app.services.ingest_pipeline import upsert_in_batches
+    from app.utils import ai_enhanced_docs
+
+    monkeypatch.setattr(ai_enhanced_docs, "get_summary_llm", lambda: None)
+    record = {
+        "id": "doc", "title": "Rules", "course": None, "school": "Law", "semester": None, "document_type": "policy",
+        "effective_from": None, "effective_till": None, "issuing_authority": None, "updated_at": "2026-10-01",
+    }
+    store = memory_store("kb")
+
+    async def ingest(record):
+        async def chunks():
+            for i in range(5):
+                text = f"rule {i}"
+                yield CompositeElement(text, metadata=ElementMetadata(orig_elements=[Text(text)]))
+
+        documents = ai_enhanced_docs.iter_summarised_chunks(chunks(), record, concurrency=2)
+        return await upsert_in_batches(documents, store, batch_size=2)
+
+    asyncio.run(ingest(record))
+    asyncio.run(ingest(record))
+    assert store.client.count("kb").count == 5
+
+    # a new version of the row is ingested next to the old one (lifecycle retires it)
+    asyncio.run(ingest({**record, "updated_at": "2026-10-02"}))
+    assert store.client.count("kb").count == 10
@@ -0,0 +1,56 @@
+
+import pytest
+from langchain_core.documents import Document
+
+from app.retrival import context_packer
+from app.retrival.context_packer import IMAGE_TOKENS, count_tokens, pack_context
+from app.utils.serialization import dumps
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch, word_encoding):
+    monkeypatch.setattr(context_packer, "_encoding", lambda model: word_encoding)
+
+
+def make_chunk(summary, raw_text=None, tables=(), images=()):
+    original = {"raw_text": raw_text or summary, "tables_html": list(tables), "images_base64": list(images)}
+    return Document(page_content=summary, metadata={"original_content": dumps(original)})
+
+
+def test_stays_within_budget():
+    chunks = [make_chunk(f"Rule {i}: " + "students must attend classes regularly " * 30) for i in range(20)]
+    packed = pack_context("attendance rules", chunks, budget=800)
+    assert packed.tokens <= 800
+    assert count_tokens(packed.text) <= packed.tokens
+    assert packed.dropped_over_budget > 0
+
+
+def test_drops_overlapping_chunks():
+    text = "The minimum attendance required to sit the end semester examination is seventy five percent"
+    chunks = [make_chunk(text), make_chunk(text + " of classes."), make_chunk("Fees are due in July each year.")]
+    packed = pack_context("attendance", chunks)
+    assert packed.dropped_duplicates == 1
+    assert len(packed.documents) == 2
+
+
+def test_prefers_shorter_of_summary_and_raw_text():
+    raw = "Late fee table for hostel payments."
+    summary = "A detailed searchable description of the late fee table. " * 10
+    packed = pack_context("hostel late fee", [make_chunk(summary, raw_text=raw)])
+    assert raw in packed.text
+    assert "searchable description" not in packed.text
+
+
+def test_includes_only_relevant_tables():
+    fees = "<table><tr><td>Hostel fee</td><td>40000</td></tr></table>"
+    timetable = "<table><tr><td>Monday</td><td>Physics lab</td></tr></table>"
+    packed = pack_context("What is the hostel fee?", [make_chunk("Fee structure", tables=[fees, timetable])])
+    assert fees in packed.text
+    assert timetable not in packed.text
+
+
+def test_caps_images_by_budget():
+    chunks = [make_chunk(f"Campus map section {i} with building names {i}", images=[f"img{i}a", f"img{i}b"]) for i in range(5)]
+    packed = pack_context("campus map", chunks, image_budget=3 * IMAGE_TOKENS)
+    assert packed.images == ["img0a", "img0b", "img1a"]
+    assert len(packed.message_content("prompt")) == 4
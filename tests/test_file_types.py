@@ -0,0 +1,42 @@
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from app.utils import file_types
+from app.utils.file_types import detect_file_type
+
+
+def ooxml(part):
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr(part, "<xml/>")
+    return buffer.getvalue()
+
+
+@pytest.fixture(params=["libmagic", "sniffing"])
+def detector(request, monkeypatch):
+    if request.param == "sniffing":
+        monkeypatch.setattr(file_types, "magic", None)
+    elif file_types.magic is None:
+        pytest.skip("python-magic not available")
+    return detect_file_type
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n", file_types.PDF),
+    (ooxml("word/document.xml"), file_types.DOCX),
+    (ooxml("ppt/presentation.xml"), file_types.PPTX),
+    (ooxml("xl/workbook.xml"), file_types.XLSX),
+    (b"<!DOCTYPE html><html><body><p>Notice</p></body></html>", file_types.HTML),
+])
+def test_detects_from_content(detector, data, expected):
+    # a misleading name must not override the content
+    assert detector(data, "upload.bin") == expected
+
+
+def test_falls_back_to_extension(monkeypatch):
+    monkeypatch.setattr(file_types, "magic", None)
+    assert detect_file_type(b"Library hours: 9 to 8", "notice.txt") == file_types.TEXT
+    assert detect_file_type(b"\x00\x01\x02", "blob.bin") == file_types.UNKNOWN
@@ -5,4 +5,4 @@ def test_read_root():
     client = TestClient(app)
     response = client.get("/")
     assert response.status_code == 200
-    assert response.json() == {"message": "Backend API is running."}
+    assert response.json() == {"status": "running"}
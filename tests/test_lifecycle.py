@@ -0,0 +1,99 @@
+import pytest
+
+from app.services.lifecycle import ARCHIVE_PREFIX, document_heads, find_superseded, run_lifecycle
+from app.services.qdrant_client import PLACEMENT_COLLECTION, PLACEMENT_NONE
+
+TODAY = "2026-10-19T00:00:00Z"
+
+
+def head(title, effective_from, school="Law"):
+    return {"school": school, "course": "LLB", "document_type": "policy", "title": title, "effective_from": effective_from}
+
+
+def test_newer_version_in_effect_supersedes_older():
+    heads = {
+        "v1": head("Exam Rules", "2023-01-01"),
+        "v2": head("exam rules ", "2025-08-01"),
+        "v3": head("Exam Rules", "2099-01-01"),  # not in effect yet
+        "other": head("Exam Rules", "2020-01-01", school="Medicine"),
+        "undated": head("Exam Rules", None),
+    }
+    assert find_superseded(heads, "2026-10-19T00:00:00Z") == {"v1"}
+
+
+def test_nothing_superseded_before_the_new_version_starts():
+    heads = {"v1": head("Fees", "2024-01-01"), "v2": head("Fees", "2026-11-01")}
+    assert find_superseded(heads, "2026-10-19T00:00:00Z") == set()
+
+
+
+def test_documents_missing_a_series_field_are_left_alone():
+    notice = dict(head("", "2024-01-01"), course=None)
+    heads = {"n1": notice, "n2": dict(notice, effective_from="2025-01-01"), "n3": head(None, "2026-01-01")}
+    assert find_superseded(heads, TODAY) == set()
+
+
+def test_versions_effective_on_the_same_day_are_kept():
+    heads = {
+        "a": head("Fees", "2025-08-01"),
+        "b": head("Fees", "2025-08-01T09:00:00Z"),
+        "old": head("Fees", "2024-08-01"),
+    }
+    assert find_superseded(heads, TODAY) == {"old"}
+
+def chunk(document_id, effective_from, effective_till=None, title="Handbook", school="Law"):
+    from langchain_core.documents import Document
+
+    metadata = {
+        "document_id": document_id, "title": title, "school": school, "course": "LLB", "document_type": "policy",
+        "effective_from": effective_from, "effective_till": effective_till,
+    }
+    return Document(page_content=f"{document_id} {title}", metadata=metadata)
+
+
+def load(store):
+    store.add_documents([
+        chunk("old", "2020-01-01"), chunk("old", "2020-01-01"),
+        chunk("new", "2025-01-01"),
+        chunk("next", "2099-01-01"),
+        chunk("expired", "2020-01-01", "2024-12-31", title="Fees"),
+        chunk("undated", None, title="Map"),
+    ])
+
+
+def remaining(store):
+    return sorted({d.metadata["document_id"] for d in store.similarity_search("handbook", k=20, active_only=False)})
+
+
+@pytest.mark.parametrize("placement", [PLACEMENT_NONE, PLACEMENT_COLLECTION])
+def test_retire_run_archives_expired_and_superseded(memory_store, placement):
+    store = memory_store("kb", placement=placement)
+    load(store)
+    collection_name = store.collection_name if placement == PLACEMENT_NONE else store.tenant_collection("law")
+
+    report = run_lifecycle(store, today=TODAY, dry_run=True)
+    assert report["collections"][collection_name] == {"expired": 1, "superseded": 1, "points": 3}
+    assert remaining(store) == ["expired", "new", "next", "old", "undated"]
+
+    run_lifecycle(store, today=TODAY)
+    assert remaining(store) == ["new", "next", "undated"]
+    assert store.client.count(f"{ARCHIVE_PREFIX}{collection_name}").count == 3
+
+    # nothing left to retire
+    assert run_lifecycle(store, today=TODAY)["collections"][collection_name]["points"] == 0
+
+
+def test_retire_run_can_delete_instead(memory_store):
+    store = memory_store("kb")
+    load(store)
+    run_lifecycle(store, today=TODAY, archive=False)
+    assert remaining(store) == ["new", "next", "undated"]
+    assert not store.client.collection_exists(f"{ARCHIVE_PREFIX}kb")
+
+
+def test_document_heads_one_per_document(memory_store):
+    store = memory_store("kb")
+    load(store)
+    heads = document_heads(store, "kb", ["old", "new", "missing"])
+    assert sorted(heads) == ["new", "old"]
+    assert heads["old"]["effective_from"] == "2020-01-01" and heads["old"]["title"] == "Handbook"
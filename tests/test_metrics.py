@@ -0,0 +1,92 @@
+import asyncio
+import json
+import logging
+
+import pytest
+
+from app.services import metrics
+from app.services.metrics import Counter, Gauge, Histogram, record_cache, record_chunks, record_tokens, stage, track_job
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Metrics created in a test go into a throwaway registry."""
+    monkeypatch.setattr(metrics, "REGISTRY", {})
+    return metrics.REGISTRY
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = Histogram("test_seconds", "Test latency.", ("stage",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, stage="x")
+
+    assert metrics.render_prometheus().splitlines() == [
+        "# HELP test_seconds Test latency.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="x",le="0.1"} 2',
+        'test_seconds_bucket{stage="x",le="1"} 3',
+        'test_seconds_bucket{stage="x",le="+Inf"} 4',
+        'test_seconds_sum{stage="x"} 3.65',
+        'test_seconds_count{stage="x"} 4',
+    ]
+
+
+def test_label_values_are_escaped(registry):
+    counter = Counter("test_total", "Test counter.", ("tenant",))
+    counter.inc(tenant='School "A"\\B\nC')
+    assert metrics.render_prometheus().splitlines()[-1] == 'test_total{tenant="School \\"A\\"\\\\B\\nC"} 1'
+
+
+def test_gauge_set_dec_and_function(registry):
+    gauge = Gauge("test_depth", "Test gauge.")
+    gauge.set(5)
+    gauge.dec(2)
+    assert "test_depth 3" in metrics.render_prometheus()
+
+    Gauge("test_rss", "Test function gauge.", function=lambda: 42)
+    assert "test_rss 42" in metrics.render_prometheus()
+
+
+def test_track_job_attributes_work_to_its_job(caplog):
+    async def summarise():
+        with stage("summarise"):
+            record_tokens(10, 5)
+
+    def partition():
+        with stage("partition"):
+            record_cache("page", hit=False)
+
+    with caplog.at_level(logging.INFO, logger=metrics.__name__):
+        with track_job("job-1") as stats:
+            with stage("download"):
+                pass
+            asyncio.run(summarise())  # tasks inherit the job context
+            asyncio.run(asyncio.to_thread(partition))  # and so do to_thread workers
+            record_cache("page", hit=True)
+            record_chunks(3)
+        # outside the job nothing is attributed
+        record_chunks(100)
+
+    assert set(stats.stages) == {"download", "summarise", "partition"}
+    assert (stats.chunks, stats.tokens) == (3, 15)
+    assert stats.cache_hits == {"page": 1} and stats.cache_misses == {"page": 1}
+
+    summary = json.loads(caplog.records[-1].getMessage())
+    assert summary["event"] == "job_finished" and summary["job_id"] == "job-1"
+    assert (summary["status"], summary["chunks"], summary["cache_hit_ratio"]) == ("ok", 3, {"page": 0.5})
+
+
+def test_track_job_reports_errors(caplog):
+    with caplog.at_level(logging.INFO, logger=metrics.__name__):
+        with pytest.raises(RuntimeError):
+            with track_job("job-2"):
+                raise RuntimeError("boom")
+    assert json.loads(caplog.records[-1].getMessage())["status"] == "error"
+
+
+def test_track_job_records_the_status_the_job_sets(caplog):
+    with caplog.at_level(logging.INFO, logger=metrics.__name__):
+        with track_job("job-3") as job:
+            job.status = "spilled"
+    assert json.loads(caplog.records[-1].getMessage())["status"] == "spilled"
+    assert metrics.DOCUMENTS._values[("spilled",)] >= 1
@@ -0,0 +1,122 @@
+import base64
+import os
+from io import BytesIO
+
+import docx
+import pptx
+import pytest
+import spacy
+from PIL import Image as PILImage
+from pptx.util import Inches
+from unstructured.documents.elements import ElementMetadata, Image, Text
+from unstructured.nlp import tokenize
+
+from app.utils import file_types
+from app.utils.ai_enhanced_docs import separate_content_types
+from app.utils.chunking import create_chunks_by_title_sync
+from app.utils.native_partition import _place_images, extract_ooxml_images, partition_native_sync
+
+
+@pytest.fixture(autouse=True)
+def blank_nlp(monkeypatch):
+    """Sentence splitting without the en_core_web_sm download unstructured would attempt."""
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    monkeypatch.setattr(tokenize, "_get_nlp", lambda: nlp)
+
+
+def png(size=64):
+    # noise doesn't compress, so the picture stays above MIN_IMAGE_BYTES
+    buffer = BytesIO()
+    PILImage.frombytes("RGB", (size, size), os.urandom(size * size * 3)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def make_docx(picture):
+    document = docx.Document()
+    document.add_heading("Attendance", 1)
+    document.add_paragraph("Students must attend 75% of classes.")
+    document.add_picture(BytesIO(picture))
+    document.add_heading("Fees", 1)
+    document.add_paragraph("Fees are due in July.")
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_pptx(pictures):
+    """One slide per entry of `pictures` (a list of images for that slide)."""
+    presentation = pptx.Presentation()
+    for number, slide_pictures in enumerate(pictures, start=1):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        slide.shapes.title.text = f"Slide {number}"
+        slide.placeholders[1].text = f"Body of slide {number}"
+        for picture in slide_pictures:
+            slide.shapes.add_picture(BytesIO(picture), Inches(1), Inches(1))
+    buffer = BytesIO()
+    presentation.save(buffer)
+    return buffer.getvalue()
+
+
+def test_pptx_images_follow_their_slide():
+    picture = png()
+    elements = partition_native_sync(make_pptx([[], [picture], []]), file_types.PPTX, "deck.pptx")
+    images = [e for e in elements if isinstance(e, Image)]
+    assert len(images) == 1
+    assert base64.b64decode(images[0].metadata.image_base64) == picture
+    assert images[0].metadata.image_mime_type == "image/png"
+    assert images[0].metadata.filename == "deck.pptx"
+
+    pages = [e.metadata.page_number for e in elements]
+    position = elements.index(images[0])
+    # after everything on slide 2, before slide 3
+    assert pages[position] == 2
+    assert set(pages[:position]) == {1, 2} and pages[position - 1] == 2
+    assert set(pages[position + 1:]) == {3}
+
+
+def test_pptx_image_shared_by_slides_is_extracted_once():
+    picture = png()
+    images = extract_ooxml_images(make_pptx([[picture], [picture]]), file_types.PPTX)
+    assert list(images) == [1]
+    assert len(images[1]) == 1
+
+
+def test_small_images_are_skipped():
+    tiny = png(size=4)
+    assert extract_ooxml_images(make_pptx([[tiny]]), file_types.PPTX) == {}
+    assert extract_ooxml_images(make_docx(tiny), file_types.DOCX) == {}
+
+
+def test_docx_images_go_at_the_end():
+    picture = png()
+    elements = partition_native_sync(make_docx(picture), file_types.DOCX, "rules.docx")
+    assert isinstance(elements[-1], Image)
+    assert base64.b64decode(elements[-1].metadata.image_base64) == picture
+    assert [e.text for e in elements[:-1]] == [
+        "Attendance", "Students must attend 75% of classes.", "Fees", "Fees are due in July."
+    ]
+
+
+def test_place_images():
+    def text(page):
+        return Text(f"p{page}", metadata=ElementMetadata(page_number=page))
+
+    def image(name):
+        return Image(name)
+
+    elements = [text(1), text(1), text(2), text(3)]
+    placed = _place_images(elements, {1: [image("a")], 3: [image("b")], 9: [image("c")], None: [image("d")]})
+    assert [e.text for e in placed] == ["p1", "p1", "a", "p2", "p3", "b", "c", "d"]
+    assert _place_images(elements, {}) is elements
+
+
+def test_native_elements_chunk_by_title():
+    picture = png()
+    elements = partition_native_sync(make_pptx([[picture], []]), file_types.PPTX, "deck.pptx")
+    chunks = create_chunks_by_title_sync(elements)
+
+    originals = [e for chunk in chunks for e in chunk.metadata.orig_elements]
+    assert [e.text for e in originals] == [e.text for e in elements]
+    content = [separate_content_types(chunk) for chunk in chunks]
+    assert [image for c in content for image in c["images"]] == [base64.b64encode(picture).decode("ascii")]
@@ -0,0 +1,63 @@
+import os
+from io import BytesIO
+
+import pypdfium2 as pdfium
+from unstructured.documents.elements import ElementMetadata, Text, Title, assign_and_map_hash_ids
+
+from app.utils import pdf_render
+from app.utils.page_cache import PageCache
+
+
+def make_pdf(sizes):
+    pdf = pdfium.PdfDocument.new()
+    for width, height in sizes:
+        pdf.new_page(width, height)
+    buffer = BytesIO()
+    pdf.save(buffer)
+    return buffer.getvalue()
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = PageCache(str(tmp_path))
+    assert cache.get("ab" * 20) is None
+    cache.put("ab" * 20, [{"type": "Title", "text": "Notice"}], 1.5)
+    assert cache.get("ab" * 20) == ([{"type": "Title", "text": "Notice"}], 1.5)
+
+
+def test_cache_prunes_least_recently_used(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.put("aa" * 20, [{"text": "a"}], 1.0)
+    entry_size = os.path.getsize(cache._path("aa" * 20))
+    cache.max_bytes = int(entry_size * 2.5)
+
+    cache.put("bb" * 20, [{"text": "b"}], 1.0)
+    os.utime(cache._path("aa" * 20), (100, 100))
+    os.utime(cache._path("bb" * 20), (200, 200))
+    assert cache.get("aa" * 20) is not None  # a hit makes "aa" the most recently used
+
+    cache.put("cc" * 20, [{"text": "c"}], 1.0)
+    assert cache.get("bb" * 20) is None
+    assert cache.get("aa" * 20) is not None and cache.get("cc" * 20) is not None
+    assert cache._size <= cache.max_bytes
+
+
+def test_identical_pages_are_partitioned_once(tmp_path, monkeypatch):
+    partitioned = []
+
+    def partition_miss(self, image, page_index):
+        partitioned.append(page_index)
+        title = Title(f"page {page_index + 1}", metadata=ElementMetadata(page_number=page_index + 1))
+        body = Text("body", metadata=ElementMetadata(page_number=page_index + 1, parent_id=title.id))
+        return assign_and_map_hash_ids([title, body])
+
+    monkeypatch.setattr(pdf_render.PdfPages, "_partition_miss", partition_miss)
+    pages = pdf_render.PdfPages(make_pdf([(612, 792), (612, 792), (300, 300)]), dpi=36, cache=PageCache(str(tmp_path)))
+    elements = [pages.partition_page(i) for i in range(len(pages))]
+    pages.close()
+
+    assert partitioned == [0, 2]
+    # the cached copy of page 1 is renumbered for page 2
+    assert [(e[0].text, e[0].metadata.page_number) for e in elements] == [("page 1", 1), ("page 1", 2), ("page 3", 3)]
+    # the copy gets its own ids, and its body still points at its own title
+    assert elements[1][0].id != elements[0][0].id
+    assert elements[1][1].metadata.parent_id == elements[1][0].id
@@ -0,0 +1,92 @@
+import asyncio
+import gc
+import threading
+import time
+
+from app.services.query_cache import QueryEmbedder, SingleFlight, normalize_query
+
+
+class CountingEmbeddings:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        time.sleep(self.delay)
+        return [float(len(text))]
+
+    async def aembed_documents(self, texts):
+        self.calls.append(list(texts))
+        await asyncio.sleep(self.delay)
+        return [[float(len(t))] for t in texts]
+
+
+def test_normalize_query():
+    assert normalize_query("  What is the  FEE? ") == "what is the fee"
+    assert normalize_query("what is the fee") == normalize_query("What is the fee?!")
+
+
+def test_concurrent_queries_are_batched_and_coalesced():
+    embeddings = CountingEmbeddings(delay=0.01)
+    embedder = QueryEmbedder(embeddings, max_wait_ms=5)
+
+    async def main():
+        return await asyncio.gather(
+            embedder.aembed("Exam dates?"),
+            embedder.aembed("exam dates"),
+            embedder.aembed("Hostel fee"),
+        )
+
+    vectors = asyncio.run(main())
+    assert vectors[0] == vectors[1]
+    assert embeddings.calls == [["exam dates", "hostel fee"]]
+
+    asyncio.run(embedder.aembed("EXAM DATES"))
+    assert len(embeddings.calls) == 1
+
+
+def test_batch_task_is_held_until_done():
+    embedder = QueryEmbedder(CountingEmbeddings(delay=0.02), max_wait_ms=1)
+
+    async def main():
+        query = asyncio.ensure_future(embedder.aembed("Library hours"))
+        await asyncio.sleep(0.01)  # batch flushed and running
+        running = len(embedder._tasks)
+        gc.collect()
+        return running, await query
+
+    running, vector = asyncio.run(main())
+    assert running == 1
+    assert vector == [13.0]
+    assert not embedder._tasks
+
+
+def test_cache_expires():
+    embeddings = CountingEmbeddings()
+    embedder = QueryEmbedder(embeddings, ttl=0.05)
+    embedder.embed("exam dates")
+    embedder.embed("exam dates")
+    time.sleep(0.1)
+    embedder.embed("exam dates")
+    assert len(embeddings.calls) == 2
+
+
+def test_single_flight_runs_once_for_concurrent_threads():
+    flight = SingleFlight("test")
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.05)
+        return ["result"]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [["result"]] * 5
@@ -0,0 +1,109 @@
+import asyncio
+import os
+
+import onnx
+import pytest
+from langchain_core.documents import Document
+from onnx import TensorProto, helper
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from app.retrival.reranker import CrossEncoderReranker, RerankBatcher
+
+WORDS = ["fee", "exam", "hostel", "library", "date", "deadline"]
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """A tiny 'cross-encoder' whose logit is the sum of the token ids of the pair."""
+    graph = helper.make_graph(
+        [
+            helper.make_node("Cast", ["input_ids"], ["ids"], to=TensorProto.FLOAT),
+            helper.make_node("ReduceSum", ["ids", "axes"], ["total"], keepdims=1),
+            helper.make_node("MatMul", ["total", "weight"], ["logits"]),
+        ],
+        "sum_of_ids",
+        [
+            helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "sequence"]),
+            helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "sequence"]),
+        ],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["batch", 1])],
+        [
+            helper.make_tensor("axes", TensorProto.INT64, [1], [1]),
+            helper.make_tensor("weight", TensorProto.FLOAT, [1, 1], [1.0]),
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    directory = tmp_path / "model"
+    directory.mkdir()
+    onnx.save(model, str(directory / "model.onnx"))
+
+    tokenizer = Tokenizer(WordLevel({"[UNK]": 0, **{w: i + 1 for i, w in enumerate(WORDS)}}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(str(directory / "tokenizer.json"))
+    return str(directory)
+
+
+@pytest.fixture
+def reranker(model_dir):
+    return CrossEncoderReranker(model_dir=model_dir, quantize=False)
+
+
+def test_rerank_orders_by_score_and_caches(reranker, monkeypatch):
+    docs = [Document(page_content=text) for text in ("fee", "deadline", "exam date")]
+    top = reranker.rerank("fee", docs, top_n=2)
+    assert [d.page_content for d in top] == ["exam date", "deadline"]
+    assert top[0].metadata["rerank_score"] == pytest.approx(1 + 2 + 5)
+
+    batches = []
+    run_batch = reranker._run_batch
+    monkeypatch.setattr(reranker, "_run_batch", lambda pairs: batches.append(pairs) or run_batch(pairs))
+    reranker.rerank("fee", docs + [Document(page_content="library")], top_n=2)
+    assert batches == [[("fee", "library")]]
+
+
+def test_quantized_model_goes_to_cache_dir(model_dir, tmp_path):
+    cache_dir = tmp_path / "cache"
+    before = set(os.listdir(model_dir))
+    reranker = CrossEncoderReranker(model_dir=model_dir, quantize=True, cache_dir=str(cache_dir))
+
+    assert set(os.listdir(model_dir)) == before
+    quantized = [name for name in os.listdir(cache_dir) if name.endswith(".int8.onnx")]
+    assert len(quantized) == 1
+    assert reranker.score("exam", ["hostel"]) == [pytest.approx(2 + 3, abs=0.1)]
+
+
+def test_batcher_coalesces_concurrent_calls(reranker, monkeypatch):
+    calls = []
+    score_pairs = reranker.score_pairs
+    monkeypatch.setattr(reranker, "score_pairs", lambda pairs: calls.append(len(pairs)) or score_pairs(pairs))
+
+    async def main():
+        batcher = RerankBatcher(reranker, max_wait_ms=5)
+        results = await asyncio.gather(
+            batcher.score("fee", ["exam", "hostel"]),
+            batcher.score("date", ["library"]),
+        )
+        return batcher, results
+
+    batcher, results = asyncio.run(main())
+    assert calls == [3]
+    assert results == [[pytest.approx(3), pytest.approx(4)], [pytest.approx(9)]]
+    assert not batcher._tasks
+
+
+def test_batcher_flushes_at_max_batch_and_propagates_errors(reranker, monkeypatch):
+    def broken(pairs):
+        raise RuntimeError("model failed")
+
+    monkeypatch.setattr(reranker, "score_pairs", broken)
+
+    async def main():
+        batcher = RerankBatcher(reranker, max_wait_ms=60_000, max_batch=2)
+        with pytest.raises(RuntimeError, match="model failed"):
+            await batcher.score("fee", ["exam", "hostel"])
+        return batcher
+
+    assert not asyncio.run(main())._tasks
@@ -0,0 +1,125 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.services import redis_queue, scheduler
+
+
+@pytest.fixture(autouse=True)
+def queue(monkeypatch):
+    fake = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_queue, "r", fake)
+    monkeypatch.setattr(scheduler, "TENANT_WEIGHTS", {})
+    return fake
+
+
+def job(name, school="Engineering", document_type="handbook", size=1024):
+    record = {"id": name, "school": school, "document_type": document_type, "file_size": size}
+    return {"uuid": name, "record": record}
+
+
+async def drain():
+    names = []
+    while (popped := await scheduler.pop_job()) is not None:
+        names.append(popped["uuid"])
+    return names
+
+
+def test_express_lane_is_served_first():
+    async def main():
+        await scheduler.enqueue(job("regular"))
+        await redis_queue.add_to_queue(job("legacy"))
+        await scheduler.enqueue(job("notice", document_type="notice"))
+        return await drain()
+
+    assert asyncio.run(main()) == ["notice", "regular", "legacy"]
+
+
+def test_weighted_round_robin(monkeypatch):
+    monkeypatch.setattr(scheduler, "TENANT_WEIGHTS", {"Engineering": 2})
+
+    async def main():
+        for i in range(4):
+            await scheduler.enqueue(job(f"eng{i}", school="Engineering"))
+        for i in range(4):
+            await scheduler.enqueue(job(f"law{i}", school="Law"))
+        return await drain()
+
+    assert asyncio.run(main()) == ["eng0", "eng1", "law0", "eng2", "eng3", "law1", "law2", "law3"]
+
+
+def test_large_lane_still_progresses(monkeypatch):
+    monkeypatch.setattr(scheduler, "LARGE_EVERY", 2)
+    large = scheduler.SMALL_DOCUMENT_BYTES + 1
+
+    async def main():
+        await scheduler.enqueue(job("big", size=large))
+        for i in range(3):
+            await scheduler.enqueue(job(f"small{i}"))
+        return await drain()
+
+    assert asyncio.run(main()) == ["small0", "big", "small1", "small2"]
+
+
+def test_idempotency_key_dedupes():
+    async def main():
+        first = await scheduler.enqueue(job("a"), "a:v1")
+        again = await scheduler.enqueue(job("a"), "a:v1")
+        new_version = await scheduler.enqueue(job("a"), "a:v2")
+        return first, again, new_version, await scheduler.get_queue_length()
+
+    assert asyncio.run(main()) == (True, False, True, 2)
+
+
+def test_enqueue_many_reports_each_job():
+    async def main():
+        results = await scheduler.enqueue_many([
+            (job("a"), "a:v1", None),
+            (job("a"), "a:v1", None),  # duplicate inside the batch
+            (job("b", school="Law"), "b:v1", None),
+            (job("c", document_type="urgent"), None, None),
+        ])
+        return results, await drain()
+
+    results, order = asyncio.run(main())
+    assert results == [True, False, True, True]
+    assert order == ["c", "a", "b"]
+
+
+def test_refuses_redis_cluster(monkeypatch, queue):
+    async def cluster_info(section=None):
+        return {"cluster_enabled": 1}
+
+    monkeypatch.setattr(scheduler, "_single_node_checked", False)
+    monkeypatch.setattr(queue, "info", cluster_info)
+    with pytest.raises(RuntimeError, match="single Redis node"):
+        asyncio.run(scheduler.pop_job())
+
+
+def test_heavy_lane_is_separate_from_pop_job():
+    async def main():
+        await scheduler.enqueue(job("small"))
+        await scheduler.spill_heavy(job("scan"), {"pages": 400})
+        length = await scheduler.get_queue_length()
+        stats = await scheduler.get_stats()
+        regular = await drain()
+        heavy = await scheduler.pop_heavy_job()
+        return length, stats["heavy"], regular, heavy, await scheduler.pop_heavy_job()
+
+    length, heavy_depth, regular, heavy, empty = asyncio.run(main())
+    assert (length, heavy_depth) == (2, 1)
+    assert regular == ["small"]
+    assert (heavy["uuid"], heavy["lane"], heavy["cost"]) == ("scan", "heavy", {"pages": 400})
+    assert empty is None
+
+
+def test_pop_any_job_drains_heavy_lane_last():
+    async def main():
+        await scheduler.spill_heavy(job("scan"))
+        await scheduler.enqueue(job("small"))
+        return [(await scheduler.pop_any_job())["uuid"] for _ in range(2)], await scheduler.pop_any_job()
+
+    order, empty = asyncio.run(main())
+    assert order == ["small", "scan"]
+    assert empty is None
@@ -0,0 +1,44 @@
+import json
+
+from app.utils import serialization
+from app.utils.serialization import ENVELOPE_TAG, FORMAT_VERSION, dumps, loads, packb, unpackb
+
+
+def test_roundtrip_is_versioned_plain_json():
+    payload = {"uuid": "abc", "record": {"id": 1, "school": "SOE"}, "images_base64": ["aGk="]}
+    encoded = dumps(payload)
+    assert json.loads(encoded) == [ENVELOPE_TAG, FORMAT_VERSION, payload]
+    assert loads(encoded) == payload
+    assert loads(encoded.encode()) == payload
+
+
+def test_loads_accepts_legacy_stdlib_json():
+    payload = {"storage_path": "a/b.pdf", "file_name": "b.pdf"}
+    assert loads(json.dumps(payload)) == payload
+
+
+def test_packb_roundtrip():
+    payload = {"raw_text": "hello", "tables_html": ["<table></table>"]}
+    assert unpackb(packb(payload)) == payload
+
+
+def test_packb_falls_back_to_json_without_msgpack(monkeypatch):
+    monkeypatch.setattr(serialization, "msgpack", None)
+    encoded = packb({"a": 1})
+    assert json.loads(encoded)[1] == FORMAT_VERSION
+    assert unpackb(encoded) == {"a": 1}
+
+
+def test_non_dict_values_roundtrip():
+    assert loads(dumps([1, 2, 3])) == [1, 2, 3]
+
+
+def test_reserved_looking_keys_survive():
+    for value in ({"_v": 7, "x": 1}, {"_d": "only"}, {"_v": 1}, {"_v": 1, "_d": 2}, [ENVELOPE_TAG, 1], None, "_d"):
+        assert loads(dumps(value)) == value
+        assert unpackb(packb(value)) == value
+
+
+def test_legacy_payload_with_reserved_looking_keys_is_untouched():
+    assert loads('{"_v": 1, "uuid": "abc"}') == {"_v": 1, "uuid": "abc"}
+    assert loads(b'{"_d": [1, 2]}') == {"_d": [1, 2]}
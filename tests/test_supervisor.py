@@ -0,0 +1,102 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from app.workers import supervisor
+from app.workers.supervisor import Supervisor
+
+
+@pytest.fixture
+def fast(monkeypatch):
+    monkeypatch.setattr(supervisor, "POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(supervisor, "BACKOFF_INITIAL", 0.01)
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGTERM, signal.SIGINT)}
+    yield
+    for sig, handler in handlers.items():
+        signal.signal(sig, handler)
+
+
+def exit_status(code):
+    return code << 8  # as waitpid reports a normal exit
+
+
+def stop_when(path):
+    """SIGTERM ourselves (the supervisor) once a worker has written `path`."""
+    def wait():
+        while not os.path.exists(path):
+            time.sleep(0.01)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    threading.Thread(target=wait, daemon=True).start()
+
+
+def test_threads_are_split_over_heavy_workers_too(monkeypatch):
+    monkeypatch.setattr(supervisor, "_available_cpus", lambda: 8)
+    assert Supervisor(2, 1, 1, 0, heavy_workers=2).threads == 2
+    assert Supervisor(2, 1, 1, 0).threads == 4
+
+
+def test_backoff_doubles_and_resets_after_a_stable_run(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(supervisor.time, "monotonic", lambda: now[0])
+    sup = Supervisor(1, 1, 1, 0)
+
+    delays = []
+    for uptime in (1, 1, 1, supervisor.STABLE_AFTER_SECONDS):
+        sup.children[100] = 0
+        sup.started_at[0] = now[0] - uptime
+        sup._on_exit(100, exit_status(1))
+        delays.append(sup.restart_at[0] - now[0])
+    assert delays == [1.0, 2.0, 4.0, 1.0]
+
+    sup.stopping = True
+    del sup.restart_at[0]
+    sup.children[101] = 0
+    sup._on_exit(101, exit_status(0))
+    assert sup.restart_at == {}
+
+
+def test_crashed_worker_is_restarted_and_drained(fast, monkeypatch, tmp_path):
+    crashed, ready, drained = (str(tmp_path / name) for name in ("crashed", "ready", "drained"))
+
+    def run_worker(slot, concurrency, threads, metrics_port, preload_models, heavy, spill):
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        if not os.path.exists(crashed):
+            open(crashed, "w").close()
+            return 1
+        open(ready, "w").close()
+        stop.wait(10)
+        open(drained, "w").close()
+        return 0
+
+    monkeypatch.setattr(supervisor, "_run_worker", run_worker)
+    sup = Supervisor(1, 1, drain_timeout=10, metrics_port=0)
+    stop_when(ready)
+
+    assert sup.run() == 0
+    assert sup.failures[0] == 1
+    assert os.path.exists(drained)  # the restarted worker finished on SIGTERM
+    assert sup.children == {}
+
+
+def test_workers_still_busy_after_the_drain_timeout_are_killed(fast, monkeypatch, tmp_path):
+    ready = str(tmp_path / "ready")
+
+    def run_worker(slot, *args, **kwargs):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        open(ready, "w").close()
+        time.sleep(30)
+        return 0
+
+    monkeypatch.setattr(supervisor, "_run_worker", run_worker)
+    sup = Supervisor(1, 1, drain_timeout=0.2, metrics_port=0)
+    stop_when(ready)
+
+    start = time.monotonic()
+    assert sup.run() == 0
+    assert time.monotonic() - start < 10
+    assert sup.children == {}
@@ -0,0 +1,76 @@
+import pytest
+from langchain_core.documents import Document
+from qdrant_client.models import PointStruct
+
+from app.services.qdrant_client import PLACEMENT_COLLECTION, PLACEMENT_SHARD_KEY, document_payload, tenant_key
+from app.services.tenant_admin import is_migration_target, migrate, plan_balance
+
+
+def test_tenant_key():
+    assert tenant_key("School of Law") == "school_of_law"
+    assert tenant_key("  Engineering & Tech. ") == "engineering_tech"
+    assert tenant_key("Law") == tenant_key("law")
+    assert tenant_key(None) == tenant_key("") == tenant_key("--") == "unknown"
+
+
+def row(tenant, shard_id, peer_id, points):
+    return {"tenant": tenant, "shard_id": shard_id, "peer_id": peer_id, "points": points}
+
+
+def test_plan_balance_moves_shards_to_the_emptiest_peer():
+    rows = [row("law", 1, 1, 600), row("medicine", 2, 1, 300), row("arts", 3, 1, 100), row("science", 4, 2, 200)]
+    moves = plan_balance(rows, [1, 2, 3])
+
+    load = {1: 1000, 2: 200, 3: 0}
+    points = {(r["tenant"], r["shard_id"]): r["points"] for r in rows}
+    for tenant, shard_id, from_peer, to_peer in moves:
+        load[from_peer] -= points[tenant, shard_id]
+        load[to_peer] += points[tenant, shard_id]
+    assert moves == [("law", 1, 1, 3), ("arts", 3, 1, 2)]
+    assert max(load.values()) - min(load.values()) < 1000
+    assert max(load.values()) == 600
+
+
+def test_plan_balance_leaves_a_balanced_cluster_alone():
+    rows = [row("law", 1, 1, 100), row("arts", 2, 2, 100), row("empty", 3, 2, 0)]
+    assert plan_balance(rows, [1, 2]) == []
+    # a single shard bigger than the gap can't narrow it
+    assert plan_balance([row("law", 1, 1, 500)], [1, 2]) == []
+
+
+def test_migrate_shared_collection_into_school_collections(memory_store):
+    store = memory_store("kb", placement=PLACEMENT_COLLECTION)
+    documents = [Document(page_content=f"chunk {i}", metadata={"school": school})
+                 for i, school in enumerate(["Law", "Law", "Medicine", None])]
+    vectors = store.embeddings.embed_documents([d.page_content for d in documents])
+    store.client.upsert("kb", points=[
+        PointStruct(id=i, vector=vector, payload=document_payload(document))
+        for i, (vector, document) in enumerate(zip(vectors, documents))
+    ])
+
+    assert not is_migration_target(store, "kb")
+    assert migrate(store, "kb", batch_size=3) == 4
+    assert store.tenant_collections() == ["kb__law", "kb__medicine", "kb__unknown"]
+    assert store.client.count("kb__law").count == 2
+    assert is_migration_target(store, "kb__law")
+
+
+def test_shard_key_placement_needs_custom_sharding(memory_store):
+    store = memory_store("kb")
+    store.placement = PLACEMENT_SHARD_KEY
+    assert is_migration_target(store, "kb")
+    with pytest.raises(ValueError, match="without custom sharding"):
+        store._ensure_collection()
+
+
+def test_search_without_school_covers_every_school_collection(memory_store):
+    store = memory_store("kb", placement=PLACEMENT_COLLECTION)
+    store.similarity_search("warm up the collection list", k=1)
+    store.add_documents([
+        Document(page_content="law exam rules", metadata={"school": "Law"}),
+        Document(page_content="medicine exam rules", metadata={"school": "Medicine"}),
+    ])
+
+    hits = store.similarity_search("exam rules", k=5, active_only=False)
+    assert sorted(d.metadata["school"] for d in hits) == ["Law", "Medicine"]
+    assert [d.metadata["school"] for d in store.similarity_search("exam rules", k=5, school="Law")] == ["Law"]
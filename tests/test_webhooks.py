@@ -0,0 +1,83 @@
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.main import app
+from app.services import redis_queue, scheduler
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    fake = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_queue, "r", fake)
+    monkeypatch.setattr(routes, "SIZE_LOOKUP", False)
+    return fake
+
+
+@pytest.fixture
+def client(queue):
+    return TestClient(app)
+
+
+def record(**overrides):
+    return {
+        "id": 7,
+        "storage_path": "school/handbook.pdf",
+        "file_name": "handbook.pdf",
+        "school": "Engineering",
+        "file_size": 1024,
+        "updated_at": "2026-10-01T10:00:00Z",
+        **overrides,
+    }
+
+
+@pytest.mark.parametrize("missing", ["storage_path", "file_name", "id"])
+def test_missing_fields_are_rejected(client, missing):
+    body = record()
+    del body[missing]
+    response = client.post("/webhook/new-document", json={"type": "INSERT", "record": body})
+    assert response.status_code == 422
+
+
+def test_empty_path_is_rejected(client):
+    response = client.post("/webhook/new-document", json={"record": record(storage_path="")})
+    assert response.status_code == 422
+
+
+def test_duplicate_delivery_is_queued_once(client, queue):
+    payload = {"type": "INSERT", "record": record()}
+    assert client.post("/webhook/new-document", json=payload).json() == {"status": "queued"}
+    assert client.post("/webhook/new-document", json=payload).json() == {"status": "duplicate"}
+
+    # a new version of the row is a new job
+    updated = {"type": "UPDATE", "record": record(updated_at="2026-10-02T10:00:00Z")}
+    assert client.post("/webhook/new-document", json=updated).json() == {"status": "queued"}
+    assert asyncio.run(scheduler.get_queue_length()) == 2
+
+
+def test_batch_drops_duplicates_inside_and_across_calls(client):
+    first = client.post("/webhook/new-documents", json={"records": [record(), record(), record(id=8)]}).json()
+    assert first["results"] == ["queued", "duplicate", "queued"]
+
+    second = client.post("/webhook/new-documents", json={"records": [record(id=8), record(id=9)]}).json()
+    assert (second["queued"], second["duplicates"]) == (1, 1)
+
+
+def test_failed_job_releases_its_key(client, monkeypatch):
+    from app.services import rag
+
+    async def download_fails(job):
+        raise RuntimeError("storage unavailable")
+
+    monkeypatch.setattr(rag, "process_job", download_fails)
+    payload = {"record": record()}
+    assert client.post("/webhook/new-document", json=payload).json() == {"status": "queued"}
+
+    async def run_one():
+        return await rag.handle_job(await scheduler.pop_job())
+
+    assert asyncio.run(run_one()) is False
+    assert client.post("/webhook/new-document", json=payload).json() == {"status": "queued"}